@@ -15,6 +15,8 @@ def main():
             print(Fore.GREEN + "\n\n\n=============================================")
             print(Fore.GREEN + "Found experiment %s. Launching" % exp)
             startTime = time.time()
+            EXP_FLAGS[exp].store.experiment = exp
+            EXP_FLAGS[exp].store.configure(**os.environ)
             EXP_FLAGS[exp].configure(**os.environ)
             EXP_FLAGS[exp].run()
             print(Fore.GREEN + "Experiment %s ended successfully. (Runtime %.2f)" % (exp, time.time() - startTime))
@@ -0,0 +1,2 @@
+from src.benchmark.harness import HostFingerprint, BenchmarkResult, BenchmarkHarness
+from src.benchmark.result_store import ResultStore
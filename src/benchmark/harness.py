@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import hashlib
+import platform
+
+import numpy as np
+import scipy.stats
+from threadpoolctl import threadpool_info
+
+from colorama import Fore
+
+
+class HostFingerprint:
+    """
+    Describes the host a measurement was taken on: CPU, OS, Python/numpy versions and the BLAS libraries (with their
+    thread counts) numpy is actually running on. Collected once per process.
+    """
+
+    CACHED = None
+
+    @staticmethod
+    def collect():
+        if HostFingerprint.CACHED is None:
+            blas = [{k: lib.get(k) for k in ['internal_api', 'version', 'num_threads', 'threading_layer',
+                                             'architecture']} for lib in threadpool_info()]
+            fingerprint = {
+                'node': platform.node(),
+                'system': platform.system(),
+                'release': platform.release(),
+                'machine': platform.machine(),
+                'processor': platform.processor(),
+                'cpus': os.cpu_count(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'blas': blas
+            }
+            fingerprint['id'] = HostFingerprint.digest(fingerprint)
+            HostFingerprint.CACHED = fingerprint
+        return HostFingerprint.CACHED
+
+    @staticmethod
+    def digest(fingerprint):
+        return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class BenchmarkResult:
+    """
+    Repeated measurements of one benchmark. Wall times come from time.perf_counter (monotonic, high resolution), CPU
+    times from time.process_time (all threads of the process, so cpu/wall > 1 means BLAS ran multi-threaded).
+    """
+
+    def __init__(self, name, samples, cpuSamples, warmup, params=None, fingerprint=None, value=None):
+        self.name = name
+        self.samples = list(samples)
+        self.cpuSamples = list(cpuSamples)
+        self.warmup = warmup
+        self.params = params if params is not None else {}
+        self.fingerprint = fingerprint if fingerprint is not None else HostFingerprint.collect()
+        # Return value of the last measured call
+        self.value = value
+
+    @property
+    def median(self):
+        return float(np.median(self.samples))
+
+    @property
+    def mean(self):
+        return float(np.mean(self.samples))
+
+    @property
+    def stdev(self):
+        return float(np.std(self.samples, ddof=1)) if len(self.samples) > 1 else 0.0
+
+    @property
+    def cpu_median(self):
+        return float(np.median(self.cpuSamples))
+
+    def percentile(self, p):
+        return float(np.percentile(self.samples, p))
+
+    def confidence_interval(self, confidence=0.95):
+        """
+        Student t interval of the mean.
+        :return: (low, high), collapsed to the mean for a single sample
+        """
+        if len(self.samples) < 2:
+            return self.mean, self.mean
+        half = scipy.stats.t.ppf((1 + confidence) / 2, len(self.samples) - 1) * self.stdev / np.sqrt(len(self.samples))
+        return self.mean - half, self.mean + half
+
+    @classmethod
+    def from_summary(cls, summary):
+        """
+        Rebuilds a result from its #summary, e.g. as read back from a ResultStore. The return value isn't stored.
+        """
+        return cls(summary['name'], summary['samples'], summary['cpuSamples'], summary['warmup'], summary['params'])
+
+    def summary(self):
+        low, high = self.confidence_interval()
+        return {'name': self.name, 'params': self.params, 'repetitions': len(self.samples), 'warmup': self.warmup,
+                'median': self.median, 'mean': self.mean, 'stdev': self.stdev, 'min': min(self.samples),
+                'max': max(self.samples), 'p5': self.percentile(5), 'p95': self.percentile(95),
+                'ci95': [float(low), float(high)],
+                'cpuMedian': self.cpu_median, 'samples': self.samples, 'cpuSamples': self.cpuSamples,
+                'host': self.fingerprint['id']}
+
+    def __repr__(self):
+        low, high = self.confidence_interval()
+        return "%s: median %.4f s (p5 %.4f, p95 %.4f, 95%% CI %.4f-%.4f, n=%d), cpu %.4f s" % (
+            self.name, self.median, self.percentile(5), self.percentile(95), low, high, len(self.samples),
+            self.cpu_median)
+
+
+class BenchmarkHarness:
+    """
+    Shared timing harness: warmup runs, then N measured repetitions of the same call, summarized with median,
+    percentiles and a confidence interval, tagged with the host fingerprint. Optionally pins the process to a CPU set
+    (Linux only) so repeated runs don't migrate between cores. With a ResultStore, every result is persisted as soon
+    as it is measured.
+    """
+
+    WARMUP = 1
+    REPETITIONS = 5
+
+    def __init__(self, warmup=WARMUP, repetitions=REPETITIONS, cpus=None, store=None):
+        self.warmup = warmup
+        self.repetitions = repetitions
+        self.results = []
+        self.store = store
+        if cpus is not None:
+            self.pin(cpus)
+
+    @staticmethod
+    def pin(cpus):
+        """
+        :param cpus: iterable of CPU indices, or a "0-3,6" style string
+        """
+        if isinstance(cpus, str):
+            cpus = BenchmarkHarness.parse_cpus(cpus)
+        if not hasattr(os, 'sched_setaffinity'):
+            print(Fore.YELLOW + "CPU pinning is not supported on %s, ignoring." % platform.system())
+            return
+        os.sched_setaffinity(0, set(cpus))
+        print(Fore.CYAN + "Pinned benchmarks to CPUs %s" % sorted(cpus))
+
+    @staticmethod
+    def parse_cpus(spec):
+        cpus = set()
+        for part in spec.split(','):
+            bounds = part.split('-')
+            cpus.update(range(int(bounds[0]), int(bounds[-1]) + 1))
+        return cpus
+
+    def configure(self, **kwargs):
+        """
+        Reads BENCHMARK_WARMUP, BENCHMARK_REPETITIONS and BENCHMARK_CPUS from experiment parameters.
+        """
+        if 'BENCHMARK_WARMUP' in kwargs:
+            self.warmup = int(kwargs['BENCHMARK_WARMUP'])
+        if 'BENCHMARK_REPETITIONS' in kwargs:
+            self.repetitions = int(kwargs['BENCHMARK_REPETITIONS'])
+        if 'BENCHMARK_CPUS' in kwargs:
+            self.pin(kwargs['BENCHMARK_CPUS'])
+
+    def measure(self, name, fn, *args, params=None, setup=None, warmup=None, repetitions=None, resume=True,
+                **kwargs):
+        """
+        Times fn(*args, **kwargs).
+        :param name: benchmark name, used in reports
+        :param fn: callable to measure
+        :param params: parameters recorded with the result
+        :param setup: callable run (untimed) before every call, e.g. to restore mutated inputs
+        :param warmup: untimed calls before measuring, harness default when None
+        :param repetitions: measured calls, harness default when None
+        :param resume: return the stored result without calling fn when the store already has this point. Callers
+                       that need .value must pass False
+        :return: BenchmarkResult, with the last return value of fn in .value (None when resumed from the store)
+        """
+        if resume and self.store is not None:
+            summary = self.store.get(dict(params or {}, benchmark=name))
+            if summary is not None:
+                result = BenchmarkResult.from_summary(summary)
+                self.results.append(result)
+                print(Fore.CYAN + "Stored %s" % result)
+                return result
+
+        warmup = self.warmup if warmup is None else warmup
+        repetitions = self.repetitions if repetitions is None else repetitions
+        for _ in range(warmup):
+            if setup is not None:
+                setup()
+            fn(*args, **kwargs)
+
+        samples = []
+        cpuSamples = []
+        value = None
+        for _ in range(repetitions):
+            if setup is not None:
+                setup()
+            cpuStart = time.process_time()
+            startTime = time.perf_counter()
+            value = fn(*args, **kwargs)
+            samples.append(time.perf_counter() - startTime)
+            cpuSamples.append(time.process_time() - cpuStart)
+
+        result = BenchmarkResult(name, samples, cpuSamples, warmup, params, value=value)
+        self.results.append(result)
+        if self.store is not None:
+            self.store.put(dict(result.params, benchmark=name), result.summary())
+        print(Fore.CYAN + str(result))
+        return result
+
+    def once(self, name, fn, *args, params=None, resume=False, **kwargs):
+        """
+        Single-shot measurement for calls that can't be repeated cheaply (uploads, long downloads). These are run for
+        their side effects and return value too, so they are not resumed from the store unless resume is set.
+        """
+        return self.measure(name, fn, *args, params=params, warmup=0, repetitions=1, resume=resume, **kwargs)
+
+    def report(self):
+        """
+        :return: summaries of every result measured by this harness, with the host fingerprint
+        """
+        return {'host': HostFingerprint.collect(), 'results': [r.summary() for r in self.results]}
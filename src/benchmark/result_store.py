@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+import numpy as np
+
+from colorama import Fore
+
+from src.benchmark.harness import HostFingerprint
+
+
+class ResultStore:
+    """
+    Append-only JSON lines store of experiment results, so sweeps survive crashes and plots can be redrawn from disk.
+
+    Every record is keyed by experiment name, point parameters and host fingerprint id, and written (and fsynced) as
+    soon as the point is computed. On load, the latest record of every key wins, and a line truncated by a crash is
+    dropped. Re-running the same sweep on the same host skips every point already in the store, unless
+    RESULT_STORE_FRESH is set (existing records are then ignored, new ones are still appended).
+    """
+
+    PATH = "./resources/results/results.jsonl"
+
+    def __init__(self, experiment, path=PATH):
+        """
+        :param experiment: name records are filed under, main.py sets it to the experiment flag
+        :param path: JSON lines file, shared by every experiment
+        """
+        self.experiment = experiment
+        self.path = path
+        self.fresh = False
+        self.records = None
+        self.index = None
+        # Harness results are put from download threads too
+        self.lock = threading.Lock()
+
+    def configure(self, **kwargs):
+        """
+        Reads RESULT_STORE (file path) and RESULT_STORE_FRESH from experiment parameters.
+        """
+        if 'RESULT_STORE' in kwargs:
+            self.path = kwargs['RESULT_STORE']
+            self.records = None
+        if 'RESULT_STORE_FRESH' in kwargs:
+            self.fresh = True
+            self.records = None
+        self.load()
+        print(Fore.CYAN + "Result store %s has %d records for %s on host %s" %
+              (self.path, len(self.index), self.experiment, self.host))
+
+    @property
+    def host(self):
+        return HostFingerprint.collect()['id']
+
+    @staticmethod
+    def key(experiment, params, host):
+        return hashlib.sha256(json.dumps([experiment, params, host], sort_keys=True,
+                                         default=ResultStore.encode).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        return str(value)
+
+    def load(self):
+        """
+        Reads every record of this experiment on this host.
+        """
+        self.records = []
+        self.index = {}
+        if self.fresh or not os.path.exists(self.path):
+            return
+        host = self.host
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(Fore.YELLOW + "Skipping truncated record in %s" % self.path)
+                    continue
+                if record['experiment'] == self.experiment and record['host'] == host:
+                    self.records.append(record)
+                    self.index[record['key']] = record
+
+    def has(self, params):
+        if self.records is None:
+            self.load()
+        return self.key(self.experiment, params, self.host) in self.index
+
+    def get(self, params, default=None):
+        """
+        :return: value of the latest record for params on this host, default when it was never computed
+        """
+        if self.records is None:
+            self.load()
+        record = self.index.get(self.key(self.experiment, params, self.host))
+        return default if record is None else record['value']
+
+    def put(self, params, value):
+        """
+        Appends a record and makes it durable before returning.
+        :param params: JSON serializable parameters of the point (numpy scalars and arrays are converted)
+        :param value: JSON serializable result
+        :return: the stored record
+        """
+        with self.lock:
+            return self._put(params, value)
+
+    def _put(self, params, value):
+        if self.records is None:
+            self.load()
+        host = self.host
+        record = {'key': self.key(self.experiment, params, host), 'experiment': self.experiment, 'host': host,
+                  'timestamp': time.time(), 'params': params, 'value': value}
+        line = json.dumps(record, sort_keys=True, default=ResultStore.encode)
+        # Round trip so the in-memory record matches what a later load() reads back
+        record = json.loads(line)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'ab+') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # Terminate a record truncated by a crash instead of appending to it
+                    line = "\n" + line
+            f.write((line + "\n").encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.append(record)
+        self.index[record['key']] = record
+        return record
+
+    def results(self, **match):
+        """
+        :param match: parameter values records must have, e.g. benchmark='arweave download'
+        :return: every matching record on this host, in the order they were appended (repeated keys included)
+        """
+        if self.records is None:
+            self.load()
+        return [r for r in self.records if all(k in r['params'] and r['params'][k] == v for k, v in match.items())]
+
+    def sweep(self, points, fn):
+        """
+        Computes fn(params) for every point not already in the store, persisting each result as it completes.
+        :param points: iterable of parameter dicts
+        :param fn: callable computing the value of one point
+        :return: generator of (params, value), stored values included, in the order of points
+        """
+        skipped = 0
+        for params in points:
+            if self.has(params):
+                skipped += 1
+                yield params, self.get(params)
+                continue
+            if skipped:
+                print(Fore.CYAN + "Resuming %s after %d stored points" % (self.experiment, skipped))
+                skipped = 0
+            value = self.put(params, fn(params))['value']
+            yield params, value
+        if skipped:
+            print(Fore.CYAN + "All %d trailing points of %s were already stored" % (skipped, self.experiment))
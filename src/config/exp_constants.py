@@ -4,6 +4,8 @@ from src.experiments.arweave_experiment import ARWeaveExperiment
 from src.experiments.s3_experiment import S3Experiment
 from src.experiments.server_experiment import ServerBasedExperiment
 from src.experiments.consistent_hashing_experiment import ConsistentHashExp
+from src.experiments.throughput_experiment import SolverThroughputExperiment
+from src.experiments.verification_experiment import VerificationExperiment
 
 EXP_FLAGS = {
     # Start from a small matrix size NxM and increase by K across both dimensions, and then across each dimension
@@ -41,5 +43,13 @@ EXP_FLAGS = {
 
     # Various experiments based on the consistent hashing methods used in the PoUW protocol. Computes the network node
     # distribution when selecting exercises to solve, to validate, and other network parameters.
-    'CONSISTENT_HASH': ConsistentHashExp()
+    'CONSISTENT_HASH': ConsistentHashExp(),
+
+    # Solves many exercises concurrently in a process pool with shared-memory inputs, sweeping workers x BLAS threads
+    # configurations. Reports sustained exercises/hour, which is what a miner actually cares about.
+    'SOLVER_THROUGHPUT_EXP': SolverThroughputExperiment(),
+
+    # Times validators against miners: probabilistic (Freivalds) verification of a solution vs solving it, across
+    # exercise sizes.
+    'VERIFICATION_EXP': VerificationExperiment()
 }
@@ -0,0 +1,6 @@
+from src.exercises.exercise_format import ExerciseFormat, ExerciseHeader
+from src.exercises.exercise_loader import ExerciseLoader
+from src.exercises.exercise_generator import ExerciseGenerator
+from src.exercises.virtual_exercise import VirtualExercise
+from src.exercises.sparsifier import Sparsifier
+from src.exercises.exercise_cache import ExerciseCache
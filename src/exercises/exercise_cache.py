@@ -0,0 +1,274 @@
+import os
+import mmap
+import time
+import hashlib
+
+from colorama import Fore
+
+from src.exercises.exercise_format import ExerciseFormat
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ExerciseCache:
+    """
+    Local cache of downloaded exercises shared by every storage experiment (Arweave, S3, P2P) and every process on the
+    host. Entries are keyed by sha256(provider, object id), so a transaction downloaded once is never fetched again
+    while it stays cached.
+
+    A fetch is a callable(offset) -> iterable of bytes chunks from that offset on. The first process asking for a
+    missing entry takes its fill lock and appends chunks to <key>.part as they arrive; the file is renamed to
+    <key>.dat once complete, i.e. once it has the expected size (given by the caller, or read from the ExerciseFormat
+    header of the entry). A fetch ending short, or data whose size can't be checked, leaves the .part file to resume
+    from. Concurrent readers of the same
+    entry don't fetch it again: they tail the .part file and get every byte as soon as it is written, which lets a
+    StreamingSolver start on an exercise another process is still downloading. If the filler dies, the next reader
+    takes the lock over and resumes the fetch from the size of the .part file.
+
+    Complete entries are evicted least recently used first (mtime is the access time) once the cache grows past
+    maxBytes. Locks use flock, so cross-process safety needs a POSIX host; elsewhere the cache still works within a
+    single process.
+    """
+
+    CACHE_DIR = "./resources/exercise_cache"
+    MAX_BYTES = 20 * 1024 * 1024 * 1024
+    CHUNK_SIZE = 4 * 1024 * 1024
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, cacheDir=CACHE_DIR, maxBytes=MAX_BYTES):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.counters = {'hits': 0, 'sharedHits': 0, 'misses': 0, 'bytesSaved': 0, 'bytesFetched': 0,
+                         'evictions': 0}
+        os.makedirs(self.cacheDir, exist_ok=True)
+        if fcntl is None:
+            print(Fore.YELLOW + "File locks are not supported on %s, the exercise cache is not process safe." %
+                  os.name)
+
+    @staticmethod
+    def key(provider, objectId):
+        return hashlib.sha256(("%s|%s" % (provider, objectId)).encode('utf-8')).hexdigest()
+
+    def path(self, key, suffix=".dat"):
+        return os.path.join(self.cacheDir, key + suffix)
+
+    def stream(self, provider, objectId, fetch, offset=0, size=None):
+        """
+        Reads an entry through the cache, fetching, sharing or replaying it as needed.
+        :param fetch: callable(offset) -> iterable of bytes chunks, only called on a miss
+        :param offset: first byte to return
+        :param size: expected size of the entry, or a callable returning it, only evaluated once a fill completes.
+                     Read from the ExerciseFormat header when None, other data is then never committed
+        :return: generator of bytes chunks
+        """
+        key = self.key(provider, objectId)
+        counted = False
+        while True:
+            if os.path.isfile(self.path(key)):
+                try:
+                    f = open(self.path(key), 'rb')
+                except FileNotFoundError:
+                    # Evicted by another process in between, fetch it again
+                    continue
+                if not counted:
+                    self.counters['hits'] += 1
+                yield from self._replay(key, f, offset)
+                return
+            with open(self.path(key, ".lock"), 'a+') as lock:
+                if self._lock(lock, blocking=False):
+                    try:
+                        if os.path.isfile(self.path(key)):
+                            continue
+                        if not counted:
+                            self.counters['misses'] += 1
+                        yield from self._fill(key, fetch, offset, size)
+                    finally:
+                        self._unlock(lock)
+                    # The caller is about to open the entry, even if it alone is past maxBytes
+                    self.evict(keep=key)
+                    return
+            if not counted:
+                self.counters['sharedHits'] += 1
+                counted = True
+            # Another process is filling the entry: follow it until it completes or its filler dies
+            for chunk in self._tail(key, offset):
+                offset += len(chunk)
+                yield chunk
+            counted = True
+
+    def fetch(self, provider, objectId, fetch, size=None):
+        """
+        Makes sure an entry is complete.
+        :return: path of the cached file
+        """
+        for _ in self.stream(provider, objectId, fetch, size=size):
+            pass
+        return self.path(self.key(provider, objectId))
+
+    def open(self, provider, objectId, fetch, size=None):
+        """
+        :return: read-only buffer over the complete entry (mmap, no copy), usable with ExerciseLoader.from_bytes
+        """
+        while True:
+            path = self.fetch(provider, objectId, fetch, size)
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted by another process in between, fetch it again
+                continue
+            with f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['bytes'] = sum(size for _, size, _ in self._entries())
+        return stats
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used complete entries until the cache fits in maxBytes.
+        :param keep: key of an entry never to remove
+        """
+        with open(os.path.join(self.cacheDir, ".evict.lock"), 'a+') as lock:
+            self._lock(lock)
+            try:
+                entries = sorted(self._entries(), key=lambda x: x[2])
+                used = sum(size for _, size, _ in entries)
+                for file, size, _ in entries:
+                    if used <= self.maxBytes:
+                        break
+                    if file.endswith(".part") or (keep is not None and file.startswith(keep)):
+                        continue
+                    try:
+                        # Readers that already opened or mapped the file keep their data, unlink only drops the name
+                        os.remove(os.path.join(self.cacheDir, file))
+                    except FileNotFoundError:
+                        continue
+                    used -= size
+                    self.counters['evictions'] += 1
+            finally:
+                self._unlock(lock)
+
+    def _entries(self):
+        entries = []
+        for file in os.listdir(self.cacheDir):
+            if file.endswith(".dat") or file.endswith(".part"):
+                try:
+                    stat = os.stat(os.path.join(self.cacheDir, file))
+                except FileNotFoundError:
+                    continue
+                entries.append((file, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _replay(self, key, f, offset):
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            pass
+        with f:
+            f.seek(offset)
+            chunk = f.read(self.CHUNK_SIZE)
+            while chunk:
+                self.counters['bytesSaved'] += len(chunk)
+                yield chunk
+                chunk = f.read(self.CHUNK_SIZE)
+
+    def _fill(self, key, fetch, offset, size=None):
+        partPath = self.path(key, ".part")
+        with open(partPath, 'ab') as part:
+            resumeAt = part.tell()
+            if resumeAt:
+                print(Fore.YELLOW + "Resuming cache entry %s at %d bytes." % (key[:16], resumeAt))
+            if offset < resumeAt:
+                with open(partPath, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(min(self.CHUNK_SIZE, resumeAt - offset))
+                    while chunk:
+                        offset += len(chunk)
+                        yield chunk
+                        chunk = f.read(min(self.CHUNK_SIZE, resumeAt - offset))
+            written = resumeAt
+            for chunk in fetch(resumeAt):
+                part.write(chunk)
+                # Flush every chunk so readers tailing the .part file see it right away
+                part.flush()
+                self.counters['bytesFetched'] += len(chunk)
+                start = written
+                written += len(chunk)
+                if written > offset:
+                    yield chunk[max(0, offset - start):]
+                    offset = written
+            os.fsync(part.fileno())
+        expected = size() if callable(size) else size
+        if expected is None:
+            expected = self._expected_size(partPath)
+        if expected is None:
+            raise RuntimeError("Size of cache entry %s is unknown, keeping the partial file instead of committing it."
+                               % key[:16])
+        if written != expected:
+            raise RuntimeError("Fetch of cache entry %s ended at %d of %d bytes, keeping the partial file to resume."
+                               % (key[:16], written, expected))
+        os.replace(partPath, self.path(key))
+
+    @staticmethod
+    def _expected_size(path):
+        """
+        :return: full size of the exercise file at path according to its header, None when it has none
+        """
+        try:
+            header = ExerciseFormat.read_header(path)
+        except RuntimeError:
+            return None
+        return None if header is None else header.payloadOffset + header.payload_size
+
+    def _tail(self, key, offset):
+        partPath = self.path(key, ".part")
+        while not os.path.isfile(partPath):
+            if os.path.isfile(self.path(key)):
+                return
+            time.sleep(self.POLL_INTERVAL)
+        try:
+            f = open(partPath, 'rb')
+        except FileNotFoundError:
+            # Completed (renamed) in between, the caller replays the .dat file
+            return
+        with f, open(self.path(key, ".lock"), 'a+') as lock:
+            f.seek(offset)
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if chunk:
+                    self.counters['bytesSaved'] += len(chunk)
+                    yield chunk
+                    continue
+                if os.path.isfile(self.path(key)):
+                    # The filler renames after its last write, anything left is already in the file
+                    chunk = f.read()
+                    if chunk:
+                        self.counters['bytesSaved'] += len(chunk)
+                        yield chunk
+                    return
+                if self._lock(lock, blocking=False):
+                    # Filler died, the caller takes over from here
+                    self._unlock(lock)
+                    return
+                time.sleep(self.POLL_INTERVAL)
+
+    @staticmethod
+    def _lock(f, blocking=True):
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    @staticmethod
+    def _unlock(f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,189 @@
+import struct
+import zlib
+
+import numpy as np
+
+
+class ExerciseHeader:
+    """
+    Metadata stored in front of every exercise payload. dtype is kept as a numpy type string ('<f8', '>i4', ...), so it
+    carries the byte order of the payload as well.
+    """
+
+    def __init__(self, shape, dtype, seed=-1, distribution="", blockRows=0, checksums=None, payloadOffset=0,
+                 version=1):
+        self.shape = tuple(int(x) for x in shape)
+        self.dtype = np.dtype(dtype)
+        self.seed = seed
+        self.distribution = distribution
+        self.blockRows = blockRows
+        self.checksums = checksums if checksums is not None else []
+        self.payloadOffset = payloadOffset
+        self.version = version
+
+    @property
+    def block_count(self):
+        return -(-self.shape[0] // self.blockRows)
+
+    @property
+    def payload_size(self):
+        return self.shape[0] * self.shape[1] * self.dtype.itemsize
+
+    def block_range(self, index):
+        return index * self.blockRows, min(self.shape[0], (index + 1) * self.blockRows)
+
+    def __repr__(self):
+        return "ExerciseHeader(v%d, %dx%d %s, seed=%d, distribution=%s, %d blocks of %d rows)" % (
+            self.version, self.shape[0], self.shape[1], self.dtype.str, self.seed, self.distribution,
+            self.block_count, self.blockRows)
+
+
+class ExerciseFormat:
+    """
+    Versioned on-disk exercise format:
+
+    * fixed little-endian header: magic, version, dtype string, rows, cols, generator seed, distribution name,
+      rows per checksum block, block count and payload offset
+    * one crc32 per row-block of the payload
+    * zero padding up to the next ALIGNMENT boundary
+    * the raw C-order payload, which can be memory-mapped directly at payloadOffset
+
+    Per-block checksums let readers verify a matrix incrementally (e.g. only the rows they touch) instead of hashing
+    the whole ~760Mb file. Files without the magic are treated as legacy raw float64 dumps.
+    """
+
+    MAGIC = b"POXEX\x00\x00\x00"
+    VERSION = 1
+    ALIGNMENT = 4096
+    BLOCK_ROWS = 256
+
+    # Bytes of the distribution name field
+    DISTRIBUTION_SIZE = 16
+    # magic, version, dtype, rows, cols, seed, distribution, blockRows, blockCount, payloadOffset
+    FIXED_HEADER = struct.Struct("<8sH8sQQq%dsIIQ" % DISTRIBUTION_SIZE)
+    CHECKSUM = struct.Struct("<I")
+
+    @staticmethod
+    def header_size(blockCount):
+        size = ExerciseFormat.FIXED_HEADER.size + blockCount * ExerciseFormat.CHECKSUM.size
+        return -(-size // ExerciseFormat.ALIGNMENT) * ExerciseFormat.ALIGNMENT
+
+    @staticmethod
+    def new_header(shape, dtype, seed=-1, distribution="", blockRows=BLOCK_ROWS):
+        header = ExerciseHeader(shape, dtype, seed, distribution, min(blockRows, shape[0]))
+        header.checksums = [0] * header.block_count
+        header.payloadOffset = ExerciseFormat.header_size(header.block_count)
+        return header
+
+    @staticmethod
+    def pack_header(header):
+        distribution = header.distribution.encode('ascii')
+        if len(distribution) > ExerciseFormat.DISTRIBUTION_SIZE:
+            raise RuntimeError("Distribution name '%s' is longer than %d bytes and can't be stored in the header." %
+                               (header.distribution, ExerciseFormat.DISTRIBUTION_SIZE))
+        fixed = ExerciseFormat.FIXED_HEADER.pack(ExerciseFormat.MAGIC, header.version,
+                                                 header.dtype.str.encode('ascii'), header.shape[0], header.shape[1],
+                                                 header.seed, distribution, header.blockRows,
+                                                 header.block_count, header.payloadOffset)
+        table = b"".join(ExerciseFormat.CHECKSUM.pack(c) for c in header.checksums)
+        return (fixed + table).ljust(header.payloadOffset, b"\x00")
+
+    @staticmethod
+    def parse_header(buf):
+        """
+        Parses a header from the start of buf.
+        :param buf: bytes-like object holding at least the fixed header and checksum table
+        :return: ExerciseHeader, or None when buf is not in the exercise format
+        """
+        if len(buf) < ExerciseFormat.FIXED_HEADER.size or bytes(buf[:len(ExerciseFormat.MAGIC)]) != ExerciseFormat.MAGIC:
+            return None
+        _, version, dtype, rows, cols, seed, distribution, blockRows, blockCount, payloadOffset = \
+            ExerciseFormat.FIXED_HEADER.unpack_from(buf)
+        if version > ExerciseFormat.VERSION:
+            raise RuntimeError("Exercise format version %d is not supported (max %d)." %
+                               (version, ExerciseFormat.VERSION))
+        checksums = list(x[0] for x in ExerciseFormat.CHECKSUM.iter_unpack(
+            bytes(buf[ExerciseFormat.FIXED_HEADER.size:
+                      ExerciseFormat.FIXED_HEADER.size + blockCount * ExerciseFormat.CHECKSUM.size])))
+        if len(checksums) != blockCount:
+            raise RuntimeError("Truncated exercise header: expected %d checksums, got %d." %
+                               (blockCount, len(checksums)))
+        return ExerciseHeader((rows, cols), dtype.rstrip(b"\x00").decode('ascii'), seed,
+                              distribution.rstrip(b"\x00").decode('ascii'), blockRows, checksums, payloadOffset,
+                              version)
+
+    @staticmethod
+    def read_header(path):
+        with open(path, "rb") as f:
+            fixed = f.read(ExerciseFormat.FIXED_HEADER.size)
+            if len(fixed) < ExerciseFormat.FIXED_HEADER.size or not fixed.startswith(ExerciseFormat.MAGIC):
+                return None
+            blockCount = ExerciseFormat.FIXED_HEADER.unpack(fixed)[8]
+            return ExerciseFormat.parse_header(fixed + f.read(blockCount * ExerciseFormat.CHECKSUM.size))
+
+    @staticmethod
+    def checksum(block):
+        return zlib.crc32(np.ascontiguousarray(block).view(np.uint8)) & 0xffffffff
+
+    @staticmethod
+    def write(path, m, seed=-1, distribution="", blockRows=BLOCK_ROWS):
+        """
+        Serializes a matrix, one row-block at a time so no extra full copy is made.
+        :param path: output file
+        :param m: 2D matrix, any dtype
+        :param seed: generator seed used to produce m, -1 if unknown
+        :param distribution: distribution name used to produce m
+        :param blockRows: rows covered by each checksum
+        :return: the written ExerciseHeader
+        """
+        header = ExerciseFormat.new_header(m.shape, m.dtype, seed, distribution, blockRows)
+        # Packed before opening, so an invalid header doesn't leave an empty file behind
+        packed = ExerciseFormat.pack_header(header)
+        with open(path, "wb") as f:
+            f.write(packed)
+            for index in range(header.block_count):
+                start, end = header.block_range(index)
+                block = np.ascontiguousarray(m[start:end])
+                header.checksums[index] = ExerciseFormat.checksum(block)
+                f.write(block.data)
+            f.seek(0)
+            f.write(ExerciseFormat.pack_header(header))
+        return header
+
+    @staticmethod
+    def allocate(path, header):
+        """
+        Creates a zero-filled exercise file for header and maps its payload for writing. Checksums are not computed,
+        call #write_header once the payload is final.
+        :return: writeable np.memmap over the payload
+        """
+        packed = ExerciseFormat.pack_header(header)
+        with open(path, "wb") as f:
+            f.write(packed)
+            f.truncate(header.payloadOffset + header.payload_size)
+        return np.memmap(path, dtype=header.dtype, mode='r+', shape=header.shape, offset=header.payloadOffset)
+
+    @staticmethod
+    def write_header(path, header):
+        with open(path, "r+b") as f:
+            f.write(ExerciseFormat.pack_header(header))
+
+    @staticmethod
+    def iter_verify(m, header, blocks=None):
+        """
+        Checks payload blocks against the header checksums, lazily.
+        :param m: payload matrix, e.g. memory-mapped by ExerciseLoader
+        :param header: ExerciseHeader of m
+        :param blocks: block indices to check, all when None
+        :return: generator of (block index, ok)
+        """
+        for index in (range(header.block_count) if blocks is None else blocks):
+            start, end = header.block_range(index)
+            yield index, ExerciseFormat.checksum(m[start:end]) == header.checksums[index]
+
+    @staticmethod
+    def verify(m, header, blocks=None):
+        """
+        :return: list of corrupted block indices, empty when the payload is intact
+        """
+        return [index for index, ok in ExerciseFormat.iter_verify(m, header, blocks) if not ok]
@@ -0,0 +1,98 @@
+import os
+import multiprocessing
+
+import numpy as np
+
+from colorama import Fore
+
+from src.exercises.exercise_format import ExerciseFormat
+
+
+class ExerciseGenerator:
+    """
+    Generates exercises block by block straight into an ExerciseFormat file.
+
+    Every row-block is drawn from its own RNG stream, seeded by (seed, block index), so the output is bit-identical
+    regardless of how many worker processes produced it, and memory is bounded by workers x block size instead of
+    two full matrices plus their tobytes() copies. Blocks line up with the checksum blocks of the format, so checksums
+    are computed on the freshly generated data without reading the file back.
+    """
+
+    BLOCK_ROWS = ExerciseFormat.BLOCK_ROWS
+
+    # 100 variance for NMF, 400_000 for +-1M. Same parameters as MatrixSizeExperiment#generate_matrix
+    DISTRIBUTIONS = {
+        '1M': lambda rng, shape: rng.normal(1000000, 100, shape),
+        '-1M': lambda rng, shape: rng.normal(0, 400000, shape),
+        'randn': lambda rng, shape: rng.standard_normal(shape)
+    }
+
+    def __init__(self, workers=None, blockRows=BLOCK_ROWS):
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.blockRows = blockRows
+
+    @staticmethod
+    def block_rng(seed, index):
+        return np.random.default_rng([seed, index])
+
+    @staticmethod
+    def generate_block(header, index, maxZeros=0):
+        """
+        Deterministically generates one row-block of an exercise.
+        :param header: ExerciseHeader describing the exercise (seed, distribution, shape, dtype, blockRows)
+        :param index: block index
+        :param maxZeros: upper bound of entries zeroed in this block, drawn from the block stream
+        :return: array of shape (block rows, cols)
+        """
+        if header.distribution not in ExerciseGenerator.DISTRIBUTIONS:
+            raise RuntimeError("Unknown exercise distribution %s." % header.distribution)
+        start, end = header.block_range(index)
+        rng = ExerciseGenerator.block_rng(header.seed, index)
+        block = ExerciseGenerator.DISTRIBUTIONS[header.distribution](rng, (end - start, header.shape[1]))
+        if maxZeros > 0:
+            count = rng.integers(0, maxZeros + 1)
+            block.reshape(-1)[rng.integers(0, block.size, count)] = 0
+        return block.astype(header.dtype, copy=False)
+
+    @staticmethod
+    def _write_block(args):
+        path, header, index, maxZeros = args
+        block = ExerciseGenerator.generate_block(header, index, maxZeros)
+        start, _ = header.block_range(index)
+        with open(path, "r+b") as f:
+            f.seek(header.payloadOffset + start * header.shape[1] * header.dtype.itemsize)
+            f.write(block.data)
+        return index, ExerciseFormat.checksum(block)
+
+    def generate(self, path, shape, seed, distribution='1M', dtype=np.float64, maxZeros=0):
+        """
+        Writes a new exercise to path.
+        :param path: output file
+        :param shape: (rows, cols)
+        :param seed: non-negative generator seed, stored in the header
+        :param distribution: key of DISTRIBUTIONS
+        :param dtype: element type stored on disk
+        :param maxZeros: upper bound of zeroed entries across the whole matrix, spread evenly over blocks
+        :return: the written ExerciseHeader
+        """
+        header = ExerciseFormat.new_header(shape, dtype, seed, distribution, self.blockRows)
+        blockZeros = -(-maxZeros // header.block_count)
+        with open(path, "wb") as f:
+            f.truncate(header.payloadOffset + header.payload_size)
+
+        tasks = [(path, header, index, blockZeros) for index in range(header.block_count)]
+        if self.workers <= 1:
+            results = map(ExerciseGenerator._write_block, tasks)
+            self._collect(header, results)
+        else:
+            with multiprocessing.Pool(self.workers) as pool:
+                self._collect(header, pool.imap_unordered(ExerciseGenerator._write_block, tasks))
+
+        ExerciseFormat.write_header(path, header)
+        print(Fore.CYAN + "Generated %s: %s" % (path, header))
+        return header
+
+    @staticmethod
+    def _collect(header, results):
+        for index, checksum in results:
+            header.checksums[index] = checksum
@@ -0,0 +1,119 @@
+import os
+import re
+import mmap
+
+import numpy as np
+
+from colorama import Fore
+
+from src.exercises.exercise_format import ExerciseFormat
+from src.exercises.virtual_exercise import VirtualExercise
+
+
+class ExerciseLoader:
+    """
+    Loads exercise matrices from disk or from downloaded buffers.
+
+    Files in the ExerciseFormat are self-describing: shape and dtype come from the header and the payload is mapped at
+    its aligned offset. Legacy raw dumps fall back to float64 and a shape parsed from the file name.
+
+    The default mode maps the file copy-on-write (np.memmap, mode 'c'). Nothing is read upfront, pages are faulted
+    in by the kernel on first touch and the returned array is still writeable: writes land in private pages and never
+    reach the file. This replaces the read() -> frombuffer() -> copy() chain, which kept ~3 copies of every matrix
+    alive at peak.
+
+    Note: with mmap loading the first operation touching the matrix pays for the disk read. Call #prefault before
+    timing anything if only compute time should be measured.
+    """
+
+    DTYPE = np.float64
+
+    # Exercise files are named <prefix><cols>x<rows>_<index>_<type>_<count>.dat, see MatrixSizeExperiment
+    SHAPE_PATTERN = re.compile(r"(\d+)x(\d+)")
+
+    @staticmethod
+    def load(path, shape=None, dtype=DTYPE, mmap=True, verify=False):
+        """
+        Loads an exercise matrix.
+        :param path: exercise file path, or a VirtualExercise spec
+        :param shape: matrix shape of a legacy raw file. Inferred from the file name, or assumed square, when missing
+        :param dtype: element type of a legacy raw file
+        :param mmap: map the file copy-on-write instead of reading it into memory
+        :param verify: check every block checksum before returning (ExerciseFormat files only)
+        :return: writeable 2D array
+        """
+        if VirtualExercise.is_spec(path):
+            print(Fore.CYAN + "Generating virtual matrix %s..." % path)
+            return VirtualExercise.from_spec(path).materialize()
+        header = ExerciseFormat.read_header(path)
+        offset = 0
+        if header is not None:
+            shape, dtype, offset = header.shape, header.dtype, header.payloadOffset
+        elif shape is None:
+            shape = ExerciseLoader.infer_shape(path, dtype)
+        print(Fore.CYAN + "Loading matrix %s (%dx%d, %s)..." % (path, shape[0], shape[1], "mmap" if mmap else "eager"))
+        if mmap:
+            m = np.memmap(path, dtype=dtype, mode='c', shape=tuple(shape), offset=offset)
+        else:
+            # fromfile reads straight into a fresh, writeable array: one copy instead of three
+            m = np.fromfile(path, dtype=dtype, count=shape[0] * shape[1], offset=offset).reshape(shape)
+        if verify and header is not None:
+            ExerciseLoader.check(m, header, path)
+        return m
+
+    @staticmethod
+    def from_bytes(data, shape=None, dtype=DTYPE, verify=False):
+        """
+        Wraps a downloaded exercise without copying it. The result is read-only when data is immutable (bytes), and
+        writeable for bytearray/memoryview buffers.
+        :param data: raw exercise payload, or a full ExerciseFormat file
+        :param shape: matrix shape of a legacy raw payload, assumed square when missing
+        :param dtype: element type of a legacy raw payload
+        :param verify: check every block checksum before returning (ExerciseFormat payloads only)
+        :return: 2D array sharing memory with data
+        """
+        header = ExerciseFormat.parse_header(data)
+        if header is not None:
+            m = np.frombuffer(data, dtype=header.dtype, count=header.shape[0] * header.shape[1],
+                              offset=header.payloadOffset).reshape(header.shape)
+            if verify:
+                ExerciseLoader.check(m, header, "buffer")
+            return m
+        if shape is None:
+            shape = ExerciseLoader.square_shape(len(data) // np.dtype(dtype).itemsize)
+        return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+    @staticmethod
+    def check(m, header, source):
+        corrupted = ExerciseFormat.verify(m, header)
+        if corrupted:
+            raise RuntimeError("Exercise %s failed checksum verification on blocks %s." % (source, corrupted))
+
+    @staticmethod
+    def infer_shape(path, dtype=DTYPE):
+        count = os.path.getsize(path) // np.dtype(dtype).itemsize
+        match = ExerciseLoader.SHAPE_PATTERN.search(os.path.basename(path))
+        if match is not None:
+            cols, rows = int(match.group(1)), int(match.group(2))
+            if rows * cols == count:
+                return rows, cols
+        return ExerciseLoader.square_shape(count)
+
+    @staticmethod
+    def square_shape(count):
+        side = int(np.sqrt(count))
+        if side * side != count:
+            raise RuntimeError("Cannot infer the shape of a %d element exercise, pass it explicitly." % count)
+        return side, side
+
+    @staticmethod
+    def prefault(m):
+        """
+        Touches one element per page so a memory-mapped matrix is resident before it gets benchmarked.
+        :param m: matrix returned by #load
+        :return: m
+        """
+        flat = m.reshape(-1)
+        step = max(1, mmap.PAGESIZE // m.itemsize)
+        flat[::step].sum()
+        return m
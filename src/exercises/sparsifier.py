@@ -0,0 +1,129 @@
+import numpy as np
+
+from colorama import Fore
+
+
+class Sparsifier:
+    """
+    Vectorized sparsity injection. #sparsify zeroes entries of a matrix in place until its density (fraction of
+    non-zero entries) reaches a target, following one of PATTERNS:
+
+    * uniform: random individual entries, exact to the entry
+    * rows / columns: random whole rows / columns, exact to the row / column
+    * block_diagonal: keeps only square-ish blocks on the diagonal, as many blocks as needed to get close to density
+    * banded: keeps only the band |i - j| <= w, with w picked to get as close to density as possible
+
+    uniform, rows and columns only pick among entries that are still non-zero, so calling #sparsify repeatedly with
+    decreasing densities builds a cumulative sweep without restoring the matrix in between. Structural patterns
+    are idempotent masks. Every call returns the achieved density, and prints it when verbose.
+    """
+
+    PATTERNS = ['uniform', 'rows', 'columns', 'block_diagonal', 'banded']
+
+    # Rows masked at once by the structural patterns, bounds the temporary mask size
+    CHUNK_ROWS = 1024
+    # Entries sampled at once by the uniform pattern, bounds its index arrays
+    CHUNK_ENTRIES = 1024 * 1024
+
+    def __init__(self, seed=None, verbose=False):
+        self.rng = np.random.default_rng(seed)
+        self.verbose = verbose
+
+    @staticmethod
+    def density(m):
+        return np.count_nonzero(m) / m.size
+
+    def sparsify(self, m, density, pattern='uniform'):
+        """
+        Zeroes entries of m in place.
+        :param m: writeable 2D matrix
+        :param density: target fraction of non-zero entries, in [0, 1]
+        :param pattern: one of PATTERNS
+        :return: achieved density
+        """
+        if pattern not in self.PATTERNS:
+            raise RuntimeError("Unknown sparsity pattern %s, expected one of %s." % (pattern, self.PATTERNS))
+        density = min(1.0, max(0.0, density))
+        getattr(self, "_sparsify_" + pattern)(m, density)
+        achieved = self.density(m)
+        if self.verbose:
+            print(Fore.CYAN + "Sparsified %dx%d matrix (%s): target density %.4f, achieved %.4f" %
+                  (m.shape[0], m.shape[1], pattern, density, achieved))
+        return achieved
+
+    def _sparsify_uniform(self, m, density):
+        # A reshape of a non-contiguous matrix (transposed, sliced) is a copy: read those through m.flat and write
+        # back by index instead
+        flat = m.reshape(-1) if m.flags.c_contiguous else m.flat
+        starts = range(0, m.size, self.CHUNK_ENTRIES)
+        live = np.array([np.count_nonzero(flat[start:start + self.CHUNK_ENTRIES]) for start in starts],
+                        dtype=np.int64)
+        count = int(live.sum()) - int(round(density * m.size))
+        if count <= 0:
+            return
+        # Split the exact count among chunks as a draw without replacement would, then sample within each chunk,
+        # instead of permuting indices of the whole matrix at once
+        picks = self.rng.multivariate_hypergeometric(live, count, method='marginals')
+        for start, pick in zip(starts, picks):
+            if pick:
+                candidates = np.flatnonzero(flat[start:start + self.CHUNK_ENTRIES])
+                chosen = start + candidates[self.rng.choice(candidates.size, pick, replace=False)]
+                if m.flags.c_contiguous:
+                    flat[chosen] = 0
+                else:
+                    m[np.unravel_index(chosen, m.shape)] = 0
+
+    def _sparsify_rows(self, m, density):
+        self._zero_lines(m, density)
+
+    def _sparsify_columns(self, m, density):
+        self._zero_lines(m.T, density)
+
+    def _zero_lines(self, m, density):
+        live = np.flatnonzero(np.any(m != 0, axis=1))
+        count = live.size - int(round(density * m.shape[0]))
+        if count > 0:
+            m[live[self.rng.choice(live.size, count, replace=False)]] = 0
+
+    def _sparsify_block_diagonal(self, m, density):
+        rows, cols = m.shape
+        if density == 0:
+            m[...] = 0
+            return
+        blocks = max(1, min(rows, cols, int(round(1 / density))))
+        rowBounds = np.linspace(0, rows, blocks + 1).astype(int)
+        colBounds = np.linspace(0, cols, blocks + 1).astype(int)
+        for b in range(blocks):
+            m[rowBounds[b]:rowBounds[b + 1], :colBounds[b]] = 0
+            m[rowBounds[b]:rowBounds[b + 1], colBounds[b + 1]:] = 0
+
+    def _sparsify_banded(self, m, density):
+        rows, cols = m.shape
+        if density == 0:
+            m[...] = 0
+            return
+        width = self.band_width(rows, cols, density)
+        columnIndex = np.arange(cols)
+        for start in range(0, rows, self.CHUNK_ROWS):
+            rowIndex = np.arange(start, min(rows, start + self.CHUNK_ROWS))
+            m[start:start + rowIndex.size][np.abs(rowIndex[:, None] - columnIndex[None, :]) > width] = 0
+
+    @staticmethod
+    def band_size(rows, cols, width):
+        i = np.arange(rows)
+        return int(np.sum(np.clip(np.minimum(cols - 1, i + width) - np.maximum(0, i - width) + 1, 0, None)))
+
+    @staticmethod
+    def band_width(rows, cols, density):
+        """
+        Binary searches the smallest band half-width whose density is >= the target.
+        """
+        target = density * rows * cols
+        lo, hi = 0, max(rows, cols)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if Sparsifier.band_size(rows, cols, mid) >= target:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from src.exercises.exercise_format import ExerciseFormat
+from src.exercises.exercise_generator import ExerciseGenerator
+
+
+class VirtualExercise:
+    """
+    An exercise fully defined by (seed, shape, distribution, dtype), generated lazily instead of read from disk.
+
+    Row-blocks are produced on demand by ExerciseGenerator#generate_block, so a virtual exercise is bit-identical to
+    the file ExerciseGenerator would write for the same parameters. Recently used blocks are kept in an LRU cache
+    bounded by cacheBytes. Row tiles only generate the blocks they overlap; column tiles need every row-block, since
+    streams run along rows.
+
+    Numpy consumes it through __array__, so np.dot(VirtualExercise(...), m) works as with a loaded matrix. Exercise
+    specs look like "virtual:<distribution>:<seed>:<rows>x<cols>" and can be passed wherever a path is expected by
+    ExerciseLoader#load.
+    """
+
+    SPEC_PREFIX = "virtual:"
+    CACHE_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, seed, shape, distribution='1M', dtype=np.float64, blockRows=ExerciseFormat.BLOCK_ROWS,
+                 cacheBytes=CACHE_BYTES, maxZeros=0):
+        self.header = ExerciseFormat.new_header(shape, dtype, seed, distribution, blockRows)
+        self.cacheBytes = cacheBytes
+        self.blockZeros = -(-maxZeros // self.header.block_count)
+        self.cache = OrderedDict()
+        self.cachedBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_spec(path):
+        return isinstance(path, str) and path.startswith(VirtualExercise.SPEC_PREFIX)
+
+    @staticmethod
+    def from_spec(spec, **kwargs):
+        _, distribution, seed, shape = spec.split(':')
+        rows, cols = shape.split('x')
+        return VirtualExercise(int(seed), (int(rows), int(cols)), distribution, **kwargs)
+
+    @property
+    def spec(self):
+        return "%s%s:%d:%dx%d" % (self.SPEC_PREFIX, self.header.distribution, self.header.seed,
+                                  self.header.shape[0], self.header.shape[1])
+
+    @property
+    def shape(self):
+        return self.header.shape
+
+    @property
+    def dtype(self):
+        return self.header.dtype
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def nbytes(self):
+        return self.header.payload_size
+
+    def __len__(self):
+        return self.header.shape[0]
+
+    def block(self, index):
+        """
+        :param index: row-block index
+        :return: the (read-only) generated block, served from the cache when possible
+        """
+        if index in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(index)
+            return self.cache[index]
+        self.misses += 1
+        block = ExerciseGenerator.generate_block(self.header, index, self.blockZeros)
+        block.flags.writeable = False
+        if block.nbytes <= self.cacheBytes:
+            self.cache[index] = block
+            self.cachedBytes += block.nbytes
+            while self.cachedBytes > self.cacheBytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cachedBytes -= evicted.nbytes
+        return block
+
+    def tile(self, rowStart, rowEnd, colStart=0, colEnd=None):
+        """
+        Builds a (rowEnd - rowStart) x (colEnd - colStart) tile of the exercise.
+        :return: new, writeable array
+        """
+        colEnd = self.header.shape[1] if colEnd is None else colEnd
+        rowEnd = min(rowEnd, self.header.shape[0])
+        out = np.empty((max(0, rowEnd - rowStart), max(0, colEnd - colStart)), dtype=self.dtype)
+        if out.size == 0:
+            return out
+        for index in range(rowStart // self.header.blockRows, (rowEnd - 1) // self.header.blockRows + 1):
+            start, end = self.header.block_range(index)
+            lo, hi = max(start, rowStart), min(end, rowEnd)
+            out[lo - rowStart:hi - rowStart] = self.block(index)[lo - start:hi - start, colStart:colEnd]
+        return out
+
+    def materialize(self):
+        return self.tile(0, self.header.shape[0])
+
+    def __array__(self, dtype=None, copy=None):
+        m = self.materialize()
+        return m if dtype is None else m.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        rows, cols = (key if isinstance(key, tuple) else (key, slice(None)))
+        if isinstance(rows, (int, np.integer)):
+            row = int(rows) % self.header.shape[0]
+            return self.tile(row, row + 1)[0][cols]
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.header.shape[0])
+            if step == 1 and isinstance(cols, slice) and cols.step in (None, 1):
+                colStart, colEnd, _ = cols.indices(self.header.shape[1])
+                return self.tile(start, stop, colStart, colEnd)
+            selected = range(start, stop, step)
+            if len(selected) == 0:
+                return self.tile(0, 0)[:, cols]
+            lo = min(selected)
+            return self.tile(lo, max(selected) + 1)[[r - lo for r in selected]][:, cols]
+        return self.materialize()[rows, cols]
+
+    def __repr__(self):
+        return "VirtualExercise(%s)" % self.spec
@@ -4,3 +4,5 @@ from src.experiments.matrix_density import MatrixDensityExperiment
 from src.experiments.arweave_experiment import ARWeaveExperiment
 from src.experiments.s3_experiment import S3Experiment
 from src.experiments.consistent_hashing_experiment import ConsistentHashExp
+from src.experiments.throughput_experiment import SolverThroughputExperiment
+from src.experiments.verification_experiment import VerificationExperiment
@@ -1,9 +1,17 @@
+import os
 import time
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
+import requests
 
 from src.experiments import Experiment
+from src.exercises import ExerciseLoader, ExerciseCache
+from src.solvers import SolutionCache, MiningPipeline, StreamingSolver
+from src.verification import FreivaldsVerifier
+from src.storage import ArweaveDownloader, ArweaveUploader, ConfirmationTracker
 
 from arweave.arweave_lib import Wallet, Transaction
 from arweave.transaction_uploader import get_uploader
@@ -69,12 +77,73 @@ class ARWeaveExperiment(Experiment):
     estimate verification time spent per solved exercise (verification on any other exercise, prefetched).
 
     These numbers show clearly that no miner has any incentive to verify exercises it didn't cache.
+    Note: this assumed verification costs a full dot. With VALIDATION_EXP, run_blocktime checks every product with
+    FreivaldsVerifier, which is O(n^2) per round and reports verification time next to solve time.
+
+    The blocktime numbers above are a serial sum: download both exercises, then solve. With PIPELINE, run_pipeline mines
+    the same blocks through a MiningPipeline that downloads the next exercises while the current one solves, and
+    reports the steady-state proofs per hour with network and CPU idle time.
+
+    Data of a transaction becomes downloadable chunk by chunk, so a miner doesn't need the whole of m0 to start either.
+    With STREAMING, run_streaming keeps m1 resident and multiplies every row-block of m0 as it arrives from the gateway
+    (StreamingSolver), resuming with a Range request after a dropped connection.
+
+    The download times above come from a single serial request per transaction, which restarts from zero when it
+    dies. With CHUNKED_DOWNLOAD, exercises are fetched chunk by chunk from ARWEAVE_GATEWAY, CHUNK_CONCURRENCY requests
+    at a time, into DOWNLOAD_DIR (ArweaveDownloader): failed chunks are retried alone and an interrupted download
+    resumes from the chunks it already has. ARWEAVE_GATEWAY can point at a LocalGateway serving exercises from disk.
+
+    The upload times above posted one chunk after the other. Uploads now keep a window of chunk requests in flight
+    (ArweaveUploader), starting at UPLOAD_WINDOW and adapting to chunk latencies up to UPLOAD_MAX_WINDOW. Completed
+    chunks are recorded next to the uploaded file (<file>.upload) until the upload completes, so running an interrupted
+    upload again resumes the same transaction with the chunks that are missing.
+
+    Downloads used to wait for confirmation polling every 5 seconds, one transaction at a time. A ConfirmationTracker
+    now polls with adaptive intervals (CONFIRMATION_MIN_INTERVAL up to CONFIRMATION_MAX_INTERVAL, everyone again when
+    a new block shows up). With CONFIRMATIONS, run_confirmations watches all of TRACK_TRANSACTIONS at once, starts the
+    download of each as soon as it confirms, and stores the confirmation latency distribution.
     """
 
     isUpload = False
 
     VALIDATION_EXP = False
 
+    # Reuse solutions of exercise pairs already solved (run_blocktime draws from 3 exercises with replacement)
+    SOLUTION_CACHE = False
+
+    # Overlap downloads with solving (MiningPipeline), prefetching up to PREFETCH blocks in PIPELINE_MEMORY_BUDGET
+    PIPELINE = False
+    PREFETCH = MiningPipeline.PREFETCH
+    PIPELINE_MEMORY_BUDGET = MiningPipeline.MEMORY_BUDGET
+    FETCH_WORKERS = MiningPipeline.FETCH_WORKERS
+    BLOCKS = 20
+
+    # Multiply m0 row-blocks while they download, STREAM_CHUNK bytes per read
+    STREAMING = False
+    STREAM_CHUNK = 1024 * 1024
+
+    # Read exercises through the shared ExerciseCache instead of downloading them every time
+    EXERCISE_CACHE = False
+    EXERCISE_CACHE_DIR = ExerciseCache.CACHE_DIR
+    EXERCISE_CACHE_BYTES = ExerciseCache.MAX_BYTES
+
+    # Download transaction data by chunk offset, CHUNK_CONCURRENCY chunks at a time, resuming from DOWNLOAD_DIR
+    CHUNKED_DOWNLOAD = False
+    CHUNK_CONCURRENCY = ArweaveDownloader.CONCURRENCY
+    DOWNLOAD_DIR = "./resources/arweave_downloads"
+    # Gateway of the uploads, and of the chunked and streaming downloads
+    ARWEAVE_GATEWAY = ArweaveDownloader.GATEWAY
+
+    # Chunk uploads in flight, adapted to chunk latencies between 1 and UPLOAD_MAX_WINDOW
+    UPLOAD_WINDOW = ArweaveUploader.WINDOW
+    UPLOAD_MAX_WINDOW = ArweaveUploader.MAX_WINDOW
+
+    # Watch TRACK_TRANSACTIONS (comma separated, TRANSACTIONS when None) and download each one as soon as it confirms
+    CONFIRMATIONS = False
+    TRACK_TRANSACTIONS = None
+    CONFIRMATION_MIN_INTERVAL = ConfirmationTracker.MIN_INTERVAL
+    CONFIRMATION_MAX_INTERVAL = ConfirmationTracker.MAX_INTERVAL
+
     # Don't search for it, it's not uploaded anywhere, and if it is it's empty
     ARWEAVE_WALLET_UP = './resources/ar_wallet_upload.json'
     ARWEAVE_WALLET_DOWN = './resources/ar_wallet_download.json'
@@ -95,10 +164,24 @@ class ARWeaveExperiment(Experiment):
         super().__init__()
         self.isUpload = isUpload
         self.wallet = None
+        self.exerciseCache = None
+        self.downloader = None
+        self.uploader = None
+        self.tracker = None
+        # Transactions already seen confirmed, and the one thread polling each pending one (see #wait_confirmed)
+        self.confirmed = set()
+        self.confirming = {}
+        self.confirmLock = threading.Lock()
 
     def run(self):
         if self.isUpload:
             self.run_upload()
+        elif self.PIPELINE:
+            self.run_pipeline()
+        elif self.STREAMING:
+            self.run_streaming()
+        elif self.CONFIRMATIONS:
+            self.run_confirmations()
         else:
             self.run_download()
             # dTimes, mTimes, tTimes = self.run_blocktime()
@@ -117,15 +200,23 @@ class ARWeaveExperiment(Experiment):
         #               1651410091.3195136, 1651410100.2002163, 1651410109.0112007, 1651410117.8183048,
         #               1651410126.6072736, 1651410135.4188175, 1651410144.659148, 1651410153.5936923, 1651410162.4852388,
         #               1651410171.3905602]
-        downloadTimes = [639.4178206920624, 136.5779790878296, 337.3826653957367, 522.2032635211945, 611.8636255264282, 277.1403434276581, 553.8392863273621, 1002.3141272068024, 10.244030237197876, 9.147528171539307, 8.985027313232422, 9.122527122497559, 9.536528587341309, 9.46953010559082, 9.449026584625244, 9.999029397964478, 9.259030818939209, 9.22102665901184, 9.625528812408447, 9.389517307281494, 9.06851601600647, 9.203016519546509, 9.611018419265747, 9.01601791381836, 8.942518472671509, 9.275516271591187, 9.190516471862793, 9.559518098831177, 9.297516822814941, 9.339019060134888, 9.100017547607422, 8.952518939971924, 9.651018142700195, 9.08851408958435, 9.191515684127808, 9.39601731300354]
-        timestamps = [1651412797.6914392, 1651413437.1142588, 1651413573.6977386, 1651413911.0904038, 1651414433.3321674, 1651415045.2217925, 1651415322.362638, 1651415876.2039237, 1651416878.5710511, 1651416888.8680816, 1651416898.069109, 1651416907.1071362, 1651416916.283664, 1651416925.8741934, 1651416935.400223, 1651416944.9022503, 1651416954.9547808, 1651416964.2833095, 1651416973.559337, 1651416983.2513628, 1651416992.6948802, 1651417001.8173976, 1651417011.0739145, 1651417020.7374332, 1651417029.8059502, 1651417038.8084683, 1651417048.1394868, 1651417057.3865025, 1651417066.9995217, 1651417076.3515387, 1651417085.7450562, 1651417094.8985739, 1651417103.9045908, 1651417113.6116126, 1651417122.7541285, 1651417132.002645]
+        records = self.store.results(sweep='download')
+        downloadTimes = [self.download_record(r)[0] for r in records]
+        timestamps = [self.download_record(r)[1] for r in records]
+        uploadComplete = None
+        if not records:
+            # Downloads measured before the result store existed
+            downloadTimes = [639.4178206920624, 136.5779790878296, 337.3826653957367, 522.2032635211945, 611.8636255264282, 277.1403434276581, 553.8392863273621, 1002.3141272068024, 10.244030237197876, 9.147528171539307, 8.985027313232422, 9.122527122497559, 9.536528587341309, 9.46953010559082, 9.449026584625244, 9.999029397964478, 9.259030818939209, 9.22102665901184, 9.625528812408447, 9.389517307281494, 9.06851601600647, 9.203016519546509, 9.611018419265747, 9.01601791381836, 8.942518472671509, 9.275516271591187, 9.190516471862793, 9.559518098831177, 9.297516822814941, 9.339019060134888, 9.100017547607422, 8.952518939971924, 9.651018142700195, 9.08851408958435, 9.191515684127808, 9.39601731300354]
+            timestamps = [1651412797.6914392, 1651413437.1142588, 1651413573.6977386, 1651413911.0904038, 1651414433.3321674, 1651415045.2217925, 1651415322.362638, 1651415876.2039237, 1651416878.5710511, 1651416888.8680816, 1651416898.069109, 1651416907.1071362, 1651416916.283664, 1651416925.8741934, 1651416935.400223, 1651416944.9022503, 1651416954.9547808, 1651416964.2833095, 1651416973.559337, 1651416983.2513628, 1651416992.6948802, 1651417001.8173976, 1651417011.0739145, 1651417020.7374332, 1651417029.8059502, 1651417038.8084683, 1651417048.1394868, 1651417057.3865025, 1651417066.9995217, 1651417076.3515387, 1651417085.7450562, 1651417094.8985739, 1651417103.9045908, 1651417113.6116126, 1651417122.7541285, 1651417132.002645]
+            uploadComplete = 1651415656
 
         fig, ax1 = plt.subplots(figsize=(7, 5))
         ax1.plot(range(len(downloadTimes)), downloadTimes, color='royalblue')
         # ax1.set_xticks(timestamps)
         # ax1.set_xticklabels(["%.1f" % ((x - 1651406098) / 60) for x in timestamps], rotation=90)  # 1651406098 is when Upload started.
         ax1.set_ylabel("Seconds to download exercise (760Mb)")
-        ax1.axvline(self.find_index(1651415656, timestamps), color='red')
+        if uploadComplete is not None:
+            ax1.axvline(self.find_index(uploadComplete, timestamps), color='red')
         # ax1.set_xlabel("Seconds since upload start")
         ax1.set_title("Repeated downloads over the same exercise")
         ax1.legend(['seconds to download', 'upload complete'])
@@ -141,19 +232,40 @@ class ARWeaveExperiment(Experiment):
         return i + 1
 
     def run_upload(self):
-        self.upload(self.M1_PATH)
+        self.harness.once("arweave upload", self.upload, self.M1_PATH, params={'file': self.M1_PATH})
+
+    @staticmethod
+    def download_record(record):
+        """
+        :return: (seconds, start timestamp) of a stored download, as put by the harness or by older runs
+        """
+        value = record['value']
+        if 'median' in value:
+            return value['median'], record['timestamp'] - value['median']
+        return value['time'], value['timestamp']
 
     def run_download(self):
-        times = []
-        timestamps = []
+        records = self.store.results(sweep='download')
+        times = [self.download_record(r)[0] for r in records]
+        timestamps = [self.download_record(r)[1] for r in records]
+        # Finish the round that was interrupted, then keep going
+        downloadRound = max([r['params']['round'] for r in records], default=0)
+        if records:
+            print(Fore.CYAN + "Resuming downloads at round %d after %d stored downloads." % (downloadRound,
+                                                                                          len(records)))
         while True:
             for tx in self.TRANSACTIONS:
+                params = {'sweep': 'download', 'round': downloadRound}
+                if self.store.results(sweep='download', round=downloadRound, tx=tx):
+                    continue
                 timestamps.append(time.time())
-                dTime, _ = self.download(tx)
+                # Persisted by the harness, with the sweep params
+                dTime, _ = self.download(tx, params)
                 print(Fore.CYAN + "Downloaded %s in %.2f seconds." % (self.TRANSACTIONS[tx], dTime))
                 times.append(dTime)
                 print(times)
                 print(timestamps)
+            downloadRound += 1
 
     def run_blocktime(self):
         exercises = ["gSFcJjCYtZ1OFZ3UteoIJ1UjZLUanMsS_O0XVYwPuHI", "LsKHq8uhwjhA_dxTQmxaCD9UL7_puQ_mvmWn6hgd2kE",
@@ -161,41 +273,149 @@ class ARWeaveExperiment(Experiment):
         dTimes = []
         mTimes = []
         tTimes = []
-
-        for i in range(20):
-            e1 = exercises[random.randint(0, len(exercises) - 1)]
-            e2 = exercises[random.randint(0, len(exercises) - 1)]
-            print(Fore.CYAN + "Starting block %d..." % i)
-            startTime = time.time()
-            _, e1 = self.download(e1)
-            _, e2 = self.download(e2)
-            dTime = time.time()
-            m1 = np.frombuffer(e1).reshape([10000, 10000])
-            m2 = np.frombuffer(e2).reshape([10000, 10000])
-            if self.VALIDATION_EXP:
-                i = random.randint(0, 10000)
-                j = random.randint(0, 10000)
-                res = np.dot(m1[i], m2[:, j])
+        vTimes = []
+        verifier = FreivaldsVerifier()
+        solutionCache = SolutionCache() if self.SOLUTION_CACHE else None
+
+        def block(params):
+            ex1 = exercises[random.randint(0, len(exercises) - 1)]
+            ex2 = exercises[random.randint(0, len(exercises) - 1)]
+            print(Fore.CYAN + "Starting block %d..." % params['block'])
+            startTime = time.perf_counter()
+            _, e1 = self.download(ex1)
+            _, e2 = self.download(ex2)
+            dTime = time.perf_counter()
+            m1 = ExerciseLoader.from_bytes(e1)
+            m2 = ExerciseLoader.from_bytes(e2)
+            if solutionCache is not None:
+                res = solutionCache.get_or_solve(ex1, ex2, lambda: np.dot(m1, m2))
             else:
                 res = np.dot(m1, m2)
-            mTime = time.time()
-            dTimes.append(dTime - startTime)
-            mTimes.append(mTime - dTime)
-            tTimes.append(mTime - startTime)
+            mTime = time.perf_counter()
+            vTime = None
+            if self.VALIDATION_EXP:
+                # Validators check the claimed product in O(n^2) instead of re-solving it
+                verifier.verify(m1, m2, res)
+                vTime = time.perf_counter() - mTime
+            return {'exercises': [ex1, ex2], 'dTime': dTime - startTime, 'mTime': mTime - dTime,
+                    'tTime': mTime - startTime, 'vTime': vTime}
+
+        points = [{'sweep': 'blocktime', 'block': i, 'validation': self.VALIDATION_EXP,
+                   'solutionCache': self.SOLUTION_CACHE} for i in range(20)]
+        for _, times in self.store.sweep(points, block):
+            dTimes.append(times['dTime'])
+            mTimes.append(times['mTime'])
+            tTimes.append(times['tTime'])
+            if times['vTime'] is not None:
+                vTimes.append(times['vTime'])
         print("DTimes: ", dTimes)
         print("MTimes: ", mTimes)
         print("TTimes: ", tTimes)
+        if self.VALIDATION_EXP:
+            print("VTimes: ", vTimes)
+        if solutionCache is not None:
+            print("Solution cache: ", solutionCache.stats())
 
         return dTimes, mTimes, tTimes
 
+    def run_confirmations(self):
+        txIds = self.TRACK_TRANSACTIONS or list(self.TRANSACTIONS)
+        # Not self.tracker: the downloads wait on that one too, and would replace its stats
+        tracker = ConfirmationTracker(self.ARWEAVE_GATEWAY, self.CONFIRMATION_MIN_INTERVAL,
+                                      self.CONFIRMATION_MAX_INTERVAL)
+        downloads = {}
+        with ThreadPoolExecutor(self.FETCH_WORKERS) as executor:
+            def confirmed(txId, status):
+                # Called from the tracker's event loop, the download itself runs on the executor
+                self.confirmed.add(txId)
+                downloads[txId] = executor.submit(self.download, txId)
+
+            tracker.wait(txIds, confirmed)
+            downloadTimes = {txId: future.result()[0] for txId, future in downloads.items()}
+        stats = dict(tracker.stats, downloadTimes=downloadTimes)
+        self.store.put({'sweep': 'confirmations', 'transactions': txIds, 'run': time.time()}, stats)
+        return stats
+
+    def run_pipeline(self):
+        exercises = ["gSFcJjCYtZ1OFZ3UteoIJ1UjZLUanMsS_O0XVYwPuHI", "LsKHq8uhwjhA_dxTQmxaCD9UL7_puQ_mvmWn6hgd2kE",
+                     "pI8Ose_wiAofAbqCFg9Yry4Z0jR45ubEPpHZTv8h8CI"]
+        jobs = [(random.choice(exercises), random.choice(exercises)) for _ in range(self.BLOCKS)]
+        verifier = FreivaldsVerifier()
+
+        def solve(m1, m2):
+            res = np.dot(m1, m2)
+            if self.VALIDATION_EXP:
+                verifier.verify(m1, m2, res)
+            return float(res[0, 0])
+
+        pipeline = MiningPipeline(lambda tx: ExerciseLoader.from_bytes(self.read(tx)), solve, self.PREFETCH,
+                                  self.PIPELINE_MEMORY_BUDGET, self.FETCH_WORKERS)
+        pipeline.run(jobs)
+        self.store.put({'sweep': 'pipeline', 'blocks': self.BLOCKS, 'prefetch': self.PREFETCH,
+                        'memoryBudget': self.PIPELINE_MEMORY_BUDGET, 'fetchWorkers': self.FETCH_WORKERS,
+                        'validation': self.VALIDATION_EXP, 'run': time.time()}, pipeline.stats)
+        self.plot_pipeline(pipeline.stats)
+        return pipeline.stats
+
+    def run_streaming(self):
+        m0Tx = "gSFcJjCYtZ1OFZ3UteoIJ1UjZLUanMsS_O0XVYwPuHI"
+        m1Tx = "LsKHq8uhwjhA_dxTQmxaCD9UL7_puQ_mvmWn6hgd2kE"
+        _, e2 = self.download(m1Tx)
+        m1 = ExerciseLoader.from_bytes(e2)
+        solver = StreamingSolver(m1)
+        if self.exerciseCache is not None:
+            solver.solve(lambda offset: self.exerciseCache.stream('arweave', m0Tx, lambda o: self.stream(m0Tx, o),
+                                                                  offset, lambda: self.data_size(m0Tx)))
+        else:
+            solver.solve(lambda offset: self.stream(m0Tx, offset))
+        stats = solver.stats
+        print(Fore.CYAN + "Streaming solve took %.2f seconds (%.2f downloading, %.2f computing), a serial "
+                          "download+solve would take %.2f seconds." % (stats['wallTime'], stats['streamTime'],
+                                                                      stats['solveTime'],
+                                                                      stats['streamTime'] + stats['solveTime']))
+        self.store.put({'sweep': 'streaming', 'tx': m0Tx, 'run': time.time()}, stats)
+        return stats
+
+    def stream(self, tx_id, offset=0):
+        """
+        Streams the data of a transaction from the gateway, starting at offset.
+        :return: generator of bytes chunks
+        """
+        response = requests.get("%s/%s" % (self.ARWEAVE_GATEWAY, tx_id), stream=True, timeout=60,
+                                headers={'Range': 'bytes=%d-' % offset} if offset else None)
+        response.raise_for_status()
+        skip = offset if offset and response.status_code != 206 else 0
+        if skip:
+            print(Fore.YELLOW + "Gateway ignored the range request, skipping %d bytes." % skip)
+        for chunk in response.iter_content(self.STREAM_CHUNK):
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk = chunk[dropped:]
+                skip -= dropped
+            if chunk:
+                yield chunk
+
+    @staticmethod
+    def plot_pipeline(stats):
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.bar([0, 1], [stats['serialTime'], stats['wallTime']], color=['lightsteelblue', 'royalblue'], width=0.4)
+        ax1.set_xticks([0, 1])
+        ax1.set_xticklabels(["serial download+solve", "pipelined\n(network idle %.0f%%, CPU idle %.0f%%)" %
+                             (100 * stats['networkIdle'], 100 * stats['cpuIdle'])])
+        ax1.set_ylabel("Seconds for %d blocks" % stats['jobs'])
+        ax1.set_title("Pipelined mining: %.1f proofs/hour" % stats['proofsPerHour'])
+        fig.show()
+
     @staticmethod
     def plot_block_times(dTimes, mTimes, tTimes):
-        dTimes = [19.341373920440674, 18.62544059753418, 19.3857364654541, 31.204410791397095, 31.55591630935669,
-                 24.566789150238037, 18.610035181045532, 25.6288058757782, 24.941190242767334, 25.477713108062744,
-                 18.955212354660034, 30.861459255218506, 30.648075819015503, 19.22837543487549, 24.243753671646118,
-                 18.71207308769226, 18.618319511413574, 18.065333127975464, 18.27892017364502, 18.405789136886597]
-        mTimes = [4.761505842208862, 4.471505165100098, 4.4330055713653564, 4.464005708694458, 4.499505281448364, 4.437505006790161, 4.4165050983428955, 4.4165050983428955, 4.4330055713653564, 4.488003730773926, 4.4845051765441895, 4.551005125045776, 4.487504959106445, 4.459005117416382, 4.69600510597229, 4.570005655288696, 4.562505483627319, 4.543005704879761, 4.5405049324035645, 4.565004587173462]
-        tTimes = [24.102879762649536, 23.096945762634277, 23.818742036819458, 35.66841650009155, 36.055421590805054, 29.0042941570282, 23.026540279388428, 30.045310974121094, 29.37419581413269, 29.96571683883667, 23.439717531204224, 35.41246438026428, 35.13558077812195, 23.68738055229187, 28.939758777618408, 23.282078742980957, 23.180824995040894, 22.608338832855225, 22.819425106048584, 22.97079372406006]
+        if not tTimes:
+            # Block times measured before the result store existed
+            dTimes = [19.341373920440674, 18.62544059753418, 19.3857364654541, 31.204410791397095, 31.55591630935669,
+                     24.566789150238037, 18.610035181045532, 25.6288058757782, 24.941190242767334, 25.477713108062744,
+                     18.955212354660034, 30.861459255218506, 30.648075819015503, 19.22837543487549, 24.243753671646118,
+                     18.71207308769226, 18.618319511413574, 18.065333127975464, 18.27892017364502, 18.405789136886597]
+            mTimes = [4.761505842208862, 4.471505165100098, 4.4330055713653564, 4.464005708694458, 4.499505281448364, 4.437505006790161, 4.4165050983428955, 4.4165050983428955, 4.4330055713653564, 4.488003730773926, 4.4845051765441895, 4.551005125045776, 4.487504959106445, 4.459005117416382, 4.69600510597229, 4.570005655288696, 4.562505483627319, 4.543005704879761, 4.5405049324035645, 4.565004587173462]
+            tTimes = [24.102879762649536, 23.096945762634277, 23.818742036819458, 35.66841650009155, 36.055421590805054, 29.0042941570282, 23.026540279388428, 30.045310974121094, 29.37419581413269, 29.96571683883667, 23.439717531204224, 35.41246438026428, 35.13558077812195, 23.68738055229187, 28.939758777618408, 23.282078742980957, 23.180824995040894, 22.608338832855225, 22.819425106048584, 22.97079372406006]
 
         fig, ax1 = plt.subplots(figsize=(7, 5))
         ax1.plot(range(len(dTimes)), dTimes, color='lightsteelblue')
@@ -220,29 +440,44 @@ class ARWeaveExperiment(Experiment):
         """
         startTime = time.time()
         print(Fore.YELLOW + "[UpThread] Starting upload ", startTime)
+        progressPath = filePath + ".upload"
+        chunks = []
         with open(filePath, "rb", buffering=0) as file_handler:
             tx = Transaction(self.wallet, file_handler=file_handler, file_path=filePath)
+            tx.api_url = self.ARWEAVE_GATEWAY
             tx.add_tag('Content-Type', 'application/dat')
-            tx.sign()
-
-            try:
+            tx.prepare_chunks()
+            dataRoot = tx.data_root.decode()
+            total = len(tx.chunks['chunks'])
+            pending = ArweaveUploader.pending(progressPath)
+            if pending is not None and pending.get('dataRoot') == dataRoot:
+                # The header of that transaction was accepted already, only its chunks are missing
+                tx.id = pending['tx']
+                print(Fore.CYAN + "Resuming tx: %s" % tx.id)
+            else:
+                tx.sign()
                 uploader = get_uploader(tx, file_handler)
+                # Posts the header, with the data itself when it fits in a single chunk
+                uploader.post_transaction(tx.get_chunk(0))
                 print(Fore.CYAN + "Committed tx: %s" % tx.id)
-                chunks = []
-                while not uploader.is_complete:
-                    cTime = time.time()
-                    uploader.upload_chunk()
-                    chunks.append(time.time() - cTime)
-
-                    print(Fore.CYAN + "{}% complete, {}/{}".format(
-                        uploader.pct_complete, uploader.uploaded_chunks, uploader.total_chunks
-                    ))
-                    print(time.time())
-            except Exception as e:
-                if uploader.pct_complete == uploader.uploaded_chunks:
-                    print(Fore.CYAN + "Exception seen again though upload is ready.")
-
-            print(Fore.CYAN + "Upload complete! Tx: " + tx.id + ", Status: " + tx.get_status())
+                if uploader.is_complete:
+                    total = 0
+
+            # get_chunk seeks the shared file handler
+            chunkLock = threading.Lock()
+
+            def chunk(index):
+                with chunkLock:
+                    payload = tx.get_chunk(index)
+                payload['data_path'] = payload['data_path'].decode()
+                payload['chunk'] = payload['chunk'].decode()
+                return payload
+
+            if total:
+                chunks = self.uploader.upload(tx.id, chunk, total, progressPath, dataRoot)
+                self.store.put({'sweep': 'upload', 'file': filePath, 'window': self.UPLOAD_WINDOW,
+                                'maxWindow': self.UPLOAD_MAX_WINDOW, 'run': time.time()}, self.uploader.stats)
+            print(Fore.CYAN + "Upload complete! Tx: %s, Status: %s" % (tx.id, tx.get_status()))
         print(Fore.YELLOW + "[UpThread] Upload complete ", time.time())
 
         totalTime = time.time() - startTime
@@ -250,14 +485,85 @@ class ARWeaveExperiment(Experiment):
         print(Fore.CYAN + "Chunks: ", chunks)
         return totalTime, chunks
 
-    def download(self, tx_id):
-        startTime = time.time()
-        print(Fore.RED + "[DownThread] Started downloading at ", startTime)
-        tx = Transaction(self.wallet, id=tx_id)
-        while tx.get_status() == "PENDING":
-            print(Fore.CYAN + "Status is still pending...")
-            time.sleep(5)
+    def download(self, tx_id, params=None):
+        """
+        :param params: extra parameters stored with the measurement, e.g. the sweep point
+        :return: seconds taken, and the data
+        """
+        print(Fore.RED + "[DownThread] Started downloading at ", time.time())
+        result = self.harness.once("arweave download", self.read, tx_id,
+                                   params=dict(params or {}, tx=tx_id, cached=self.exerciseCache is not None,
+                                               chunked=self.CHUNKED_DOWNLOAD))
+        totalTime = result.median
+        print(Fore.RED + "[DownThread] Finished downloading at %.1f, (%.2f seconds)" % (time.time(), totalTime))
+        return totalTime, result.value
+
+    def read(self, tx_id):
+        """
+        :return: transaction data, through the exercise cache when EXERCISE_CACHE is set
+        """
+        if self.exerciseCache is None:
+            return self.fetch(tx_id)
+        return self.exerciseCache.open('arweave', tx_id, lambda offset: self.fetch_stream(tx_id, offset),
+                                       lambda: self.data_size(tx_id))
+
+    def data_size(self, tx_id):
+        """
+        :return: size of the data of a confirmed transaction, as reported by the gateway
+        """
+        downloader = self.downloader if self.downloader is not None else ArweaveDownloader(self.ARWEAVE_GATEWAY)
+        return downloader.offset(tx_id)[1]
+
+    def fetch_stream(self, tx_id, offset=0):
+        """
+        #fetch as a cache fetch: waits for the transaction to confirm, then streams its data from offset on, through
+        the chunked downloader when CHUNKED_DOWNLOAD is set.
+        :return: generator of bytes chunks
+        """
+        self.wait_confirmed(tx_id)
+        if self.downloader is None:
+            yield from self.stream(tx_id, offset)
+            return
+        os.makedirs(self.DOWNLOAD_DIR, exist_ok=True)
+        data = self.downloader.download(tx_id, os.path.join(self.DOWNLOAD_DIR, tx_id + ".dat"))
+        for start in range(offset, len(data), self.STREAM_CHUNK):
+            yield bytes(data[start:start + self.STREAM_CHUNK])
+
+    def wait_confirmed(self, tx_id):
+        """
+        Waits for tx_id to confirm on the shared tracker. Downloads run on FETCH_WORKERS threads: waits for different
+        transactions overlap (the tracker's stats are those of the last one to finish), a transaction is polled by one
+        thread at a time, and transactions already seen confirmed return right away.
+        """
+        while tx_id not in self.confirmed:
+            with self.confirmLock:
+                if tx_id in self.confirmed:
+                    break
+                event = self.confirming.get(tx_id)
+                owner = event is None
+                if owner:
+                    event = self.confirming[tx_id] = threading.Event()
+            if not owner:
+                # Another thread polls this transaction, check again once it is done
+                event.wait()
+                continue
+            try:
+                self.tracker.wait([tx_id])
+                with self.confirmLock:
+                    self.confirmed.add(tx_id)
+            finally:
+                with self.confirmLock:
+                    del self.confirming[tx_id]
+                event.set()
         print(Fore.CYAN + "TX is confirmed! Downloading ", time.time())
+
+    def fetch(self, tx_id):
+        self.wait_confirmed(tx_id)
+        if self.downloader is not None:
+            os.makedirs(self.DOWNLOAD_DIR, exist_ok=True)
+            return self.downloader.download(tx_id, os.path.join(self.DOWNLOAD_DIR, tx_id + ".dat"))
+        tx = Transaction(self.wallet, id=tx_id)
+        tx.api_url = self.ARWEAVE_GATEWAY
         tx.get_transaction()
         tx.get_data()
         try:
@@ -265,15 +571,65 @@ class ARWeaveExperiment(Experiment):
             print(tx)
         except Exception as e:
             pass
-        totalTime = time.time() - startTime
-        print(Fore.RED + "[DownThread] Finished downloading at %.1f, (%.2f seconds)" % (time.time(), totalTime))
-        return totalTime, tx.data
+        return tx.data
 
     def configure(self, **kwargs):
+        self.harness.configure(**kwargs)
         if 'ARWEAVE_WALLET_UP' in kwargs:
             self.ARWEAVE_WALLET_UP = kwargs['ARWEAVE_WALLET_UP']
         if 'ARWEAVE_WALLET_DOWN' in kwargs:
             self.ARWEAVE_WALLET_DOWN = kwargs['ARWEAVE_WALLET_DOWN']
+        if 'VALIDATION_EXP' in kwargs:
+            self.VALIDATION_EXP = True
+        if 'SOLUTION_CACHE' in kwargs:
+            self.SOLUTION_CACHE = True
+        if 'PIPELINE' in kwargs:
+            self.PIPELINE = True
+        if 'PREFETCH' in kwargs:
+            self.PREFETCH = int(kwargs['PREFETCH'])
+        if 'PIPELINE_MEMORY_BUDGET' in kwargs:
+            self.PIPELINE_MEMORY_BUDGET = int(kwargs['PIPELINE_MEMORY_BUDGET'])
+        if 'FETCH_WORKERS' in kwargs:
+            self.FETCH_WORKERS = int(kwargs['FETCH_WORKERS'])
+        if 'BLOCKS' in kwargs:
+            self.BLOCKS = int(kwargs['BLOCKS'])
+        if 'STREAMING' in kwargs:
+            self.STREAMING = True
+        if 'STREAM_CHUNK' in kwargs:
+            self.STREAM_CHUNK = int(kwargs['STREAM_CHUNK'])
+        if 'EXERCISE_CACHE' in kwargs:
+            self.EXERCISE_CACHE = True
+        if 'EXERCISE_CACHE_DIR' in kwargs:
+            self.EXERCISE_CACHE_DIR = kwargs['EXERCISE_CACHE_DIR']
+        if 'EXERCISE_CACHE_BYTES' in kwargs:
+            self.EXERCISE_CACHE_BYTES = int(kwargs['EXERCISE_CACHE_BYTES'])
+        if self.EXERCISE_CACHE:
+            self.exerciseCache = ExerciseCache(self.EXERCISE_CACHE_DIR, self.EXERCISE_CACHE_BYTES)
+        if 'CHUNKED_DOWNLOAD' in kwargs:
+            self.CHUNKED_DOWNLOAD = True
+        if 'CHUNK_CONCURRENCY' in kwargs:
+            self.CHUNK_CONCURRENCY = int(kwargs['CHUNK_CONCURRENCY'])
+        if 'DOWNLOAD_DIR' in kwargs:
+            self.DOWNLOAD_DIR = kwargs['DOWNLOAD_DIR']
+        if 'ARWEAVE_GATEWAY' in kwargs:
+            self.ARWEAVE_GATEWAY = kwargs['ARWEAVE_GATEWAY']
+        if self.CHUNKED_DOWNLOAD:
+            self.downloader = ArweaveDownloader(self.ARWEAVE_GATEWAY, self.CHUNK_CONCURRENCY)
+        if 'UPLOAD_WINDOW' in kwargs:
+            self.UPLOAD_WINDOW = int(kwargs['UPLOAD_WINDOW'])
+        if 'UPLOAD_MAX_WINDOW' in kwargs:
+            self.UPLOAD_MAX_WINDOW = int(kwargs['UPLOAD_MAX_WINDOW'])
+        self.uploader = ArweaveUploader(self.ARWEAVE_GATEWAY, self.UPLOAD_WINDOW, self.UPLOAD_MAX_WINDOW)
+        if 'CONFIRMATIONS' in kwargs:
+            self.CONFIRMATIONS = True
+        if 'TRACK_TRANSACTIONS' in kwargs:
+            self.TRACK_TRANSACTIONS = kwargs['TRACK_TRANSACTIONS'].split(',')
+        if 'CONFIRMATION_MIN_INTERVAL' in kwargs:
+            self.CONFIRMATION_MIN_INTERVAL = float(kwargs['CONFIRMATION_MIN_INTERVAL'])
+        if 'CONFIRMATION_MAX_INTERVAL' in kwargs:
+            self.CONFIRMATION_MAX_INTERVAL = float(kwargs['CONFIRMATION_MAX_INTERVAL'])
+        self.tracker = ConfirmationTracker(self.ARWEAVE_GATEWAY, self.CONFIRMATION_MIN_INTERVAL,
+                                           self.CONFIRMATION_MAX_INTERVAL)
 
         address = self.ARWEAVE_WALLET_DOWN
         logMessage = "download"
@@ -282,4 +638,5 @@ class ARWeaveExperiment(Experiment):
             logMessage = "upload"
 
         self.wallet = Wallet(address)
+        self.wallet.api_url = self.ARWEAVE_GATEWAY
         print(Fore.CYAN + "Loaded wallet for %s with %.5f AR." % (logMessage, self.wallet.balance))
@@ -1,7 +1,13 @@
+from src.benchmark import BenchmarkHarness, ResultStore
+
+
 class Experiment:
 
     def __init__(self):
-        pass
+        # Results of this experiment, persisted as they are computed. main.py names it after the experiment flag
+        self.store = ResultStore(type(self).__name__)
+        # Shared timing harness, configured through BENCHMARK_WARMUP, BENCHMARK_REPETITIONS and BENCHMARK_CPUS
+        self.harness = BenchmarkHarness(store=self.store)
 
     def run(self):
         """
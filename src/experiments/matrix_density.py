@@ -1,6 +1,7 @@
 from src.experiments import Experiment
+from src.exercises import ExerciseLoader, ExerciseFormat, VirtualExercise, Sparsifier
+from src.solvers import SparseAwareSolver
 
-import time
 import numpy as np
 import matplotlib.pyplot as plt
 import os
@@ -15,10 +16,30 @@ class MatrixDensityExperiment(Experiment):
 
     It also shows that numpy does not do any out of the box optimization. even a dot on two completely 0-element
     matrices still takes about as long as a randomly initialized matrix
+
+    Note: both findings hold for dense BLAS only. With SPARSE_SOLVER, exercises below a density threshold are
+    multiplied in CSR form, and SPARSE_CROSSOVER measures where that threshold sits on the current host.
     """
     PREGENERATED_FILE_PREFIX = "generated_mat"
     PREGENERATED_DIR = "./resources/poxsamples_dot"
 
+    # Map exercises copy-on-write instead of reading them into memory. Set EAGER_LOAD to read them upfront.
+    MMAP_LOAD = True
+
+    # When > 0, exercises are VirtualExercise specs generated on the fly instead of files in PREGENERATED_DIR
+    VIRTUAL_EXERCISES = 0
+    VIRTUAL_SIZE = 10000
+    SEED = 0
+
+    # One of Sparsifier.PATTERNS, used by the sparsity checker
+    SPARSITY_PATTERN = 'rows'
+
+    # Multiply through SparseAwareSolver (dense/sparse dispatch on sampled density) instead of plain np.dot
+    SPARSE_SOLVER = False
+    # Run the dense/sparse crossover sweep on a CROSSOVER_SIZE exercise instead of the sparsity checker
+    SPARSE_CROSSOVER = False
+    CROSSOVER_SIZE = 4000
+
     MATRICE_PATHS = {
         '1M': {
             '0': [],
@@ -36,13 +57,24 @@ class MatrixDensityExperiment(Experiment):
 
     def __init__(self):
         super().__init__()
+        self.sparsifier = Sparsifier(self.SEED, verbose=True)
+        self.solver = SparseAwareSolver(seed=self.SEED)
 
     def run(self):
         # Verify BLAS linkage
         np.show_config()
+        if self.SPARSE_CROSSOVER:
+            self.run_sparse_crossover()
+            return
         # self.run_base_multiplication()
         self.run_sparsity_checker()
 
+    def run_sparse_crossover(self):
+        sweep, threshold = self.solver.calibrate(self.CROSSOVER_SIZE, pattern=self.SPARSITY_PATTERN, seed=self.SEED,
+                                                 harness=self.harness)
+        print(Fore.CYAN + "Crossover sweep complete: %s" % json.dumps(sweep, indent=4))
+        self.plot_crossover_results(sweep, threshold)
+
     def run_sparsity_checker(self):
         results = {
             '1M': [],
@@ -51,15 +83,18 @@ class MatrixDensityExperiment(Experiment):
         }
         for mtype in self.MATRICE_PATHS:
             print(Fore.CYAN + "Benchmarking %s type matrices..." % mtype)
-            m0, m1 = self.load_matrices(self.MATRICE_PATHS[mtype]['0'][0], self.MATRICE_PATHS[mtype]['1'][0])
-            results[mtype].append(self.benchmark_multiplication(m0, m1, mtype))
+            m0, m1 = self.load_matrices(self.MATRICE_PATHS[mtype]['0'][0], self.MATRICE_PATHS[mtype]['1'][0],
+                                        self.MMAP_LOAD)
+            results[mtype].append(self.benchmark_multiplication(m0, m1, mtype, density=1.0,
+                                                                pattern=self.SPARSITY_PATTERN))
             bucket_size = 20
             for i in range(bucket_size):
-                print(Fore.CYAN + "Benchmarking %d/%d zero rows..." % (i + 1, bucket_size))
-                for j in range(int(i * len(m0) / bucket_size), int((i + 1) * len(m0) / bucket_size)):
-                    m0[j] = 0
-                    m1[j] = 0
-                results[mtype].append(self.benchmark_multiplication(m0, m1, mtype))
+                print(Fore.CYAN + "Benchmarking %d/%d zeroed (%s)..." % (i + 1, bucket_size, self.SPARSITY_PATTERN))
+                density = 1 - (i + 1) / bucket_size
+                self.sparsifier.sparsify(m0, density, self.SPARSITY_PATTERN)
+                self.sparsifier.sparsify(m1, density, self.SPARSITY_PATTERN)
+                results[mtype].append(self.benchmark_multiplication(m0, m1, mtype, density=density,
+                                                                    pattern=self.SPARSITY_PATTERN))
 
         print(Fore.CYAN + "Benchmark complete: %s" % json.dumps(results, indent=4))
         self.plot_density_results(results)
@@ -74,29 +109,27 @@ class MatrixDensityExperiment(Experiment):
             print(Fore.CYAN + "Benchmarking %s type matrices..." % mtype)
             for index in range(len(self.MATRICE_PATHS[mtype]['0'])):
                 m0, m1 = self.load_matrices(self.MATRICE_PATHS[mtype]['0'][index],
-                                            self.MATRICE_PATHS[mtype]['1'][index])
-                results[mtype].append(self.benchmark_multiplication(m0, m1, mtype))
+                                            self.MATRICE_PATHS[mtype]['1'][index], self.MMAP_LOAD)
+                results[mtype].append(self.benchmark_multiplication(m0, m1, mtype, index=index))
             print(Fore.CYAN + "Benchmark for %s done." % mtype)
 
         print(Fore.CYAN + "Benchmark complete: %s" % json.dumps(results, indent=4))
         self.plot_results(results)
 
     @staticmethod
-    def load_matrices(m0Path, m1Path):
+    def load_matrices(m0Path, m1Path, mmap=True):
         matrices = []
 
         for path in [m0Path, m1Path]:
-            print(Fore.CYAN + "Loading matrix %s..." % path)
-            with open(path, "rb") as in_f:
-                m0_buf = in_f.read()
-                print(Fore.CYAN + "Constructing...")
-                m0 = np.frombuffer(m0_buf).reshape([10000, 10000])
-                matrices.append(m0)
-                print(Fore.CYAN + "Done.")
+            m = ExerciseLoader.load(path, mmap=mmap)
+            if isinstance(m, np.memmap):
+                # Keep disk reads out of the multiplication timings
+                ExerciseLoader.prefault(m)
+            matrices.append(m)
+            print(Fore.CYAN + "Done.")
         print(Fore.CYAN + "Exercise loaded.")
 
-        # NP went completely nuts and doesn't let you change the writeable flag on frombuffer loaded data
-        return np.copy(matrices[0]), np.copy(matrices[1])
+        return matrices[0], matrices[1]
 
     @staticmethod
     def plot_results(results):
@@ -157,30 +190,88 @@ class MatrixDensityExperiment(Experiment):
         ax1.set_ylabel("Seconds to multiply")
         ax1.set_xticks(range(len(results['1M'])))  # 1M, -1M, randn have the same length
         ax1.set_xticklabels(["%d/%d" % (i, len(results['1M']) - 1) for i in range(len(results['1M']))], rotation=35)
-        ax1.set_xlabel("Number of zero-value rows (x4000)")
+        ax1.set_xlabel("Zeroed fraction of the matrix")
         ax1.set_title("Multiplication time for two matrices increasing in sparsity")
         ax1.legend(['1M', '-1M', 'randn'])
         fig.show()
 
+    @staticmethod
+    def plot_crossover_results(sweep, threshold):
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.plot(range(len(sweep)), [x[1] for x in sweep], color='royalblue')
+        ax1.plot(range(len(sweep)), [x[2] for x in sweep], color='lightsteelblue')
+        ax1.set_xticks(range(len(sweep)))
+        ax1.set_xticklabels(["%.3f" % x[0] for x in sweep], rotation=35)
+        ax1.set_xlabel("Exercise density (threshold %.3f)" % threshold)
+        ax1.set_ylabel("Seconds to multiply")
+        ax1.set_title("Dense vs sparse multiplication time")
+        ax1.legend(['dense (BLAS)', 'sparse (CSR)'])
+        fig.show()
+
     def configure(self, **kwargs):
+        self.harness.configure(**kwargs)
         if 'PREGENERATED_FILE_PREFIX' in kwargs:
             self.PREGENERATED_FILE_PREFIX = kwargs['PREGENERATED_FILE_PREFIX']
         if 'PREGENERATED_DIR' in kwargs:
             self.PREGENERATED_DIR = kwargs['PREGENERATED_DIR']
+        if 'EAGER_LOAD' in kwargs:
+            self.MMAP_LOAD = False
+        if 'VIRTUAL_EXERCISES' in kwargs:
+            self.VIRTUAL_EXERCISES = int(kwargs['VIRTUAL_EXERCISES'])
+        if 'VIRTUAL_SIZE' in kwargs:
+            self.VIRTUAL_SIZE = int(kwargs['VIRTUAL_SIZE'])
+        if 'SEED' in kwargs:
+            self.SEED = int(kwargs['SEED'])
+            self.sparsifier = Sparsifier(self.SEED, verbose=True)
+        if 'SPARSITY_PATTERN' in kwargs:
+            self.SPARSITY_PATTERN = kwargs['SPARSITY_PATTERN']
+        if 'SPARSE_SOLVER' in kwargs:
+            self.SPARSE_SOLVER = True
+        if 'SPARSE_CROSSOVER' in kwargs:
+            self.SPARSE_CROSSOVER = True
+        if 'CROSSOVER_SIZE' in kwargs:
+            self.CROSSOVER_SIZE = int(kwargs['CROSSOVER_SIZE'])
+
+        if self.VIRTUAL_EXERCISES > 0:
+            self.configure_virtual()
+        else:
+            self.configure_pregenerated()
+
+        print(Fore.CYAN + "Loaded matrices: %s" % json.dumps(self.MATRICE_PATHS, indent=4))
+
+    def configure_virtual(self):
+        # Same seed layout as MatrixSizeExperiment#pregenerate_matrix, offset per matrix type
+        for typeIndex, mtype in enumerate(self.MATRICE_PATHS):
+            for count in range(self.VIRTUAL_EXERCISES):
+                for i in ['0', '1']:
+                    seed = self.SEED + 2 * (typeIndex * self.VIRTUAL_EXERCISES + count) + int(i)
+                    self.MATRICE_PATHS[mtype][i].append(VirtualExercise(seed, (self.VIRTUAL_SIZE, self.VIRTUAL_SIZE),
+                                                                        mtype).spec)
 
+    def configure_pregenerated(self):
         for file in os.listdir(self.PREGENERATED_DIR):
             if file.startswith(self.PREGENERATED_FILE_PREFIX):
                 fpath = os.path.join(self.PREGENERATED_DIR, file)
                 if os.path.isfile(fpath):
                     tokens = file.split('_')
-                    self.MATRICE_PATHS[tokens[-2]][tokens[-3]].append(fpath)
-
-        print(Fore.CYAN + "Loaded matrices: %s" % json.dumps(self.MATRICE_PATHS, indent=4))
+                    header = ExerciseFormat.read_header(fpath)
+                    mtype = header.distribution if header is not None and header.distribution else tokens[-2]
+                    self.MATRICE_PATHS[mtype][tokens[-3]].append(fpath)
 
-    def benchmark_multiplication(self, m0, m1, mtype):
-        startTime = time.time()
-        np.dot(m0, m1)
-        totalTime = time.time() - startTime
+    def benchmark_multiplication(self, m0, m1, mtype, **point):
+        """
+        :param point: parameters telling this point apart from the others of the sweep (density, pattern, index...),
+                      stored with the result
+        :return: median seconds to multiply
+        """
+        params = dict(point, rows=m0.shape[0], cols=m0.shape[1], type=mtype, sparseSolver=self.SPARSE_SOLVER)
+        if self.SPARSE_SOLVER:
+            # Dispatch once upfront so the stored point records the path every repetition is pinned to
+            params['path'] = self.solver.choose_path(self.solver.sample_density(m0), self.solver.sample_density(m1))
+            result = self.harness.measure("dot %s" % mtype, self.solver.solve, m0, m1, params['path'], params=params)
+        else:
+            result = self.harness.measure("dot %s" % mtype, np.dot, m0, m1, params=params)
+        totalTime = result.median
 
         print(Fore.CYAN + "Multiplied %dx%d (%s) matrix in %.2f seconds" %
               (m0.shape[0], m0.shape[1], mtype, totalTime))
@@ -1,5 +1,6 @@
 from src.experiments import Experiment
 
+import os
 import time
 import numpy as np
 import matplotlib.pyplot as plt
@@ -7,6 +8,10 @@ from sklearn.decomposition import NMF
 
 from colorama import Fore
 
+from src.exercises import ExerciseGenerator, ExerciseLoader, Sparsifier, VirtualExercise
+from src.benchmark import BenchmarkHarness
+from src.solvers import OutOfCoreSolver, PrecisionSolver, IncrementalNMFSolver, SizeCalibrator
+
 
 class MatrixSizeExperiment(Experiment):
     """
@@ -25,7 +30,7 @@ class MatrixSizeExperiment(Experiment):
     Ideally, this experiment produces a bar plot showing various numbers ([0, 1], [-1,1], [0, +1M],[-1M,+1M])
     across 2 or 3 levels of precision (full precision, rounded to 5 digits, to 2 and to 0). Using normally
     distributed numbers will do.~~
-    DONE
+    DONE. Run with PRECISION to compare float64/float32/float16/int64/int32 exercises (see PrecisionSolver).
 
 
     Finding 3: All of the above are computed for np.multiply. For np.dot, things get different
@@ -51,13 +56,51 @@ class MatrixSizeExperiment(Experiment):
 
     PREGENERATION = False
 
+    PREGENERATION_WORKERS = None  # all cores
+
+    SEED = 0
+
+    # Stream exercises to OUT_OF_CORE_DIR and multiply them with OutOfCoreSolver, so sizes can go past RAM
+    OUT_OF_CORE = False
+    OUT_OF_CORE_DIR = "./resources/poxsamples_ooc"
+    MEMORY_BUDGET = OutOfCoreSolver.MEMORY_BUDGET
+
+    # Compare PrecisionSolver modes on one START_ROW_SIZE x START_COL_SIZE exercise instead of the size sweep
+    PRECISION = False
+
+    # Warm start every NMF step from the previous step's W/H instead of refitting from a random init
+    NMF_WARM_START = False
+    # Factorize a VirtualExercise streamed by row-blocks with IncrementalNMFSolver#fit_online instead of sklearn's NMF
+    NMF_ONLINE = False
+
+    # Fit the time-vs-size curve and search for the exercise size solving in TARGET_TIME instead of the linear sweep
+    CALIBRATE = False
+    CALIBRATION_TOLERANCE = SizeCalibrator.TOLERANCE
+    # Each calibration step only needs a rough time, measured without warmup
+    CALIBRATION_REPETITIONS = 1
+
     def __init__(self):
         super().__init__()
+        self.sparsifier = Sparsifier()
 
     def run(self):
         if self.PREGENERATION:
             return
 
+        if self.PRECISION:
+            m0, m1, _, _ = self.generate_matrix()
+            results = PrecisionSolver().compare(m0, m1, self.harness)
+            self.plot_results_precision(results)
+            return
+
+        if self.CALIBRATE:
+            harness = BenchmarkHarness(0, self.CALIBRATION_REPETITIONS, store=self.store)
+            calibrator = SizeCalibrator(float(self.TARGET_TIME), self.CALIBRATION_TOLERANCE, harness,
+                                        ratio=self.START_COL_SIZE / self.START_ROW_SIZE, seed=self.SEED)
+            result = calibrator.calibrate(self.START_ROW_SIZE)
+            self.plot_results_calibration(result)
+            return
+
         xvals, yvals, results, m0_s, m1_s = self.benchmark_nmf(True, True)
         self.plot_results_nmf(xvals, yvals, results, m0_s, m1_s, "Number of features")
 
@@ -106,7 +149,37 @@ class MatrixSizeExperiment(Experiment):
         ax1.legend(['NMF Seconds'])
         fig.show()
 
+    @staticmethod
+    def plot_results_precision(results):
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.bar(range(len(results)), [r['gflops'] for r in results], color='royalblue', width=0.4)
+        ax1.set_xticks(range(len(results)))
+        ax1.set_xticklabels(["%s\n%.0f Mb" % (r['mode'], r['downloadBytes'] / 1024 / 1024) for r in results])
+        ax1.set_ylabel("GFLOP/s")
+        ax1.set_title("Multiplication throughput and error per precision")
+        ax2 = ax1.twinx()
+        ax2.plot(range(len(results)), [max(r['relError'], 1e-17) for r in results], color='brown', marker='o')
+        ax2.set_yscale('log')
+        ax2.set_ylabel("Relative error vs float64")
+        fig.show()
+
+    @staticmethod
+    def plot_results_calibration(result):
+        sizes = [x[0] for x in result['samples']]
+        curve = np.linspace(min(sizes), max(sizes), 100)
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.scatter(sizes, [x[1] for x in result['samples']], color='brown', label="Measured")
+        ax1.plot(curve, result['model']['a'] * curve ** result['model']['b'], color='royalblue',
+                 label="t(n) = %.2e * n^%.2f" % (result['model']['a'], result['model']['b']))
+        ax1.axhline(result['target'], color='gray', linestyle='--', label="Target time")
+        ax1.set_xlabel("Matrix Size (rows)")
+        ax1.set_ylabel("Time (s)")
+        ax1.set_title("Calibrated size: %d rows in %.2f s" % (result['size'], result['time']))
+        ax1.legend()
+        fig.show()
+
     def configure(self, **kwargs):
+        self.harness.configure(**kwargs)
         if 'START_ROW_SIZE' in kwargs:
             self.START_ROW_SIZE = kwargs['START_ROW_SIZE']
         if 'START_COL_SIZE' in kwargs:
@@ -122,6 +195,28 @@ class MatrixSizeExperiment(Experiment):
                           " Target time: %d" % (self.START_COL_SIZE, self.START_ROW_SIZE,
                                                 self.INC_X, self.INC_Y,
                                                 self.TARGET_TIME))
+        if 'PREGENERATION_WORKERS' in kwargs:
+            self.PREGENERATION_WORKERS = int(kwargs['PREGENERATION_WORKERS'])
+        if 'SEED' in kwargs:
+            self.SEED = int(kwargs['SEED'])
+        if 'OUT_OF_CORE' in kwargs:
+            self.OUT_OF_CORE = True
+        if 'OUT_OF_CORE_DIR' in kwargs:
+            self.OUT_OF_CORE_DIR = kwargs['OUT_OF_CORE_DIR']
+        if 'MEMORY_BUDGET' in kwargs:
+            self.MEMORY_BUDGET = int(kwargs['MEMORY_BUDGET'])
+        if 'PRECISION' in kwargs:
+            self.PRECISION = True
+        if 'NMF_WARM_START' in kwargs:
+            self.NMF_WARM_START = True
+        if 'NMF_ONLINE' in kwargs:
+            self.NMF_ONLINE = True
+        if 'CALIBRATE' in kwargs:
+            self.CALIBRATE = True
+        if 'CALIBRATION_TOLERANCE' in kwargs:
+            self.CALIBRATION_TOLERANCE = float(kwargs['CALIBRATION_TOLERANCE'])
+        if 'CALIBRATION_REPETITIONS' in kwargs:
+            self.CALIBRATION_REPETITIONS = int(kwargs['CALIBRATION_REPETITIONS'])
         if 'PREGENERATE' in kwargs:
             self.PREGENERATION = True
             self.pregenerate_matrix()
@@ -130,20 +225,21 @@ class MatrixSizeExperiment(Experiment):
         """
         This is used to serialize a number of exercises to benchmark multiplication on later.
         In first iterations, an optimal matrix size was found, and this function can now be used
-        to benchmark impact of sparsity and disk throughput
+        to benchmark impact of sparsity and disk throughput.
+
+        Exercises are streamed block by block into their files by ExerciseGenerator, across PREGENERATION_WORKERS
+        processes. Exercise (count, i) always uses seed SEED + 2 * count + i, so the corpus is reproducible.
         :return:
         """
         print(Fore.CYAN + "Generating exercises.")
+        generator = ExerciseGenerator(self.PREGENERATION_WORKERS)
+        shapes = self.exercise_shapes()
         for count in range(0, 10):
-            i = 0
-            m0, m1, z0, z1 = self.generate_matrix()
-            print(Fore.CYAN + "Generated %dx%d matrix." % (self.START_COL_SIZE, self.START_ROW_SIZE))
-            for m in [m0, m1]:
-                with open("./resources/poxsamples_dot/%s%dx%d_%d_1M_%d.dat" %
-                          (self.PREGENERATED_FILE, self.START_COL_SIZE, self.START_ROW_SIZE, i, count), "wb") as f:
-                    f.write(m.tobytes())
-                    print(Fore.CYAN + "Wrote matrix m%d" % i)
-                    i += 1
+            for i in range(2):
+                generator.generate("./resources/poxsamples_dot/%s%dx%d_%d_1M_%d.dat" %
+                                   (self.PREGENERATED_FILE, self.START_COL_SIZE, self.START_ROW_SIZE, i, count),
+                                   shapes[i], self.SEED + 2 * count + i, self.distribution_name(), maxZeros=1000)
+                print(Fore.CYAN + "Wrote matrix m%d" % i)
 
     def generate_matrix(self):
         if self.START_COL_SIZE == self.START_ROW_SIZE:
@@ -161,12 +257,38 @@ class MatrixSizeExperiment(Experiment):
 
         return m0, m1, m0_z, m1_z
 
+    def generate_matrix_files(self):
+        """
+        Same exercise shapes as #generate_matrix, streamed to OUT_OF_CORE_DIR and memory-mapped back, so no full
+        matrix is ever resident. No zeros are injected.
+        """
+        os.makedirs(self.OUT_OF_CORE_DIR, exist_ok=True)
+        shapes = self.exercise_shapes()
+        generator = ExerciseGenerator(self.PREGENERATION_WORKERS)
+        matrices = []
+        for i in range(2):
+            path = os.path.join(self.OUT_OF_CORE_DIR, "m%d.dat" % i)
+            generator.generate(path, shapes[i], self.SEED + i, self.distribution_name())
+            matrices.append(ExerciseLoader.load(path))
+        return matrices[0], matrices[1], 0, 0
+
+    def exercise_shapes(self):
+        """
+        :return: shapes of m0 and m1 as produced by #generate_matrix
+        """
+        if self.START_COL_SIZE == self.START_ROW_SIZE:
+            return [(self.START_ROW_SIZE, self.START_COL_SIZE), (self.START_ROW_SIZE, self.START_COL_SIZE)]
+        return [(self.START_ROW_SIZE, self.START_COL_SIZE), (self.START_COL_SIZE, self.START_ROW_SIZE)]
+
+    def distribution_name(self):
+        """
+        :return: name of the distribution #generate_matrix draws from, as stored in exercise headers
+        """
+        return '1M' if self.START_COL_SIZE == self.START_ROW_SIZE else 'randn'
+
     def randomize(self, m):
         z_count = np.random.randint(0, 1000)
-        for _ in range(z_count):
-            i = np.random.randint(0, len(m))
-            j = np.random.randint(0, len(m[0]))
-            m[i][j] = 0
+        self.sparsifier.sparsify(m, 1 - z_count / m.size)
 
         return z_count
 
@@ -179,14 +301,21 @@ class MatrixSizeExperiment(Experiment):
 
         while True:
 
-            startTime = time.time()
-            m0, m1, z0, z1 = self.generate_matrix()
+            startTime = time.perf_counter()
+            if self.OUT_OF_CORE:
+                m0, m1, z0, z1 = self.generate_matrix_files()
+            else:
+                m0, m1, z0, z1 = self.generate_matrix()
             print(Fore.CYAN + "Generated %dx%d matrix in %.2f seconds" %
-                  (self.START_COL_SIZE, self.START_ROW_SIZE, time.time() - startTime))
-            startTime = time.time()
+                  (self.START_COL_SIZE, self.START_ROW_SIZE, time.perf_counter() - startTime))
 
-            np.dot(m0, m1)
-            results.append(time.time() - startTime)
+            params = {'rows': self.START_ROW_SIZE, 'cols': self.START_COL_SIZE, 'outOfCore': self.OUT_OF_CORE}
+            if self.OUT_OF_CORE:
+                result = self.harness.measure("ooc dot", OutOfCoreSolver(self.MEMORY_BUDGET).solve, m0, m1,
+                                              os.path.join(self.OUT_OF_CORE_DIR, "result.dat"), params=params)
+            else:
+                result = self.harness.measure("dot", np.dot, m0, m1, params=params)
+            results.append(result.median)
             print(Fore.CYAN + "Multiplied %dx%d matrix in %.2f seconds" %
                   (self.START_COL_SIZE, self.START_ROW_SIZE, results[-1]))
             m0_sparsity.append(z0)
@@ -212,16 +341,35 @@ class MatrixSizeExperiment(Experiment):
         results = []
         n_comp = 10
 
-        m0, m1, z0, z1 = self.generate_matrix()
-        startTime = time.time()
+        startTime = time.perf_counter()
+        if self.NMF_ONLINE:
+            # Generated block by block as the solver streams it. Always '1M', online NMF needs non-negative input
+            m0 = VirtualExercise(self.SEED, (self.START_ROW_SIZE, self.START_COL_SIZE), '1M')
+        else:
+            m0, m1, z0, z1 = self.generate_matrix()
         print(Fore.CYAN + "Generated %dx%d matrix in %.2f seconds" %
-              (self.START_COL_SIZE, self.START_ROW_SIZE, time.time() - startTime))
+              (self.START_COL_SIZE, self.START_ROW_SIZE, time.perf_counter() - startTime))
+        solver = IncrementalNMFSolver()
+        W, H = None, None
         while True:
 
-            startTime = time.time()
-            nmf = NMF(n_components=n_comp, init='random', random_state=0)
-            res = nmf.fit_transform(m0)
-            results.append(time.time() - startTime)
+            params = {'rows': self.START_ROW_SIZE, 'cols': self.START_COL_SIZE, 'components': n_comp,
+                      'warmStart': self.NMF_WARM_START, 'online': self.NMF_ONLINE}
+            if self.NMF_ONLINE:
+                result = self.harness.measure("nmf online", solver.fit_online, m0, n_comp,
+                                              H=H if self.NMF_WARM_START else None, params=params, resume=False)
+                W, H, stats = result.value
+                print(Fore.CYAN + "Online NMF stopped after %d epochs, relative error %.4e" %
+                      (stats['epochs'], stats['errors'][-1]))
+            elif self.NMF_WARM_START:
+                result = self.harness.measure("nmf warm", solver.fit, m0, n_comp, W, H, params=params,
+                                              resume=False)
+                W, H, stats = result.value
+                print(Fore.CYAN + "Warm started NMF converged in %d iterations" % stats['iterations'])
+            else:
+                result = self.harness.measure("nmf", lambda: NMF(n_components=n_comp, init='random',
+                                                                  random_state=0).fit_transform(m0), params=params)
+            results.append(result.median)
             print(Fore.CYAN + "Multiplied %dx%d matrix in %.2f seconds" %
                   (self.START_COL_SIZE, self.START_ROW_SIZE, results[-1]))
 
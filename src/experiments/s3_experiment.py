@@ -1,10 +1,12 @@
+import os
 import time
 
 import numpy as np
 from botocore.exceptions import ClientError
 
 from src.experiments import Experiment
-import boto3
+from src.exercises import ExerciseCache
+from src.storage import S3Transfer
 
 from colorama import Fore
 
@@ -26,6 +28,14 @@ class S3Experiment(Experiment):
 
     Finding 1: While upload speeds are probably the best out of all the storage providers, the download speeds
     are awful unless you replicate the S3 bucket in all regions. Proximity to an AWS datacenter is crucial here.
+
+    Note: the numbers above come from a single get_object read with body.next(), i.e. line by line over binary data,
+    collected in a list. RANGED_DOWNLOAD fetches PART_SIZE byte ranges CONCURRENCY at a time straight into a
+    preallocated buffer (see S3Transfer). Set S3_ENDPOINT_URL to run against a local S3 compatible server.
+
+    The upload numbers are one file at a time over a fresh client. BULK_UPLOAD pushes every exercise in UPLOAD_DIR
+    through one pooled client, OBJECT_CONCURRENCY files at once with CONCURRENCY multipart parts in flight each,
+    skipping objects the bucket already holds, and reports aggregate MB/s and per object latency percentiles.
     """
 
     isUpload = False
@@ -36,9 +46,59 @@ class S3Experiment(Experiment):
 
     S3_BUCKET = "m1-pox-example"
 
+    # Read objects through the shared ExerciseCache instead of downloading them every time
+    EXERCISE_CACHE = False
+    EXERCISE_CACHE_DIR = ExerciseCache.CACHE_DIR
+    EXERCISE_CACHE_BYTES = ExerciseCache.MAX_BYTES
+
+    # Concurrent ranged downloads into RAM, or memory-mapped files in DOWNLOAD_DIR when set
+    RANGED_DOWNLOAD = False
+    PART_SIZE = S3Transfer.PART_SIZE
+    CONCURRENCY = S3Transfer.CONCURRENCY
+    DOWNLOAD_DIR = None
+
+    # Upload every .dat exercise in UPLOAD_DIR concurrently instead of the single file upload
+    BULK_UPLOAD = False
+    UPLOAD_DIR = "./resources/poxsamples_dot"
+    OBJECT_CONCURRENCY = S3Transfer.OBJECT_CONCURRENCY
+
+    # S3 compatible endpoint (e.g. a local moto or MinIO server), AWS when None
+    S3_ENDPOINT_URL = None
+
     def __init__(self, isUpload):
         super().__init__()
         self.isUpload = isUpload
+        self.exerciseCache = None
+        self.transfer = None
+
+    def configure(self, **kwargs):
+        self.harness.configure(**kwargs)
+        if 'EXERCISE_CACHE' in kwargs:
+            self.EXERCISE_CACHE = True
+        if 'EXERCISE_CACHE_DIR' in kwargs:
+            self.EXERCISE_CACHE_DIR = kwargs['EXERCISE_CACHE_DIR']
+        if 'EXERCISE_CACHE_BYTES' in kwargs:
+            self.EXERCISE_CACHE_BYTES = int(kwargs['EXERCISE_CACHE_BYTES'])
+        if self.EXERCISE_CACHE:
+            self.exerciseCache = ExerciseCache(self.EXERCISE_CACHE_DIR, self.EXERCISE_CACHE_BYTES)
+        if 'RANGED_DOWNLOAD' in kwargs:
+            self.RANGED_DOWNLOAD = True
+        if 'PART_SIZE' in kwargs:
+            self.PART_SIZE = int(kwargs['PART_SIZE'])
+        if 'CONCURRENCY' in kwargs:
+            self.CONCURRENCY = int(kwargs['CONCURRENCY'])
+        if 'DOWNLOAD_DIR' in kwargs:
+            self.DOWNLOAD_DIR = kwargs['DOWNLOAD_DIR']
+        if 'S3_ENDPOINT_URL' in kwargs:
+            self.S3_ENDPOINT_URL = kwargs['S3_ENDPOINT_URL']
+        if 'BULK_UPLOAD' in kwargs:
+            self.BULK_UPLOAD = True
+        if 'UPLOAD_DIR' in kwargs:
+            self.UPLOAD_DIR = kwargs['UPLOAD_DIR']
+        if 'OBJECT_CONCURRENCY' in kwargs:
+            self.OBJECT_CONCURRENCY = int(kwargs['OBJECT_CONCURRENCY'])
+        self.transfer = S3Transfer(self.S3_BUCKET, self.S3_ENDPOINT_URL, self.PART_SIZE, self.CONCURRENCY,
+                                   self.OBJECT_CONCURRENCY)
 
     def run(self):
         if self.isUpload:
@@ -48,52 +108,106 @@ class S3Experiment(Experiment):
         # self.plot_results()
 
     def run_upload(self):
-        self.upload(self.DUMMY_PATH)
+        if self.BULK_UPLOAD:
+            self.run_bulk_upload()
+        else:
+            self.upload(self.DUMMY_PATH)
+
+    def run_bulk_upload(self):
+        paths = sorted(os.path.join(self.UPLOAD_DIR, f) for f in os.listdir(self.UPLOAD_DIR) if f.endswith('.dat'))
+        print(Fore.CYAN + "Uploading %d exercises from %s" % (len(paths), self.UPLOAD_DIR))
+        run = time.time()
+        results = self.transfer.upload_many(paths)
+        for r in results:
+            self.store.put({'sweep': 's3 bulk upload', 'object': r['key'], 'run': run}, r)
+        self.store.put({'sweep': 's3 bulk upload summary', 'objects': len(paths), 'partSize': self.PART_SIZE,
+                        'concurrency': self.CONCURRENCY, 'objectConcurrency': self.OBJECT_CONCURRENCY,
+                        'endpoint': self.S3_ENDPOINT_URL, 'run': run}, self.transfer.stats)
+        return self.transfer.stats
 
     def upload(self, filePath):
         print(Fore.CYAN + "Running upload experiment on %s" % filePath)
-        startTime = time.time()
-        self.upload_file(filePath, self.S3_BUCKET, filePath.split('/')[-1].replace('.dat', ''))
-        totalTime = time.time() - startTime
+        result = self.harness.once("s3 upload", self.upload_file, filePath, self.S3_BUCKET,
+                                   filePath.split('/')[-1].replace('.dat', ''), params={'file': filePath})
+        totalTime = result.median
         print(Fore.CYAN + "Uploaded %s in %.2f seconds" % (filePath, totalTime))
         return totalTime
 
-    @staticmethod
-    def upload_file(file_name, bucket, object_name=None):
-        """Upload a file to an S3 bucket
+    def upload_file(self, file_name, bucket, object_name=None):
+        """Upload a file to an S3 bucket, over the pooled client
 
         :param file_name: File to upload
         :param bucket: Bucket to upload to
         :param object_name: S3 object name
         :return: True if file was uploaded, else False
         """
-        s3_client = boto3.client('s3')
         try:
-            response = s3_client.upload_file(file_name, bucket, object_name)
+            response = self.transfer.client.upload_file(file_name, bucket, object_name,
+                                                        Config=self.transfer.transferConfig)
         except ClientError as e:
             print(Fore.CYAN + "Exception uploading to s3: ", e)
             return False
         return True
 
     def run_download(self):
-        s3 = boto3.client('s3')
+        s3 = self.transfer.client
         results = []
         for file in [self.M0_PATH, self.DUMMY_PATH]:
             print(Fore.CYAN + "Running download experiment on %s" % file)
             object_name = file.split('/')[-1].replace('.dat', '')
-            startTime = time.time()
-            res = s3.get_object(Bucket=self.S3_BUCKET, Key=object_name)
-            body = res['Body']
-            line = body.next()
-            data = []
-            try:
-                while line:
-                    data.append(line)
-                    line = body.next()
-            except StopIteration:
-                pass
-            print(len(data) * 1024)
-            totalTime = time.time() - startTime
+            result = self.harness.once("s3 download", self.download, s3, object_name,
+                                       params={'object': object_name, 'cached': self.exerciseCache is not None,
+                                               'ranged': self.RANGED_DOWNLOAD, 'partSize': self.PART_SIZE,
+                                               'concurrency': self.CONCURRENCY})
+            totalTime = result.median
             results.append(totalTime)
             print(Fore.CYAN + "Downloaded %s in %.2f seconds" % (object_name, totalTime))
         return results
+
+    def download(self, s3, object_name):
+        if self.exerciseCache is not None:
+            return self.exerciseCache.open('s3', "%s/%s" % (self.S3_BUCKET, object_name),
+                                           lambda offset: self.fetch_stream(s3, object_name, offset),
+                                           lambda: self.transfer.size(object_name))
+        if self.RANGED_DOWNLOAD:
+            return self.ranged_download(object_name)
+        res = s3.get_object(Bucket=self.S3_BUCKET, Key=object_name)
+        body = res['Body']
+        line = body.next()
+        data = []
+        try:
+            while line:
+                data.append(line)
+                line = body.next()
+        except StopIteration:
+            pass
+        return data
+
+    def ranged_download(self, object_name):
+        if self.DOWNLOAD_DIR is not None:
+            os.makedirs(self.DOWNLOAD_DIR, exist_ok=True)
+            return self.transfer.download(object_name, os.path.join(self.DOWNLOAD_DIR, object_name + ".dat"))
+        return self.transfer.download(object_name)
+
+    def fetch_stream(self, s3, object_name, offset=0):
+        """
+        Cache fetch: the object's bytes from offset on, through concurrent ranged reads when RANGED_DOWNLOAD is set.
+        :return: generator of bytes chunks
+        """
+        if not self.RANGED_DOWNLOAD:
+            yield from self.stream(s3, object_name, offset)
+            return
+        data = self.ranged_download(object_name)
+        for start in range(offset, len(data), ExerciseCache.CHUNK_SIZE):
+            yield bytes(data[start:start + ExerciseCache.CHUNK_SIZE])
+
+    def stream(self, s3, object_name, offset=0):
+        """
+        :return: generator of the object's bytes from offset on
+        """
+        if offset:
+            res = s3.get_object(Bucket=self.S3_BUCKET, Key=object_name, Range='bytes=%d-' % offset)
+        else:
+            res = s3.get_object(Bucket=self.S3_BUCKET, Key=object_name)
+        for chunk in res['Body'].iter_chunks(ExerciseCache.CHUNK_SIZE):
+            yield chunk
@@ -0,0 +1,77 @@
+from src.experiments import Experiment
+from src.exercises import ExerciseLoader, VirtualExercise
+from src.solvers import SolverPool
+
+import json
+import matplotlib.pyplot as plt
+
+from colorama import Fore
+
+
+class SolverThroughputExperiment(Experiment):
+    """
+    Measures sustained mining throughput (exercises/hour) instead of single exercise latency. The same exercise is
+    solved EXERCISES times by a SolverPool for every workers x BLAS threads split of the host's cores.
+
+    Exercises come from M0_PATH/M1_PATH when set, and are generated as VirtualExercises of EXERCISE_SIZE otherwise.
+    """
+
+    EXERCISE_SIZE = 5000
+    EXERCISES = 20
+    SEED = 0
+
+    M0_PATH = None
+    M1_PATH = None
+
+    # "workersxthreads,..." e.g. "1x8,2x4,4x2,8x1". All splits of os.cpu_count() when None
+    CONFIGURATIONS = None
+
+    def __init__(self):
+        super().__init__()
+
+    def run(self):
+        if self.M0_PATH is not None and self.M1_PATH is not None:
+            m0, m1 = ExerciseLoader.load(self.M0_PATH), ExerciseLoader.load(self.M1_PATH)
+        else:
+            shape = (self.EXERCISE_SIZE, self.EXERCISE_SIZE)
+            m0, m1 = VirtualExercise(self.SEED, shape), VirtualExercise(self.SEED + 1, shape)
+        exercise = {'m0': self.M0_PATH, 'm1': self.M1_PATH} if self.M0_PATH is not None and self.M1_PATH is not None \
+            else {'size': self.EXERCISE_SIZE, 'seed': self.SEED}
+        points = [dict(exercise, sweep='throughput', workers=workers, threads=threads, exercises=self.EXERCISES)
+                  for workers, threads in (self.CONFIGURATIONS or SolverPool.configurations())]
+
+        def measure(params):
+            return SolverPool.sweep(m0, m1, self.EXERCISES, [(params['workers'], params['threads'])])[0]
+
+        results = [result for _, result in self.store.sweep(points, measure)]
+        print(Fore.CYAN + "Throughput sweep complete: %s" % json.dumps(
+            [{k: r[k] for k in ['workers', 'threads', 'wallTime', 'exercisesPerHour']} for r in results], indent=4))
+        self.plot_results(results)
+
+    @staticmethod
+    def plot_results(results):
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.bar(range(len(results)), [r['exercisesPerHour'] for r in results], color='royalblue')
+        ax1.set_xticks(range(len(results)))
+        ax1.set_xticklabels(["%dx%d" % (r['workers'], r['threads']) for r in results])
+        ax1.set_xlabel("Workers x BLAS threads")
+        ax1.set_ylabel("Exercises per hour")
+        ax1.set_title("Sustained solving throughput")
+        fig.show()
+
+    def configure(self, **kwargs):
+        self.harness.configure(**kwargs)
+        if 'EXERCISE_SIZE' in kwargs:
+            self.EXERCISE_SIZE = int(kwargs['EXERCISE_SIZE'])
+        if 'EXERCISES' in kwargs:
+            self.EXERCISES = int(kwargs['EXERCISES'])
+        if 'SEED' in kwargs:
+            self.SEED = int(kwargs['SEED'])
+        if 'M0_PATH' in kwargs:
+            self.M0_PATH = kwargs['M0_PATH']
+        if 'M1_PATH' in kwargs:
+            self.M1_PATH = kwargs['M1_PATH']
+        if 'CONFIGURATIONS' in kwargs:
+            self.CONFIGURATIONS = [tuple(int(x) for x in c.split('x')) for c in kwargs['CONFIGURATIONS'].split(',')]
+
+        print(Fore.CYAN + "Running throughput experiment with %d exercises per configuration." % self.EXERCISES)
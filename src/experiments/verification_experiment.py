@@ -0,0 +1,151 @@
+from src.experiments import Experiment
+from src.exercises import VirtualExercise
+from src.verification import FreivaldsVerifier, MerkleCommitter, MerkleVerifier, BatchVerifier, ValidationClaim
+
+import json
+import numpy as np
+import matplotlib.pyplot as plt
+
+from colorama import Fore
+
+
+class VerificationExperiment(Experiment):
+    """
+    Compares the time a validator spends checking a solution with the time a miner spends producing it, for
+    growing exercise sizes. Solutions are checked with FreivaldsVerifier (VerificationSchema.PROBABILISTIC), once
+    as computed and once with a single tampered entry, which must be rejected.
+    """
+
+    SIZES = [2000, 4000, 6000, 8000, 10000]
+    FALSE_ACCEPT = FreivaldsVerifier.FALSE_ACCEPT
+    SEED = 0
+
+    BLOCK_ROWS = MerkleCommitter.BLOCK_ROWS
+    SPOT_CHECKS = 4
+
+    BATCH_SIZES = [1, 2, 4, 8, 16]
+    BATCH_EXERCISE_SIZE = 5000
+    EXERCISE_POOL = 3
+
+    def __init__(self):
+        super().__init__()
+
+    def run(self):
+        results = self.run_probabilistic()
+        print(Fore.CYAN + "Verification benchmark complete: %s" % json.dumps(results, indent=4))
+        self.plot_results(results)
+        results = self.run_checksum()
+        print(Fore.CYAN + "Checksum benchmark complete: %s" % json.dumps(results, indent=4))
+        results = self.run_batch()
+        print(Fore.CYAN + "Batch benchmark complete: %s" % json.dumps(results, indent=4))
+        self.plot_batch_results(results)
+
+    def run_batch(self):
+        rng = np.random.default_rng(self.SEED)
+        size = self.BATCH_EXERCISE_SIZE
+        ids = [VirtualExercise(self.SEED + i, (size, size)).spec for i in range(self.EXERCISE_POOL)]
+        verifier = BatchVerifier(self.FALSE_ACCEPT, seed=self.SEED)
+        solutions = {}
+        results = []
+        for batchSize in self.BATCH_SIZES:
+            claims = []
+            for _ in range(batchSize):
+                m0Id, m1Id = ids[rng.integers(0, len(ids))], ids[rng.integers(0, len(ids))]
+                if (m0Id, m1Id) not in solutions:
+                    solutions[(m0Id, m1Id)] = np.dot(verifier.operand(m0Id), verifier.operand(m1Id))
+                claims.append(ValidationClaim(m0Id, m1Id, solutions[(m0Id, m1Id)]))
+            params = {'batchSize': batchSize, 'size': size}
+            result = self.harness.measure("batch verify", verifier.verify, claims, params=params,
+                                         resume=False)
+            results.append({'batchSize': batchSize, 'time': result.median, 'validationsPerSecond':
+                            batchSize / result.median, 'accepted': sum(result.value)})
+        return results
+
+    @staticmethod
+    def plot_batch_results(results):
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.plot(range(len(results)), [r['validationsPerSecond'] for r in results], color='royalblue')
+        ax1.set_xticks(range(len(results)))
+        ax1.set_xticklabels([r['batchSize'] for r in results])
+        ax1.set_xlabel("Batch size")
+        ax1.set_ylabel("Validations per second")
+        ax1.set_title("Batched probabilistic verification throughput")
+        fig.show()
+
+    def run_checksum(self):
+        rng = np.random.default_rng(self.SEED)
+        results = []
+        for size in self.SIZES:
+            m0 = np.asarray(VirtualExercise(self.SEED, (size, size)))
+            m1 = np.asarray(VirtualExercise(self.SEED + 1, (size, size)))
+            params = {'size': size, 'blockRows': self.BLOCK_ROWS}
+            solve = self.harness.measure("solve+commit", MerkleCommitter.solve_and_commit, m0, m1, self.BLOCK_ROWS,
+                                         params=params, resume=False)
+            res, tree = solve.value
+            verifier = MerkleVerifier(tree.root.hex(), tree.leaf_count, self.BLOCK_ROWS)
+            indices = rng.integers(0, tree.leaf_count, self.SPOT_CHECKS)
+            movedBytes = 0
+            checks = []
+            for index in indices:
+                rows = slice(index * self.BLOCK_ROWS, (index + 1) * self.BLOCK_ROWS)
+                proof = tree.proof(index)
+                movedBytes += res[rows].nbytes + sum(len(x) for x in proof)
+                checks.append(self.harness.measure("spot check", verifier.verify_block, index, res[rows], proof,
+                                                   params=params, resume=False))
+            results.append({'size': size, 'solveAndCommit': solve.median, 'root': tree.root.hex(),
+                            'blocks': tree.leaf_count, 'spotChecks': len(checks),
+                            'spotCheckTime': float(np.median([c.median for c in checks])),
+                            'allAccepted': all(c.value for c in checks), 'movedBytes': int(movedBytes),
+                            'solutionBytes': int(res.nbytes)})
+        return results
+
+    def run_probabilistic(self):
+        verifier = FreivaldsVerifier(self.FALSE_ACCEPT, seed=self.SEED)
+        results = []
+        for size in self.SIZES:
+            m0 = np.asarray(VirtualExercise(self.SEED, (size, size)))
+            m1 = np.asarray(VirtualExercise(self.SEED + 1, (size, size)))
+            params = {'size': size, 'falseAccept': self.FALSE_ACCEPT}
+            solve = self.harness.measure("solve", np.dot, m0, m1, params=params, resume=False)
+            claimed = solve.value
+            verify = self.harness.measure("freivalds", verifier.verify, m0, m1, claimed, params=params,
+                                          resume=False)
+            claimed[size // 2, size // 3] += 1
+            rejected = not verifier.verify(m0, m1, claimed)
+            results.append({'size': size, 'solve': solve.median, 'verify': verify.median, 'accepted': verify.value,
+                            'tamperRejected': rejected, 'rounds': verifier.rounds})
+        return results
+
+    @staticmethod
+    def plot_results(results):
+        fig, ax1 = plt.subplots(figsize=(7, 5))
+        ax1.plot(range(len(results)), [r['solve'] for r in results], color='royalblue')
+        ax1.plot(range(len(results)), [r['verify'] for r in results], color='lightsteelblue')
+        ax1.set_xticks(range(len(results)))
+        ax1.set_xticklabels(["%dK" % int(r['size'] / 1000) for r in results])
+        ax1.set_xlabel("Exercise size")
+        ax1.set_ylabel("Seconds")
+        ax1.set_title("Solve vs probabilistic verification time")
+        ax1.legend(['solve (dot)', 'verify (Freivalds)'])
+        fig.show()
+
+    def configure(self, **kwargs):
+        self.harness.configure(**kwargs)
+        if 'SIZES' in kwargs:
+            self.SIZES = [int(x) for x in kwargs['SIZES'].split(',')]
+        if 'FALSE_ACCEPT' in kwargs:
+            self.FALSE_ACCEPT = float(kwargs['FALSE_ACCEPT'])
+        if 'SEED' in kwargs:
+            self.SEED = int(kwargs['SEED'])
+        if 'BLOCK_ROWS' in kwargs:
+            self.BLOCK_ROWS = int(kwargs['BLOCK_ROWS'])
+        if 'SPOT_CHECKS' in kwargs:
+            self.SPOT_CHECKS = int(kwargs['SPOT_CHECKS'])
+        if 'BATCH_SIZES' in kwargs:
+            self.BATCH_SIZES = [int(x) for x in kwargs['BATCH_SIZES'].split(',')]
+        if 'BATCH_EXERCISE_SIZE' in kwargs:
+            self.BATCH_EXERCISE_SIZE = int(kwargs['BATCH_EXERCISE_SIZE'])
+        if 'EXERCISE_POOL' in kwargs:
+            self.EXERCISE_POOL = int(kwargs['EXERCISE_POOL'])
+
+        print(Fore.CYAN + "Running verification experiment on sizes %s." % self.SIZES)
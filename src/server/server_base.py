@@ -1,5 +1,6 @@
 import SolveRequest_pb2
 import ValidateRequest_pb2
+import BlockProof_pb2
 
 import pythonp2p
 from colorama import Fore
@@ -9,6 +10,8 @@ class Server(pythonp2p.Node):
 
     SOLVE_REQUEST_CODE = 1
     VALIDATE_REQUEST_CODE = 2
+    BLOCK_REQUEST_CODE = 3
+    BLOCK_PROOF_CODE = 4
 
     recvMode = False
 
@@ -62,6 +65,10 @@ class Server(pythonp2p.Node):
             protobuf = SolveRequest_pb2.SolveRequest()
         if code == self.VALIDATE_REQUEST_CODE:
             protobuf = ValidateRequest_pb2.ValidateRequest()
+        if code == self.BLOCK_REQUEST_CODE:
+            protobuf = BlockProof_pb2.BlockRequest()
+        if code == self.BLOCK_PROOF_CODE:
+            protobuf = BlockProof_pb2.BlockProof()
 
         if protobuf is None:
             raise RuntimeError("Received unknown object code %d." % code)
@@ -74,3 +81,7 @@ class Server(pythonp2p.Node):
             return int.to_bytes(self.SOLVE_REQUEST_CODE, 4, 'big')
         if isinstance(protobuf, ValidateRequest_pb2.ValidateRequest):
             return int.to_bytes(self.VALIDATE_REQUEST_CODE, 4, 'big')
+        if isinstance(protobuf, BlockProof_pb2.BlockRequest):
+            return int.to_bytes(self.BLOCK_REQUEST_CODE, 4, 'big')
+        if isinstance(protobuf, BlockProof_pb2.BlockProof):
+            return int.to_bytes(self.BLOCK_PROOF_CODE, 4, 'big')
@@ -0,0 +1,9 @@
+from src.solvers.sparse_solver import SparseAwareSolver
+from src.solvers.blocked_solver import OutOfCoreSolver
+from src.solvers.solver_pool import SharedMatrix, SolverPool
+from src.solvers.precision_solver import PrecisionSolver
+from src.solvers.solution_cache import SolutionCache
+from src.solvers.nmf_solver import IncrementalNMFSolver
+from src.solvers.size_calibrator import SizeCalibrator
+from src.solvers.mining_pipeline import MiningPipeline
+from src.solvers.streaming_solver import StreamingSolver
@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+
+from colorama import Fore
+
+from src.exercises import ExerciseFormat
+
+
+class OutOfCoreSolver:
+    """
+    Tiled multiplication for exercises that do not fit in memory.
+
+    m0 is streamed in row panels and m1 in column panels, straight from memory-mapped exercise files (or
+    VirtualExercises). Each panel product is written into its slot of the result, which can itself be a memory-mapped
+    ExerciseFormat file. Panel sizes are picked so that one m0 panel, one m1 panel and one result tile fit together
+    in memoryBudget bytes.
+
+    Column panels of a row-major file are strided reads, and every row panel re-reads all of m1, so the solver is
+    I/O bound on slow disks. Larger budgets mean fewer, larger panels and less re-reading.
+    """
+
+    MEMORY_BUDGET = 2 * 1024 * 1024 * 1024
+
+    def __init__(self, memoryBudget=MEMORY_BUDGET):
+        self.memoryBudget = memoryBudget
+        self.stats = {}
+
+    def panel_size(self, inner, itemsize):
+        """
+        Largest panel side s such that 2 * inner * s + s * s elements fit in the budget.
+        :param inner: shared dimension of the two operands
+        :param itemsize: bytes per element
+        :return: panel side, in rows of m0 / columns of m1
+        """
+        budget = self.memoryBudget // itemsize
+        side = int(np.sqrt(inner * inner + budget) - inner)
+        if side < 1:
+            raise RuntimeError("Memory budget of %d bytes cannot hold a single %d element panel." %
+                               (self.memoryBudget, inner))
+        return side
+
+    def solve(self, m0, m1, outPath=None, blockRows=ExerciseFormat.BLOCK_ROWS, committer=None):
+        """
+        Computes m0 x m1 panel by panel.
+        :param m0: n x k operand, e.g. loaded with ExerciseLoader or a VirtualExercise
+        :param m1: k x p operand
+        :param outPath: ExerciseFormat file receiving the product. The product is kept in memory when None
+        :param blockRows: checksum block size of the result file
+        :param committer: MerkleCommitter fed with result row-blocks as soon as their row panel is done
+        :return: n x p product (np.memmap when outPath is set)
+        """
+        if m0.shape[1] != m1.shape[0]:
+            raise RuntimeError("Cannot multiply %dx%d by %dx%d." % (m0.shape + m1.shape))
+        rows, inner, cols = m0.shape[0], m0.shape[1], m1.shape[1]
+        dtype = np.result_type(m0.dtype, m1.dtype)
+        side = self.panel_size(inner, dtype.itemsize)
+        # Row panels are whole checksum blocks, so each block is final once its panel is done
+        panelRows = min(rows, side // blockRows * blockRows if side >= blockRows else side)
+        panelCols = min(cols, side)
+
+        header = None
+        if outPath is not None:
+            header = ExerciseFormat.new_header((rows, cols), dtype, blockRows=blockRows)
+            res = ExerciseFormat.allocate(outPath, header)
+        else:
+            res = np.empty((rows, cols), dtype=dtype)
+
+        startTime = time.perf_counter()
+        bytesRead = 0
+        right = None
+        committed = 0
+        for r0 in range(0, rows, panelRows):
+            r1 = min(rows, r0 + panelRows)
+            left = np.ascontiguousarray(m0[r0:r1, :])
+            bytesRead += left.nbytes
+            for c0 in range(0, cols, panelCols):
+                c1 = min(cols, c0 + panelCols)
+                # A single column panel covers all of m1, keep it resident across row panels
+                if right is None or panelCols < cols:
+                    right = np.ascontiguousarray(m1[:, c0:c1])
+                    bytesRead += right.nbytes
+                res[r0:r1, c0:c1] = np.dot(left, right)
+            if header is not None:
+                self._checksum_panel(res, header, r0, r1)
+            if committer is not None:
+                committed = self._commit_panel(res, committer, committed, r1)
+            print(Fore.CYAN + "Multiplied row panel %d-%d/%d" % (r0, r1, rows))
+
+        if header is not None:
+            res.flush()
+            ExerciseFormat.write_header(outPath, header)
+
+        self.stats = {'time': time.perf_counter() - startTime, 'panelRows': panelRows, 'panelCols': panelCols,
+                      'bytesRead': bytesRead, 'memoryBudget': self.memoryBudget}
+        print(Fore.CYAN + "Out-of-core multiply of %dx%d by %dx%d in %.2f seconds (%dx%d panels, %.2f Gb read)" %
+              (rows, inner, inner, cols, self.stats['time'], panelRows, panelCols, bytesRead / 1024 ** 3))
+        return res
+
+    @staticmethod
+    def _checksum_panel(res, header, r0, r1):
+        for index in range(r0 // header.blockRows, -(-r1 // header.blockRows)):
+            start, end = header.block_range(index)
+            header.checksums[index] = ExerciseFormat.checksum(res[start:end])
+
+    @staticmethod
+    def _commit_panel(res, committer, committed, r1):
+        # Hash every committer block that is complete once rows up to r1 are final
+        while committed < r1 and (committed + committer.blockRows <= r1 or r1 == res.shape[0]):
+            committer.add_rows(res[committed:committed + committer.blockRows])
+            committed += committer.blockRows
+        return committed
@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+from colorama import Fore
+
+
+class MiningPipeline:
+    """
+    Overlaps exercise downloads with solving. Fetcher threads download the operands of upcoming jobs into a bounded
+    prefetch queue while the calling thread solves the current one, so a block costs max(download, solve) in steady
+    state instead of their sum.
+
+    The queue holds at most PREFETCH fetched jobs, and fetchers don't start a new job while the operands held by the
+    pipeline (queued and being solved) take memoryBudget bytes or more. A job may always be fetched when none is queued
+    or in flight, so the solver never starves and exercises bigger than the budget still go through, one at a time.
+
+    Utilization is busy time over wall time per stage: network utilization counts the time fetchers spend downloading
+    (blocked on a full queue or on the budget counts as idle), CPU utilization the time spent solving (waiting on an
+    empty queue counts as idle).
+    """
+
+    PREFETCH = 2
+    MEMORY_BUDGET = 4 * 1024 ** 3
+    FETCH_WORKERS = 1
+
+    def __init__(self, fetch, solve, prefetch=PREFETCH, memoryBudget=MEMORY_BUDGET, fetchWorkers=FETCH_WORKERS):
+        """
+        :param fetch: callable(exerciseId) -> ndarray, downloads and decodes one exercise
+        :param solve: callable(*operands) -> result of one job
+        :param prefetch: fetched jobs waiting to be solved, at most
+        :param memoryBudget: bytes of operands held by the pipeline before fetchers pause
+        :param fetchWorkers: concurrent fetcher threads
+        """
+        self.fetch = fetch
+        self.solve = solve
+        self.prefetch = prefetch
+        self.memoryBudget = memoryBudget
+        self.fetchWorkers = fetchWorkers
+        self.stats = None
+
+    def run(self, jobs):
+        """
+        :param jobs: list of tuples of exercise ids, e.g. [(m0Id, m1Id), ...]
+        :return: solve results, in job order
+        """
+        pending = deque(enumerate(jobs))
+        ready = {}
+        condition = threading.Condition()
+        state = {'held': 0, 'fetching': 0, 'error': None, 'peak': 0}
+        fetchBusy = [0.0] * self.fetchWorkers
+        fetchBytes = [0] * self.fetchWorkers
+
+        def fetcher(worker):
+            while True:
+                with condition:
+                    while pending and state['error'] is None and (
+                            len(ready) + state['fetching'] >= self.prefetch or
+                            (state['held'] >= self.memoryBudget and (ready or state['fetching']))):
+                        condition.wait()
+                    if not pending or state['error'] is not None:
+                        return
+                    index, job = pending.popleft()
+                    state['fetching'] += 1
+                try:
+                    startTime = time.perf_counter()
+                    fetched = {}
+                    for exerciseId in job:
+                        if exerciseId not in fetched:
+                            fetched[exerciseId] = self.fetch(exerciseId)
+                    operands = [fetched[exerciseId] for exerciseId in job]
+                    fetchBusy[worker] += time.perf_counter() - startTime
+                    size = sum(np.asarray(m).nbytes for m in fetched.values())
+                    fetchBytes[worker] += size
+                except BaseException as e:
+                    with condition:
+                        state['error'] = e
+                        condition.notify_all()
+                    return
+                with condition:
+                    state['fetching'] -= 1
+                    state['held'] += size
+                    state['peak'] = max(state['peak'], state['held'])
+                    ready[index] = (operands, size)
+                    condition.notify_all()
+
+        threads = [threading.Thread(target=fetcher, args=(i,), daemon=True) for i in range(self.fetchWorkers)]
+        wallStart = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        results = []
+        solveBusy = 0.0
+        solveWait = 0.0
+        try:
+            for index in range(len(jobs)):
+                waitStart = time.perf_counter()
+                with condition:
+                    while index not in ready and state['error'] is None:
+                        condition.wait()
+                    if state['error'] is not None:
+                        raise state['error']
+                    operands, size = ready.pop(index)
+                    condition.notify_all()
+                solveStart = time.perf_counter()
+                solveWait += solveStart - waitStart
+                results.append(self.solve(*operands))
+                solveBusy += time.perf_counter() - solveStart
+                del operands
+                with condition:
+                    state['held'] -= size
+                    condition.notify_all()
+                print(Fore.CYAN + "Pipeline solved job %d/%d (%d prefetched)" % (index + 1, len(jobs), len(ready)))
+        except BaseException as e:
+            # Stop the fetchers instead of leaving them blocked on the queue
+            with condition:
+                state['error'] = state['error'] or e
+                condition.notify_all()
+            raise
+
+        for thread in threads:
+            thread.join()
+        wallTime = time.perf_counter() - wallStart
+        networkUtilization = sum(fetchBusy) / self.fetchWorkers / wallTime if wallTime > 0 else 0.0
+        cpuUtilization = solveBusy / wallTime if wallTime > 0 else 0.0
+        self.stats = {'jobs': len(jobs), 'wallTime': wallTime, 'fetchTime': sum(fetchBusy), 'solveTime': solveBusy,
+                      'solveWait': solveWait, 'serialTime': sum(fetchBusy) + solveBusy,
+                      'networkUtilization': networkUtilization, 'networkIdle': 1 - networkUtilization,
+                      'cpuUtilization': cpuUtilization, 'cpuIdle': 1 - cpuUtilization,
+                      'fetchedBytes': sum(fetchBytes), 'peakHeldBytes': state['peak'],
+                      'proofsPerHour': len(jobs) / wallTime * 3600 if wallTime > 0 else 0.0,
+                      'prefetch': self.prefetch, 'memoryBudget': self.memoryBudget,
+                      'fetchWorkers': self.fetchWorkers}
+        print(Fore.CYAN + "Pipeline: %d jobs in %.2f s (serial %.2f s), %.1f proofs/hour, network idle %.0f%%, "
+                          "CPU idle %.0f%%" % (len(jobs), wallTime, self.stats['serialTime'],
+                                               self.stats['proofsPerHour'], 100 * self.stats['networkIdle'],
+                                               100 * self.stats['cpuIdle']))
+        return results
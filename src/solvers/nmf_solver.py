@@ -0,0 +1,134 @@
+import time
+
+import numpy as np
+from sklearn.decomposition import NMF
+
+from colorama import Fore
+
+
+class IncrementalNMFSolver:
+    """
+    NMF solver modes that reuse previous work.
+
+    #fit warm-starts a factorization from an existing (W, H) pair: the previous components are kept and only the new
+    ones are initialized randomly (scaled like sklearn's 'random' init), so growing n_components from 10 to 20
+    refines a solution instead of restarting from noise. #sweep does this over a list of component counts and reports
+    time, iterations and reconstruction error per step.
+
+    #fit_online factorizes matrices that are streamed by row-blocks (memory-mapped exercises, VirtualExercises)
+    with online multiplicative updates: every block gets its W rows from the current H, and H is updated from
+    accumulated sufficient statistics, so only one block of X is resident at a time. X must be non-negative.
+    """
+
+    MAX_ITER = 200
+    TOL = 1e-4
+    BLOCK_ROWS = 1024
+    EPOCHS = 5
+    INNER_ITER = 10
+    EPS = 1e-10
+
+    def __init__(self, maxIter=MAX_ITER, tol=TOL, seed=0):
+        self.maxIter = maxIter
+        self.tol = tol
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.history = []
+
+    def pad(self, X, W, H, nComponents):
+        """
+        Extends (W, H) with randomly initialized components up to nComponents.
+        """
+        scale = np.sqrt(X.mean() / nComponents)
+        if W is None or H is None:
+            W = np.zeros((X.shape[0], 0))
+            H = np.zeros((0, X.shape[1]))
+        extra = nComponents - W.shape[1]
+        if extra < 0:
+            raise RuntimeError("Cannot warm start %d components from %d." % (nComponents, W.shape[1]))
+        W = np.hstack([W, scale * np.abs(self.rng.standard_normal((X.shape[0], extra)))])
+        H = np.vstack([H, scale * np.abs(self.rng.standard_normal((extra, X.shape[1])))])
+        return np.ascontiguousarray(W, dtype=X.dtype), np.ascontiguousarray(H, dtype=X.dtype)
+
+    def fit(self, X, nComponents, W=None, H=None):
+        """
+        :param X: non-negative matrix
+        :param nComponents: target number of components
+        :param W: previous n x k' factor to warm start from (k' <= nComponents), cold start when None
+        :param H: previous k' x m factor
+        :return: W, H and a dict with time, iterations and reconstruction error
+        """
+        W, H = self.pad(X, W, H, nComponents)
+        startTime = time.perf_counter()
+        nmf = NMF(n_components=nComponents, init='custom', max_iter=self.maxIter, tol=self.tol,
+                  random_state=self.seed)
+        W = nmf.fit_transform(X, W=W, H=H)
+        stats = {'components': nComponents, 'time': time.perf_counter() - startTime, 'iterations': nmf.n_iter_,
+                 'error': float(nmf.reconstruction_err_)}
+        self.history.append(stats)
+        print(Fore.CYAN + "NMF with %d components: %d iterations, error %.4e, %.2f seconds" %
+              (nComponents, stats['iterations'], stats['error'], stats['time']))
+        return W, nmf.components_, stats
+
+    def sweep(self, X, components, warmStart=True):
+        """
+        Factorizes X for every component count in increasing order.
+        :return: list of per-step stats
+        """
+        W, H = None, None
+        steps = []
+        for nComponents in sorted(components):
+            W, H, stats = self.fit(X, nComponents, W if warmStart else None, H if warmStart else None)
+            stats['warmStart'] = warmStart
+            steps.append(stats)
+        return steps
+
+    def fit_online(self, X, nComponents, blockRows=BLOCK_ROWS, epochs=EPOCHS, H=None):
+        """
+        Online NMF over row-blocks of X.
+        :param X: non-negative n x m matrix, read one row-block at a time
+        :param nComponents: number of components
+        :param blockRows: rows per streamed block
+        :param epochs: passes over X
+        :param H: components to warm start from, padded like #fit
+        :return: W, H and a dict with time, epochs and the relative error of every epoch
+        """
+        rows, cols = X.shape
+        first = np.asarray(X[0:min(rows, blockRows)], dtype=np.float64)
+        scale = np.sqrt(max(first.mean(), self.EPS) / nComponents)
+        extra = nComponents - (0 if H is None else H.shape[0])
+        newH = scale * np.abs(self.rng.standard_normal((extra, cols)))
+        H = newH if H is None else np.vstack([H, newH])
+        W = np.empty((rows, nComponents))
+        A = np.zeros((nComponents, nComponents))
+        B = np.zeros((nComponents, cols))
+
+        startTime = time.perf_counter()
+        errors = []
+        for epoch in range(epochs):
+            residual = 0.0
+            norm = 0.0
+            for start in range(0, rows, blockRows):
+                block = np.asarray(X[start:start + blockRows], dtype=np.float64)
+                w = scale * np.abs(self.rng.standard_normal((block.shape[0], nComponents))) if epoch == 0 \
+                    else W[start:start + blockRows]
+                HHt = H @ H.T
+                XHt = block @ H.T
+                for _ in range(self.INNER_ITER):
+                    w *= XHt / (w @ HHt + self.EPS)
+                W[start:start + blockRows] = w
+                # Older blocks are weighted down as H moves away from the basis their W was fitted on
+                decay = 1.0 - 1.0 / (start // blockRows + 2)
+                A = decay * A + w.T @ w
+                B = decay * B + w.T @ block
+                H *= B / (A @ H + self.EPS)
+                residual += np.linalg.norm(block - w @ H) ** 2
+                norm += np.linalg.norm(block) ** 2
+            errors.append(float(np.sqrt(residual / max(norm, self.EPS))))
+            print(Fore.CYAN + "Online NMF epoch %d/%d: relative error %.4e" % (epoch + 1, epochs, errors[-1]))
+            if len(errors) > 1 and abs(errors[-2] - errors[-1]) < self.tol * errors[-2]:
+                break
+
+        stats = {'components': nComponents, 'time': time.perf_counter() - startTime, 'epochs': len(errors),
+                 'errors': errors}
+        self.history.append(stats)
+        return W, H, stats
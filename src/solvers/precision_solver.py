@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+
+from colorama import Fore
+
+from src.benchmark import BenchmarkHarness
+
+
+class PrecisionSolver:
+    """
+    Solves exercises at reduced precision and measures what it costs in accuracy and what it saves in time,
+    memory and download size, against a float64 reference.
+
+    Each mode stores the exercise in one dtype (what miners download) and multiplies in another (what the BLAS call
+    accumulates in). float16 has no BLAS kernel, so it is a storage-only format accumulated in float32, and operands
+    are scaled by a power of two when they exceed its range. Integer
+    modes quantize both operands with a shared power of two scale chosen so that no dot product can overflow the
+    accumulator; numpy's integer matmul is not BLAS backed, so expect them to be slow.
+    """
+
+    # mode -> (storage dtype, compute dtype)
+    MODES = {
+        'float64': (np.float64, np.float64),
+        'float32': (np.float32, np.float32),
+        'float16': (np.float16, np.float32),
+        'int64': (np.int64, np.int64),
+        'int32': (np.int32, np.int32)
+    }
+
+    def __init__(self, modes=None):
+        self.modes = modes if modes is not None else list(self.MODES.keys())
+
+    @staticmethod
+    def quantize(m0, m1, dtype):
+        """
+        Scales both operands to integers with power of two scales chosen so that no inner product overflows dtype.
+        :return: quantized m0, quantized m1 and the product scale (m0 x m1 ~= q0 x q1 / scale)
+        """
+        # inner * (max0 * s0) * (max1 * s1) <= limit, split evenly between the operands
+        bound = np.sqrt(np.iinfo(dtype).max / m0.shape[1])
+        scales = []
+        for m in [m0, m1]:
+            scales.append(2.0 ** np.floor(np.log2(bound / max(float(np.max(np.abs(m))), 1e-300))))
+        return np.rint(m0 * scales[0]).astype(dtype), np.rint(m1 * scales[1]).astype(dtype), scales[0] * scales[1]
+
+    @staticmethod
+    def fit_range(m, dtype):
+        """
+        Casts m to a float dtype, scaling it down by a power of two first if it would overflow (float16 tops out at
+        65504, below the 1M exercise values).
+        :return: cast matrix and its scale (m ~= cast / scale)
+        """
+        limit = float(np.finfo(dtype).max) / 2
+        maxM = float(np.max(np.abs(m)))
+        scale = 1.0 if maxM <= limit else 2.0 ** np.floor(np.log2(limit / maxM))
+        return (m * scale).astype(dtype), scale
+
+    def solve(self, m0, m1, mode):
+        """
+        Multiplies m0 x m1 in the given mode.
+        :return: float64 product, seconds spent in the multiplication, and the stored operands
+        """
+        storage, compute = self.MODES[mode]
+        if np.issubdtype(storage, np.integer):
+            s0, s1, scale = self.quantize(m0, m1, storage)
+        else:
+            s0, scale0 = self.fit_range(m0, storage)
+            s1, scale1 = self.fit_range(m1, storage)
+            scale = scale0 * scale1
+
+        c0 = s0 if compute == storage else s0.astype(compute)
+        c1 = s1 if compute == storage else s1.astype(compute)
+        startTime = time.perf_counter()
+        res = np.dot(c0, c1)
+        totalTime = time.perf_counter() - startTime
+        return res.astype(np.float64) / scale, totalTime, (s0, s1)
+
+    def compare(self, m0, m1, harness=None):
+        """
+        Runs every configured mode on the same exercise.
+        :param m0: float64 left operand
+        :param m1: float64 right operand
+        :param harness: BenchmarkHarness timing the multiplications, a default one when None
+        :return: list of dicts with mode, seconds, GFLOP/s, memory footprint, download bytes and errors vs float64
+        """
+        harness = harness if harness is not None else BenchmarkHarness()
+        m0, m1 = np.asarray(m0, dtype=np.float64), np.asarray(m1, dtype=np.float64)
+        reference = np.dot(m0, m1)
+        refNorm = max(np.linalg.norm(reference), 1e-300)
+        flops = 2.0 * m0.shape[0] * m0.shape[1] * m1.shape[1]
+        results = []
+        for mode in self.modes:
+            res, _, (s0, s1) = self.solve(m0, m1, mode)
+            storage, compute = self.MODES[mode]
+            c0 = s0 if compute == storage else s0.astype(compute)
+            c1 = s1 if compute == storage else s1.astype(compute)
+            params = {'mode': mode, 'rows': m0.shape[0], 'cols': m0.shape[1]}
+            totalTime = harness.measure("dot %s" % mode, np.dot, c0, c1, params=params).median
+            downloadBytes = s0.nbytes + s1.nbytes
+            # Stored operands, compute copies when the dtype differs, and the product in the compute dtype
+            footprint = downloadBytes + res.size * np.dtype(compute).itemsize
+            if compute != storage:
+                footprint += (s0.size + s1.size) * np.dtype(compute).itemsize
+            error = np.abs(res - reference)
+            results.append({'mode': mode, 'time': totalTime, 'gflops': flops / max(totalTime, 1e-9) / 1e9,
+                            'memoryBytes': int(footprint), 'downloadBytes': int(downloadBytes),
+                            'maxError': float(np.max(error)),
+                            'relError': float(np.linalg.norm(res - reference) / refNorm)})
+            print(Fore.CYAN + "%s: %.2f s (%.1f GFLOP/s), %.1f Mb to download, max error %.3e, relative error %.3e" %
+                  (mode, totalTime, results[-1]['gflops'], downloadBytes / 1024 / 1024, results[-1]['maxError'],
+                   results[-1]['relError']))
+        return results
@@ -0,0 +1,115 @@
+import numpy as np
+
+from colorama import Fore
+
+from src.benchmark import BenchmarkHarness
+
+
+class SizeCalibrator:
+    """
+    Finds the exercise size that takes targetTime seconds to solve on this host in a handful of multiplications.
+
+    Solve time is modelled as t(n) = a * n^b (b ~ 3 for a compute bound dot, lower while memory bound), fitted by
+    least squares in log-log space over every measurement so far, with b kept within [MIN_EXPONENT, MAX_EXPONENT] so
+    noisy small-size timings can't flip or flatten the curve. Each step jumps to the size the model predicts for
+    targetTime (between the smallest measured size / MAX_GROWTH and the largest * MAX_GROWTH), and falls back to
+    bisection whenever the prediction leaves the bracket of sizes known to be too fast / too slow (or grows / shrinks
+    by MAX_GROWTH from the one known bound until both are). It stops once a measurement lands within tolerance of
+    targetTime.
+    """
+
+    TOLERANCE = 0.05
+    MAX_RUNS = 10
+    MAX_GROWTH = 2.0
+    MIN_EXPONENT = 1.0
+    MAX_EXPONENT = 3.0
+    ROUND_TO = 100
+
+    def __init__(self, targetTime, tolerance=TOLERANCE, harness=None, ratio=1.0, seed=0):
+        """
+        :param targetTime: solve time to hit, in seconds
+        :param tolerance: accepted relative deviation from targetTime
+        :param harness: BenchmarkHarness timing each multiplication, 2 repetitions without warmup when None
+        :param ratio: cols / rows of the m0 exercise (m1 is the transposed shape)
+        :param seed: RNG seed of the generated exercises
+        """
+        self.targetTime = targetTime
+        self.tolerance = tolerance
+        self.harness = harness if harness is not None else BenchmarkHarness(0, 2)
+        self.ratio = ratio
+        self.rng = np.random.default_rng(seed)
+        self.samples = []
+
+    def measure(self, n):
+        m0 = self.rng.standard_normal((n, max(1, int(n * self.ratio))))
+        m1 = self.rng.standard_normal((m0.shape[1], n))
+        return self.harness.measure("calibration dot", np.dot, m0, m1, params={'rows': n, 'cols': m0.shape[1]}).median
+
+    def fit(self):
+        """
+        :return: (a, b) of t(n) = a * n^b. b defaults to MAX_EXPONENT until two distinct sizes were measured
+        """
+        sizes = np.log([x[0] for x in self.samples])
+        times = np.log([max(x[1], 1e-9) for x in self.samples])
+        if len(set(sizes)) < 2:
+            return float(np.exp(times[-1] - self.MAX_EXPONENT * sizes[-1])), self.MAX_EXPONENT
+        b, logA = np.polyfit(sizes, times, 1)
+        if not self.MIN_EXPONENT <= b <= self.MAX_EXPONENT:
+            # Refit a for the clamped exponent
+            b = min(self.MAX_EXPONENT, max(self.MIN_EXPONENT, b))
+            logA = np.mean(times - b * sizes)
+        return float(np.exp(logA)), float(b)
+
+    def predict(self, a, b):
+        return (self.targetTime / a) ** (1 / b)
+
+    def round(self, n):
+        return max(self.ROUND_TO, int(round(n / self.ROUND_TO)) * self.ROUND_TO)
+
+    def calibrate(self, startSize, maxRuns=MAX_RUNS):
+        """
+        :param startSize: rows of the first measured exercise
+        :param maxRuns: measurement budget
+        :return: dict with the calibrated size, its solve time, whether it is within tolerance, the fitted model
+                 and every (size, seconds) sample
+        """
+        lo, hi = None, None
+        n = self.round(startSize)
+        best = None
+        for run in range(maxRuns):
+            t = self.measure(n)
+            self.samples.append((n, t))
+            print(Fore.CYAN + "Calibration run %d: %d rows in %.3f seconds (target %.2f)" % (run + 1, n, t,
+                                                                                             self.targetTime))
+            if best is None or abs(t - self.targetTime) < abs(best[1] - self.targetTime):
+                best = (n, t)
+            if abs(t - self.targetTime) <= self.tolerance * self.targetTime:
+                break
+            if t < self.targetTime:
+                lo = n if lo is None else max(lo, n)
+            else:
+                hi = n if hi is None else min(hi, n)
+
+            a, b = self.fit()
+            nextSize = min(self.predict(a, b), max(x[0] for x in self.samples) * self.MAX_GROWTH)
+            nextSize = max(nextSize, min(x[0] for x in self.samples) / self.MAX_GROWTH)
+            if (lo is not None and nextSize <= lo) or (hi is not None and nextSize >= hi):
+                if lo is not None and hi is not None:
+                    nextSize = (lo + hi) / 2
+                elif lo is not None:
+                    nextSize = lo * self.MAX_GROWTH
+                else:
+                    nextSize = hi / self.MAX_GROWTH
+            nextSize = self.round(nextSize)
+            if nextSize in (x[0] for x in self.samples):
+                # Rounding cannot get any closer
+                break
+            n = nextSize
+
+        a, b = self.fit()
+        result = {'size': best[0], 'time': best[1], 'target': self.targetTime,
+                  'withinTolerance': abs(best[1] - self.targetTime) <= self.tolerance * self.targetTime,
+                  'model': {'a': a, 'b': b}, 'samples': self.samples, 'runs': len(self.samples)}
+        print(Fore.CYAN + "Calibrated exercise size: %d rows solve in %.3f seconds after %d runs, t(n) = %.3e * n^%.2f"
+              % (best[0], best[1], len(self.samples), a, b))
+        return result
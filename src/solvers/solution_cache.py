@@ -0,0 +1,135 @@
+import os
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from colorama import Fore
+
+from src.exercises import ExerciseFormat, ExerciseLoader
+
+
+class SolutionCache:
+    """
+    Content-addressed cache of exercise solutions, keyed by sha256(m0Id, m1Id, solver, dtype).
+
+    A size-bounded in-memory LRU sits in front of an on-disk store of ExerciseFormat files. Disk entries are
+    written atomically (tmp file + rename), verified against their block checksums when read back (corrupted entries
+    are dropped and count as misses) and evicted least recently used first, using the file mtime as access time so
+    the order survives restarts. Returned arrays are shared with the in-memory front: copy before modifying them.
+
+    #stats exposes hit/miss counters and the bytes of products that did not have to be recomputed.
+    """
+
+    CACHE_DIR = "./resources/solution_cache"
+    MEMORY_BYTES = 2 * 1024 * 1024 * 1024
+    DISK_BYTES = 50 * 1024 * 1024 * 1024
+
+    def __init__(self, cacheDir=CACHE_DIR, memoryBytes=MEMORY_BYTES, diskBytes=DISK_BYTES, verify=True):
+        self.cacheDir = cacheDir
+        self.memoryBytes = memoryBytes
+        self.diskBytes = diskBytes
+        self.verify = verify
+        self.memory = OrderedDict()
+        self.memoryUsed = 0
+        self.counters = {'memoryHits': 0, 'diskHits': 0, 'misses': 0, 'bytesSaved': 0, 'evictions': 0,
+                         'corrupted': 0}
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    @staticmethod
+    def key(m0Id, m1Id, solver, dtype):
+        return hashlib.sha256(("%s|%s|%s|%s" % (m0Id, m1Id, solver, np.dtype(dtype).str)).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cacheDir, key + ".dat")
+
+    def get(self, m0Id, m1Id, solver='DotSolver', dtype=np.float64):
+        """
+        :return: cached solution, or None on a miss
+        """
+        key = self.key(m0Id, m1Id, solver, dtype)
+        path = self.path(key)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            if os.path.isfile(path):
+                os.utime(path)
+            return self._hit('memoryHits', self.memory[key])
+
+        if os.path.isfile(path):
+            try:
+                res = ExerciseLoader.load(path, verify=self.verify)
+            except RuntimeError as e:
+                print(Fore.YELLOW + "Dropping corrupted cache entry %s: %s" % (path, e))
+                self.counters['corrupted'] += 1
+                os.remove(path)
+            else:
+                os.utime(path)
+                self._remember(key, res)
+                return self._hit('diskHits', res)
+
+        self.counters['misses'] += 1
+        return None
+
+    def put(self, m0Id, m1Id, res, solver='DotSolver'):
+        key = self.key(m0Id, m1Id, solver, res.dtype)
+        path = self.path(key)
+        tmpPath = "%s.%d.tmp" % (path, os.getpid())
+        # The header only labels the solution, the full solver name is part of the key
+        ExerciseFormat.write(tmpPath, res, distribution=solver[:ExerciseFormat.DISTRIBUTION_SIZE])
+        os.replace(tmpPath, path)
+        self._remember(key, res)
+        self._evict_disk()
+
+    def get_or_solve(self, m0Id, m1Id, solve, solver='DotSolver', dtype=np.float64):
+        """
+        :param solve: callable computing the solution on a miss
+        :return: solution, cached or freshly computed
+        """
+        res = self.get(m0Id, m1Id, solver, dtype)
+        if res is None:
+            res = solve()
+            self.put(m0Id, m1Id, res, solver)
+        return res
+
+    def stats(self):
+        stats = dict(self.counters)
+        lookups = stats['memoryHits'] + stats['diskHits'] + stats['misses']
+        stats['hitRate'] = (stats['memoryHits'] + stats['diskHits']) / lookups if lookups else 0.0
+        stats['memoryBytes'] = self.memoryUsed
+        stats['diskBytes'] = sum(size for _, size, _ in self._disk_entries())
+        return stats
+
+    def _hit(self, counter, res):
+        self.counters[counter] += 1
+        self.counters['bytesSaved'] += res.nbytes
+        return res
+
+    def _remember(self, key, res):
+        if res.nbytes > self.memoryBytes:
+            return
+        if key in self.memory:
+            self.memoryUsed -= self.memory.pop(key).nbytes
+        self.memory[key] = res
+        self.memoryUsed += res.nbytes
+        while self.memoryUsed > self.memoryBytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memoryUsed -= evicted.nbytes
+
+    def _disk_entries(self):
+        entries = []
+        for file in os.listdir(self.cacheDir):
+            if file.endswith(".dat"):
+                stat = os.stat(os.path.join(self.cacheDir, file))
+                entries.append((file, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda x: x[2])
+        used = sum(size for _, size, _ in entries)
+        for file, size, _ in entries:
+            if used <= self.diskBytes:
+                break
+            os.remove(os.path.join(self.cacheDir, file))
+            self.memory.pop(file[:-len(".dat")], None)
+            used -= size
+            self.counters['evictions'] += 1
@@ -0,0 +1,147 @@
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from colorama import Fore
+
+
+class SharedMatrix:
+    """
+    Picklable handle to a matrix living in a shared memory segment. Only the handle travels to workers, the data is
+    mapped in place.
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    def __repr__(self):
+        return "SharedMatrix(%s, %dx%d %s)" % (self.name, self.shape[0], self.shape[1], self.dtype)
+
+
+class SolverPool:
+    """
+    Solves many exercises concurrently in worker processes.
+
+    Input matrices are copied once into shared memory by #share and attached by workers, so they are never pickled.
+    Every worker caps its BLAS thread pool to threadsPerWorker (threadpoolctl + the usual *_NUM_THREADS variables),
+    so workers x threads can be matched to the core count instead of letting every BLAS call grab all cores.
+    Results are reduced to a checksum in the worker; miners care about exercises per hour, not shipping 800Mb
+    products between processes.
+    """
+
+    BLAS_THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS"]
+
+    # Per worker process: segment name -> (SharedMemory, ndarray)
+    ATTACHED = {}
+
+    def __init__(self, workers, threadsPerWorker):
+        self.workers = workers
+        self.threadsPerWorker = threadsPerWorker
+        self.segments = []
+        self.pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        # Start the tracker before forking so workers inherit it instead of starting their own
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(self.workers, initializer=SolverPool._init_worker,
+                                         initargs=(self.threadsPerWorker,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+    def share(self, m):
+        """
+        Copies m into a new shared memory segment owned by this pool.
+        :param m: matrix (any array-like, e.g. a memory-mapped exercise)
+        :return: SharedMatrix handle to pass to #solve
+        """
+        m = np.asarray(m)
+        segment = shared_memory.SharedMemory(create=True, size=m.nbytes)
+        np.ndarray(m.shape, dtype=m.dtype, buffer=segment.buf)[...] = m
+        self.segments.append(segment)
+        return SharedMatrix(segment.name, m.shape, m.dtype)
+
+    @staticmethod
+    def _init_worker(threads):
+        for variable in SolverPool.BLAS_THREAD_VARIABLES:
+            os.environ[variable] = str(threads)
+        threadpool_limits(limits=threads)
+
+    @staticmethod
+    def _attach(handle):
+        if handle.name not in SolverPool.ATTACHED:
+            # Workers share the parent's resource tracker, which unlinks the segment once in #close
+            segment = shared_memory.SharedMemory(name=handle.name)
+            SolverPool.ATTACHED[handle.name] = (segment, np.ndarray(handle.shape, dtype=handle.dtype,
+                                                                    buffer=segment.buf))
+        return SolverPool.ATTACHED[handle.name][1]
+
+    @staticmethod
+    def _solve(job):
+        m0, m1 = SolverPool._attach(job[0]), SolverPool._attach(job[1])
+        startTime = time.perf_counter()
+        res = np.dot(m0, m1)
+        return time.perf_counter() - startTime, float(res.sum())
+
+    def solve(self, jobs):
+        """
+        Solves every (m0, m1) handle pair across the pool.
+        :param jobs: list of (SharedMatrix, SharedMatrix)
+        :return: dict with wall time, exercises/hour, per-exercise solve times and result checksums
+        """
+        startTime = time.perf_counter()
+        results = self.pool.map(SolverPool._solve, jobs, chunksize=1)
+        wallTime = time.perf_counter() - startTime
+        return {'workers': self.workers, 'threads': self.threadsPerWorker, 'exercises': len(jobs),
+                'wallTime': wallTime, 'exercisesPerHour': len(jobs) / wallTime * 3600,
+                'solveTimes': [x[0] for x in results], 'checksums': [x[1] for x in results]}
+
+    @staticmethod
+    def configurations(cores=None):
+        """
+        :return: every (workers, threads) split with workers * threads == cores
+        """
+        cores = cores if cores is not None else os.cpu_count()
+        return [(w, cores // w) for w in range(1, cores + 1) if cores % w == 0]
+
+    @staticmethod
+    def sweep(m0, m1, exercises, configurations=None):
+        """
+        Measures sustained throughput of every (workers, threads) configuration on the same exercise set.
+        :param m0: left operand of every exercise
+        :param m1: right operand of every exercise
+        :param exercises: number of exercises solved per configuration
+        :param configurations: list of (workers, threads), all core splits when None
+        :return: list of #solve result dicts
+        """
+        results = []
+        for workers, threads in (configurations or SolverPool.configurations()):
+            with SolverPool(workers, threads) as pool:
+                handles = pool.share(m0), pool.share(m1)
+                # Warm every worker up (attach + BLAS init) outside of the measurement
+                pool.solve([handles] * workers)
+                result = pool.solve([handles] * exercises)
+            print(Fore.CYAN + "%d workers x %d BLAS threads: %.1f exercises/hour (%.2f s wall for %d)" %
+                  (workers, threads, result['exercisesPerHour'], result['wallTime'], exercises))
+            results.append(result)
+        return results
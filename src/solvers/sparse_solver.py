@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+import scipy.sparse
+
+from colorama import Fore
+
+from src.benchmark import BenchmarkHarness
+from src.exercises import Sparsifier
+
+
+class SparseAwareSolver:
+    """
+    Multiplies two exercises, switching from dense BLAS (np.dot) to a compressed sparse multiply when the measured
+    density of the operands is below a threshold.
+
+    Density is estimated from SAMPLE_SIZE randomly sampled entries instead of a full count_nonzero pass, so the
+    dispatch decision costs microseconds. Every solve is recorded in #history with the chosen path.
+
+    The default threshold is a conservative guess; #calibrate sweeps densities on the current host, measures both
+    paths and moves the threshold to the measured crossover point.
+    """
+
+    DENSE = 'dense'
+    SPARSE = 'sparse'
+
+    SAMPLE_SIZE = 100000
+    DENSITY_THRESHOLD = 0.05
+
+    def __init__(self, threshold=DENSITY_THRESHOLD, sampleSize=SAMPLE_SIZE, seed=None):
+        self.threshold = threshold
+        self.sampleSize = sampleSize
+        self.rng = np.random.default_rng(seed)
+        self.history = []
+
+    def sample_density(self, m):
+        """
+        :param m: 2D matrix
+        :return: estimated fraction of non-zero entries
+        """
+        if m.size <= self.sampleSize:
+            return np.count_nonzero(m) / m.size
+        rows = self.rng.integers(0, m.shape[0], self.sampleSize)
+        cols = self.rng.integers(0, m.shape[1], self.sampleSize)
+        return np.count_nonzero(m[rows, cols]) / self.sampleSize
+
+    def choose_path(self, d0, d1):
+        return self.SPARSE if min(d0, d1) < self.threshold else self.DENSE
+
+    def solve(self, m0, m1, path=None):
+        """
+        Computes m0 x m1 as a dense array.
+        :param m0: left operand
+        :param m1: right operand
+        :param path: force DENSE or SPARSE, dispatch on sampled density when None
+        :return: product
+        """
+        d0, d1 = self.sample_density(m0), self.sample_density(m1)
+        path = path if path is not None else self.choose_path(d0, d1)
+        startTime = time.perf_counter()
+        if path == self.SPARSE:
+            res = self.sparse_dot(m0, m1, d0, d1)
+        else:
+            res = np.dot(m0, m1)
+        totalTime = time.perf_counter() - startTime
+        self.history.append({'path': path, 'density0': d0, 'density1': d1, 'shape0': m0.shape, 'shape1': m1.shape,
+                             'time': totalTime})
+        print(Fore.CYAN + "Solved %dx%d exercise on %s path (densities %.4f;%.4f) in %.2f seconds" %
+              (m0.shape[0], m0.shape[1], path, d0, d1, totalTime))
+        return res
+
+    def sparse_dot(self, m0, m1, d0, d1):
+        # CSR x CSC is the cheapest sparse-sparse product; a dense operand stays dense (CSR x dense runs in C too)
+        if d0 < self.threshold and d1 < self.threshold:
+            res = scipy.sparse.csr_matrix(m0) @ scipy.sparse.csc_matrix(m1)
+            return res.toarray()
+        if d0 < self.threshold:
+            return np.asarray(scipy.sparse.csr_matrix(m0) @ m1)
+        return np.asarray((scipy.sparse.csc_matrix(m1).T @ m0.T).T)
+
+    def calibrate(self, size, densities=None, pattern='uniform', seed=None, harness=None):
+        """
+        Sweeps densities on a size x size random exercise and times both paths, sparsifying both operands
+        cumulatively. The sparse path is timed as #solve dispatches it, on the sampled densities of the operands. The
+        threshold is set just above the highest sampled density where the sparse path was still faster.
+        :param size: exercise side
+        :param densities: densities to measure, swept from dense to sparse
+        :param pattern: Sparsifier pattern used to thin the operands
+        :param seed: RNG seed of the sweep
+        :param harness: BenchmarkHarness timing both paths, a default one when None
+        :return: list of (density, dense median seconds, sparse median seconds), and the new threshold
+        """
+        harness = harness if harness is not None else BenchmarkHarness()
+        if densities is None:
+            densities = [1.0, 0.5, 0.25, 0.1, 0.05, 0.025, 0.01, 0.005, 0.001]
+        sparsifier = Sparsifier(seed)
+        rng = np.random.default_rng(seed)
+        m0 = rng.standard_normal((size, size))
+        m1 = rng.standard_normal((size, size))
+        sweep = []
+        crossover = 0.0
+        try:
+            for density in sorted(densities, reverse=True):
+                achieved = sparsifier.sparsify(m0, density, pattern)
+                sparsifier.sparsify(m1, density, pattern)
+                # Time the sparse path #solve would take on the sampled densities, with the lowest threshold that
+                # still sends them there
+                d0, d1 = self.sample_density(m0), self.sample_density(m1)
+                self.threshold = np.nextafter(min(d0, d1), np.inf)
+                params = {'size': size, 'density': achieved, 'pattern': pattern, 'density0': d0, 'density1': d1}
+                times = [harness.measure("dense dot", np.dot, m0, m1, params=params).median,
+                         harness.measure("sparse dot", self.sparse_dot, m0, m1, d0, d1, params=params).median]
+                sweep.append((achieved, times[0], times[1]))
+                print(Fore.CYAN + "Density %.4f: dense %.3f s, sparse %.3f s" % (achieved, times[0], times[1]))
+                if times[1] < times[0]:
+                    crossover = max(crossover, self.threshold)
+        finally:
+            self.threshold = crossover
+        print(Fore.CYAN + "Calibrated sparse threshold for %dx%d exercises: %.4f" % (size, size, crossover))
+        return sweep, crossover
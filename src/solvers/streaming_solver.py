@@ -0,0 +1,150 @@
+import time
+
+import numpy as np
+
+from colorama import Fore
+
+from src.exercises import ExerciseFormat, ExerciseHeader, ExerciseLoader
+
+
+class StreamingSolver:
+    """
+    Solves m0 @ m1 while m0 is still downloading. m1 must be resident; every row-block of m0 is multiplied (and its
+    checksum verified, for ExerciseFormat streams) as soon as its last byte arrives, so an exercise costs about
+    max(download, solve) instead of their sum.
+
+    Progress survives reconnects: the solver remembers how many stream bytes it consumed, keeps the partial block it
+    was filling, and #solve reopens the stream at that offset (e.g. an HTTP Range request). Rows already multiplied are
+    never recomputed.
+    """
+
+    # Row-block size of legacy raw streams. ExerciseFormat streams use the checksum blocks of their header
+    BLOCK_ROWS = ExerciseFormat.BLOCK_ROWS
+    RETRIES = 5
+    RETRY_DELAY = 2
+
+    def __init__(self, m1, shape=None, dtype=ExerciseLoader.DTYPE, blockRows=BLOCK_ROWS, verify=True):
+        """
+        :param m1: resident right operand
+        :param shape: shape of a legacy raw m0 stream, square on m1's rows when None
+        :param dtype: element type of a legacy raw m0 stream
+        :param blockRows: rows multiplied at once for legacy raw streams
+        :param verify: check every block against the header checksums (ExerciseFormat streams only)
+        """
+        self.m1 = m1
+        self.shape = shape if shape is not None else (m1.shape[0], m1.shape[0])
+        self.dtype = dtype
+        self.blockRows = blockRows
+        self.verify = verify
+        self.header = None
+        self.pending = bytearray()
+        self.received = 0
+        self.rowsDone = 0
+        self.result = None
+        # streamTime: until the last byte arrived, solveTime: spent multiplying, wallTime: until the last row was solved
+        self.stats = {'reconnects': 0, 'streamTime': 0.0, 'solveTime': 0.0, 'firstBlockLatency': None, 'wallTime': 0.0}
+        self.startTime = None
+
+    @property
+    def offset(self):
+        """
+        :return: stream offset to resume from
+        """
+        return self.received
+
+    @property
+    def complete(self):
+        return self.header is not None and self.rowsDone == self.header.shape[0]
+
+    @property
+    def progress(self):
+        return self.rowsDone / self.header.shape[0] if self.header is not None else 0.0
+
+    def parse_header(self):
+        """
+        Waits for the full header of an ExerciseFormat stream, or falls back to a legacy raw payload.
+        :return: True once the header is known
+        """
+        magic = ExerciseFormat.MAGIC
+        if len(self.pending) < len(magic) and bytes(self.pending) == magic[:len(self.pending)]:
+            return False
+        if not self.pending.startswith(magic):
+            self.header = ExerciseHeader(self.shape, self.dtype, blockRows=min(self.blockRows, self.shape[0]))
+        else:
+            if len(self.pending) < ExerciseFormat.FIXED_HEADER.size:
+                return False
+            blockCount = ExerciseFormat.FIXED_HEADER.unpack_from(self.pending)[8]
+            if len(self.pending) < ExerciseFormat.header_size(blockCount):
+                return False
+            self.header = ExerciseFormat.parse_header(self.pending)
+            del self.pending[:self.header.payloadOffset]
+        if self.header.shape[1] != self.m1.shape[0]:
+            raise RuntimeError("Can't multiply a %dx%d exercise with a %dx%d one." %
+                               (self.header.shape + self.m1.shape))
+        self.result = np.empty((self.header.shape[0], self.m1.shape[1]),
+                               dtype=np.result_type(self.header.dtype, self.m1.dtype))
+        return True
+
+    def feed(self, chunk):
+        """
+        Consumes the next bytes of the m0 stream, multiplying every row-block they complete.
+        """
+        if self.startTime is None:
+            self.startTime = time.perf_counter()
+        self.received += len(chunk)
+        self.pending += chunk
+        self.stats['streamTime'] = time.perf_counter() - self.startTime
+        if self.header is None and not self.parse_header():
+            return
+        rowBytes = self.header.shape[1] * self.header.dtype.itemsize
+        while not self.complete:
+            index = self.rowsDone // self.header.blockRows
+            start, end = self.header.block_range(index)
+            size = (end - start) * rowBytes
+            if len(self.pending) < size:
+                break
+            block = np.frombuffer(self.pending, dtype=self.header.dtype, count=size // self.header.dtype.itemsize)
+            block = block.reshape((end - start, self.header.shape[1]))
+            if self.verify and self.header.checksums and \
+                    ExerciseFormat.checksum(block) != self.header.checksums[index]:
+                raise RuntimeError("Streamed exercise failed checksum verification on block %d." % index)
+            solveStart = time.perf_counter()
+            self.result[start:end] = np.dot(block, self.m1)
+            self.stats['solveTime'] += time.perf_counter() - solveStart
+            if self.stats['firstBlockLatency'] is None:
+                self.stats['firstBlockLatency'] = time.perf_counter() - self.startTime
+            # Release the frombuffer view before shrinking the buffer it points to
+            del block
+            del self.pending[:size]
+            self.rowsDone = end
+
+    def solve(self, stream, retries=RETRIES):
+        """
+        :param stream: callable(offset) -> iterable of bytes chunks starting at that stream offset
+        :param retries: reconnects allowed after an IOError
+        :return: m0 @ m1
+        """
+        attempts = 0
+        while not self.complete:
+            try:
+                for chunk in stream(self.offset):
+                    self.feed(chunk)
+                    if self.complete:
+                        break
+                if not self.complete:
+                    raise IOError("Stream ended after %d bytes" % self.received)
+            except IOError as e:
+                attempts += 1
+                if attempts > retries:
+                    raise
+                self.stats['reconnects'] += 1
+                print(Fore.YELLOW + "Stream interrupted at %d bytes, %d rows solved (%.1f%%): %s. Reconnecting..." %
+                      (self.received, self.rowsDone, 100 * self.progress, e))
+                time.sleep(self.RETRY_DELAY * attempts)
+        self.stats['wallTime'] = time.perf_counter() - self.startTime
+        self.stats['bytes'] = self.received
+        self.stats['rows'] = self.rowsDone
+        print(Fore.CYAN + "Streamed %d bytes and solved %d rows in %.2f s (%.2f s computing, %d reconnects)" %
+              (self.received, self.rowsDone, self.stats['wallTime'], self.stats['solveTime'],
+               self.stats['reconnects']))
+        return self.result
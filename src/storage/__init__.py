@@ -0,0 +1,4 @@
+from src.storage.s3_transfer import S3Transfer
+from src.storage.arweave_transfer import ArweaveDownloader, ArweaveUploader
+from src.storage.confirmation_tracker import ConfirmationTracker
+from src.storage.local_gateway import LocalGateway
@@ -0,0 +1,340 @@
+import os
+import time
+import json
+import base64
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from colorama import Fore
+
+
+def b64url_encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode('ascii')
+
+
+def b64url_decode(text):
+    if isinstance(text, str):
+        text = text.encode('ascii')
+    return base64.urlsafe_b64decode(text + b"=" * (-len(text) % 4))
+
+
+def load_progress(progressPath, header, valid=True):
+    """
+    Reads an append-only progress file: a JSON header line, then one completed chunk index per line.
+    :param header: what the progress must describe to be resumed, the file is restarted with it otherwise
+    :param valid: False to restart the progress anyway
+    :return: set of completed chunk indices
+    """
+    lines = []
+    if valid and os.path.exists(progressPath):
+        with open(progressPath, 'r') as f:
+            lines = f.read().split("\n")
+    try:
+        resumable = bool(lines) and json.loads(lines[0]) == header
+    except ValueError:
+        resumable = False
+    if not resumable:
+        with open(progressPath, 'w') as f:
+            f.write(json.dumps(header) + "\n")
+        return set()
+    # The last line may be cut short by a crash, only complete lines count
+    return set(int(line) for line in lines[1:-1] if line.isdigit())
+
+
+class ArweaveDownloader:
+    """
+    Downloads the data of an Arweave transaction chunk by chunk, concurrently, straight into a preallocated file.
+
+    /tx/<id>/offset gives the size of the data and its end offset in the weave. Chunk boundaries follow the standard
+    Arweave chunking (CHUNK_SIZE chunks, the last two rebalanced so none is under MIN_CHUNK_SIZE), so every chunk can
+    be requested from /chunk/<offset> independently, `concurrency` at a time. Failed chunks are retried with
+    exponential backoff and jitter instead of restarting the whole download.
+
+    Progress is an append-only list of completed chunk indices next to the output file (<path>.chunks), written after
+    the chunk's data: an interrupted download resumes without refetching completed chunks. Data is not fsynced per
+    chunk, so this survives crashes of the process, not of the host.
+    """
+
+    GATEWAY = "https://arweave.net"
+    CHUNK_SIZE = 256 * 1024
+    MIN_CHUNK_SIZE = 32 * 1024
+    CONCURRENCY = 8
+    RETRIES = 5
+    BACKOFF = 1.0
+    TIMEOUT = 60
+
+    def __init__(self, gateway=GATEWAY, concurrency=CONCURRENCY, retries=RETRIES, backoff=BACKOFF):
+        """
+        :param gateway: gateway or node URL
+        :param concurrency: chunk requests in flight
+        :param retries: attempts per chunk after the first one
+        :param backoff: base delay in seconds, doubled after every failed attempt
+        """
+        self.gateway = gateway.rstrip('/')
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+        self.stats = None
+
+    @staticmethod
+    def chunk_layout(size, chunkSize=CHUNK_SIZE, minChunkSize=MIN_CHUNK_SIZE):
+        """
+        :return: [(start, end)] byte ranges of the chunks of a size byte payload
+        """
+        layout = []
+        start = 0
+        rest = size
+        while rest >= chunkSize:
+            length = chunkSize
+            if 0 < rest - chunkSize < minChunkSize:
+                length = -(-rest // 2)
+            layout.append((start, start + length))
+            start += length
+            rest -= length
+        if rest > 0:
+            layout.append((start, start + rest))
+        return layout
+
+    def offset(self, txId):
+        """
+        :return: (weave offset of the first data byte, data size)
+        """
+        response, _ = self._request("%s/tx/%s/offset" % (self.gateway, txId))
+        offset = response.json()
+        size = int(offset['size'])
+        return int(offset['offset']) - size + 1, size
+
+    def download(self, txId, path):
+        """
+        :param txId: transaction id
+        :param path: output file, resumed when a progress list for the same transaction exists next to it
+        :return: uint8 memmap of the downloaded data, usable with ExerciseLoader.from_bytes
+        """
+        startTime = time.perf_counter()
+        weaveStart, size = self.offset(txId)
+        layout = self.chunk_layout(size)
+        # The data of completed chunks is only there if the output file still has the full size
+        done = load_progress(path + ".chunks", {'tx': txId, 'size': size},
+                             os.path.exists(path) and os.path.getsize(path) == size)
+        missing = [i for i in range(len(layout)) if i not in done]
+        if done:
+            print(Fore.CYAN + "Resuming %s: %d/%d chunks already downloaded." % (txId, len(done), len(layout)))
+
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        with open(path, mode) as f:
+            f.truncate(size)
+        out = np.memmap(path, dtype=np.uint8, mode='r+', shape=(size,)) if size else np.empty(0, dtype=np.uint8)
+        progressLock = threading.Lock()
+        counters = {'retries': 0, 'bytes': 0}
+        with open(path + ".chunks", 'a') as progress:
+            def fetch(index):
+                start, end = layout[index]
+                data, retries = self._fetch_chunk(weaveStart + start, end - start)
+                out[start:end] = np.frombuffer(data, dtype=np.uint8)
+                with progressLock:
+                    # Recorded only once the chunk is in the (shared) mapping, which outlives the process
+                    progress.write("%d\n" % index)
+                    progress.flush()
+                    counters['bytes'] += len(data)
+                    counters['retries'] += retries
+
+            with ThreadPoolExecutor(self.concurrency) as executor:
+                list(executor.map(fetch, missing))
+        if size:
+            out.flush()
+
+        totalTime = time.perf_counter() - startTime
+        self.stats = {'tx': txId, 'bytes': size, 'chunks': len(layout), 'resumedChunks': len(done),
+                      'fetchedBytes': counters['bytes'], 'retries': counters['retries'], 'seconds': totalTime,
+                      'MBps': counters['bytes'] / 1024 / 1024 / totalTime if totalTime > 0 else 0.0,
+                      'concurrency': self.concurrency}
+        print(Fore.CYAN + "Downloaded %s: %d chunks (%d resumed) in %.2f s, %.2f MB/s, %d retries" %
+              (txId, len(layout), len(done), totalTime, self.stats['MBps'], counters['retries']))
+        return out
+
+    def _fetch_chunk(self, offset, length):
+        response, retries = self._request("%s/chunk/%d" % (self.gateway, offset))
+        data = b64url_decode(response.json()['chunk'])
+        if len(data) != length:
+            raise IOError("Chunk at offset %d has %d bytes, expected %d: the data is not chunked the standard way."
+                          % (offset, len(data), length))
+        return data, retries
+
+    def _request(self, url):
+        """
+        :return: (response, retries it took)
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, timeout=self.TIMEOUT)
+                response.raise_for_status()
+                return response, attempt
+            except requests.RequestException as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random() / 2)
+                attempt += 1
+                print(Fore.YELLOW + "%s failed (%s), retry %d/%d in %.1f s" % (url, e, attempt, self.retries, delay))
+                time.sleep(delay)
+
+
+class ArweaveUploader:
+    """
+    Uploads the chunks of a posted Arweave transaction with a window of concurrent POST /chunk requests.
+
+    Chunks only carry the data root, their proof and their offset, so any of them can be posted at any time once the
+    transaction header is accepted. The window starts at `window` requests in flight and adapts to chunk latencies:
+    after every round (as many completed chunks as the window) it grows by one while the round's median latency stays
+    within LATENCY_SLACK of the best round seen, shrinks by one when it degrades past twice that, and halves when a
+    chunk needed retries. Failed chunks are retried alone, with exponential backoff and jitter; errors the node
+    reports as fatal (4xx other than 429) are not retried.
+
+    Completed chunk indices are appended to a progress file whose first line identifies the transaction and its data
+    root, so an interrupted upload resumes with the chunks that are still missing. The file is removed once every
+    chunk is uploaded.
+    """
+
+    GATEWAY = ArweaveDownloader.GATEWAY
+    WINDOW = 4
+    MIN_WINDOW = 1
+    MAX_WINDOW = 32
+    LATENCY_SLACK = 1.25
+    RETRIES = 5
+    BACKOFF = 1.0
+    TIMEOUT = 60
+
+    def __init__(self, gateway=GATEWAY, window=WINDOW, maxWindow=MAX_WINDOW, retries=RETRIES, backoff=BACKOFF):
+        """
+        :param gateway: gateway or node URL
+        :param window: chunk uploads in flight at first
+        :param maxWindow: chunk uploads in flight, at most
+        :param retries: attempts per chunk after the first one
+        :param backoff: base delay in seconds, doubled after every failed attempt
+        """
+        self.gateway = gateway.rstrip('/')
+        self.window = max(self.MIN_WINDOW, min(window, maxWindow))
+        self.maxWindow = maxWindow
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=maxWindow))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=maxWindow))
+        self.stats = None
+
+    @staticmethod
+    def pending(progressPath):
+        """
+        :return: header ({tx, dataRoot, chunks}) of the interrupted upload recorded in progressPath, None without one
+        """
+        try:
+            with open(progressPath, 'r') as f:
+                return json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+    def upload(self, txId, chunk, total, progressPath, dataRoot=""):
+        """
+        :param txId: id of the transaction, its header must already be posted
+        :param chunk: callable(index) -> JSON payload of POST /chunk (data_root, data_size, data_path, offset, chunk)
+        :param total: number of chunks of the transaction
+        :param progressPath: completed chunk indices, resumed when it records the same transaction and data root
+        :param dataRoot: data root of the transaction
+        :return: chunk upload latencies in seconds, in completion order
+        """
+        startTime = time.perf_counter()
+        header = {'tx': txId, 'dataRoot': dataRoot, 'chunks': total}
+        done = load_progress(progressPath, header)
+        missing = [i for i in range(total) if i not in done]
+        if done:
+            print(Fore.CYAN + "Resuming upload of %s: %d/%d chunks already uploaded." % (txId, len(done), total))
+
+        latencies = []
+        windows = []
+        retries = 0
+        roundLatencies = []
+        bestRound = None
+        error = None
+        with open(progressPath, 'a') as progress, ThreadPoolExecutor(self.maxWindow) as executor:
+            inFlight = {}
+            while (missing and error is None) or inFlight:
+                while missing and error is None and len(inFlight) < self.window:
+                    index = missing.pop(0)
+                    inFlight[executor.submit(self._upload_chunk, chunk, index)] = index
+                finished, _ = wait(inFlight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = inFlight.pop(future)
+                    try:
+                        latency, chunkRetries = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    progress.write("%d\n" % index)
+                    progress.flush()
+                    latencies.append(latency)
+                    windows.append(self.window)
+                    retries += chunkRetries
+                    if chunkRetries:
+                        self.window = max(self.MIN_WINDOW, self.window // 2)
+                        roundLatencies = []
+                        continue
+                    roundLatencies.append(latency)
+                    if len(roundLatencies) >= self.window:
+                        roundLatency = float(np.median(roundLatencies))
+                        bestRound = roundLatency if bestRound is None else min(bestRound, roundLatency)
+                        if roundLatency <= bestRound * self.LATENCY_SLACK:
+                            self.window = min(self.maxWindow, self.window + 1)
+                        elif roundLatency > bestRound * 2:
+                            self.window = max(self.MIN_WINDOW, self.window - 1)
+                        roundLatencies = []
+                print(Fore.CYAN + "%d/%d chunks uploaded, %d in flight" % (total - len(missing) - len(inFlight),
+                                                                          total, len(inFlight)))
+        if error is not None:
+            print(Fore.YELLOW + "Upload of %s stopped after %d/%d chunks, run it again to resume." %
+                  (txId, len(done) + len(latencies), total))
+            raise error
+        os.remove(progressPath)
+
+        totalTime = time.perf_counter() - startTime
+        self.stats = {'tx': txId, 'chunks': total, 'resumedChunks': len(done), 'uploadedChunks': len(latencies),
+                      'retries': retries, 'seconds': totalTime,
+                      'chunksPerSecond': len(latencies) / totalTime if totalTime > 0 else 0.0,
+                      'latencyP50': float(np.percentile(latencies, 50)) if latencies else 0.0,
+                      'latencyP90': float(np.percentile(latencies, 90)) if latencies else 0.0,
+                      'finalWindow': self.window, 'maxWindowReached': max(windows, default=self.window),
+                      'latencies': latencies, 'windows': windows}
+        print(Fore.CYAN + "Uploaded %d chunks of %s (%d resumed) in %.2f s, %.2f chunks/s, final window %d" %
+              (len(latencies), txId, len(done), totalTime, self.stats['chunksPerSecond'], self.window))
+        return latencies
+
+    def _upload_chunk(self, chunk, index):
+        """
+        :return: (seconds the successful request took, retries it took)
+        """
+        payload = json.dumps(chunk(index))
+        attempt = 0
+        while True:
+            startTime = time.perf_counter()
+            try:
+                response = self.session.post("%s/chunk" % self.gateway, data=payload, timeout=self.TIMEOUT,
+                                             headers={'Content-Type': 'application/json', 'Accept': 'text/plain'})
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    raise RuntimeError("Chunk %d was rejected: %d %s" % (index, response.status_code, response.text))
+                response.raise_for_status()
+                return time.perf_counter() - startTime, attempt
+            except requests.RequestException as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random() / 2)
+                attempt += 1
+                print(Fore.YELLOW + "Chunk %d failed (%s), retry %d/%d in %.1f s" % (index, e, attempt, self.retries,
+                                                                                   delay))
+                time.sleep(delay)
@@ -0,0 +1,141 @@
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from colorama import Fore
+
+from src.storage.arweave_transfer import ArweaveDownloader
+
+
+class ConfirmationTracker:
+    """
+    Watches many pending Arweave transactions at once and reports each one the moment it confirms.
+
+    Every transaction gets its own asyncio task polling /tx/<id>/status. Polls back off from minInterval to
+    maxInterval (times BACKOFF, with jitter) while the transaction stays pending, so hundreds of them cost a handful of
+    requests per second. Confirmations arrive block by block: when a status reports a block height above any seen so
+    far, every pending task polls again right away, with its interval reset. Status requests are blocking `requests`
+    calls run in a pool of `concurrency` threads, the event loop only schedules them.
+
+    Confirmed transactions are passed to callback(txId, status) (a function or a coroutine function) and/or put on an
+    asyncio queue as (txId, status). Confirmation latency counts from the submission time given for each transaction
+    (when tracking started otherwise); #stats has its distribution.
+    """
+
+    GATEWAY = ArweaveDownloader.GATEWAY
+    MIN_INTERVAL = 2.0
+    MAX_INTERVAL = 60.0
+    BACKOFF = 1.5
+    CONCURRENCY = 16
+    CONFIRMATIONS = 1
+    TIMEOUT = 30
+
+    def __init__(self, gateway=GATEWAY, minInterval=MIN_INTERVAL, maxInterval=MAX_INTERVAL, concurrency=CONCURRENCY,
+                 confirmations=CONFIRMATIONS):
+        """
+        :param gateway: gateway or node URL
+        :param minInterval: seconds between the first polls of a transaction
+        :param maxInterval: seconds between polls of a transaction, at most
+        :param concurrency: status requests in flight
+        :param confirmations: confirmations a transaction needs to count as confirmed
+        """
+        self.gateway = gateway.rstrip('/')
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.concurrency = concurrency
+        self.confirmations = confirmations
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+        self.stats = None
+
+    def status(self, txId):
+        """
+        :return: status of a confirmed transaction, None while it is pending (or unknown to the gateway)
+        """
+        response = self.session.get("%s/tx/%s/status" % (self.gateway, txId), timeout=self.TIMEOUT)
+        if response.status_code != 200:
+            return None
+        status = response.json()
+        if int(status.get('number_of_confirmations', 0)) < self.confirmations:
+            return None
+        return status
+
+    def wait(self, txIds, callback=None, submitted=None, timeout=None):
+        """
+        Blocking #track.
+        """
+        return asyncio.run(self.track(txIds, callback, submitted=submitted, timeout=timeout))
+
+    async def track(self, txIds, callback=None, queue=None, submitted=None, timeout=None):
+        """
+        :param txIds: transactions to watch
+        :param callback: callable(txId, status), or coroutine function, called as each transaction confirms
+        :param queue: asyncio.Queue getting (txId, status) as each transaction confirms
+        :param submitted: {txId: time.time() of its submission}, latencies count from now for the others
+        :param timeout: seconds after which transactions still pending are given up on
+        :return: {txId: confirmation latency in seconds} of the transactions that confirmed
+        """
+        loop = asyncio.get_running_loop()
+        startTime = time.time()
+        submitted = dict(submitted or {})
+        state = {'height': -1, 'block': asyncio.Event(), 'polls': 0, 'errors': 0}
+        latencies = {}
+
+        async def watch(txId):
+            interval = self.minInterval
+            while True:
+                block = state['block']
+                state['polls'] += 1
+                try:
+                    status = await loop.run_in_executor(executor, self.status, txId)
+                except (requests.RequestException, ValueError) as e:
+                    state['errors'] += 1
+                    print(Fore.YELLOW + "Status of %s failed (%s), polling again later." % (txId, e))
+                    status = None
+                if status is not None:
+                    break
+                if timeout is not None and time.time() - startTime >= timeout:
+                    return
+                try:
+                    await asyncio.wait_for(block.wait(), interval * (0.75 + random.random() / 2))
+                    interval = self.minInterval
+                except asyncio.TimeoutError:
+                    interval = min(self.maxInterval, interval * self.BACKOFF)
+            height = int(status.get('block_height', 0))
+            if height > state['height']:
+                # A new block: wake every pending transaction, it may be in there too
+                state['height'] = height
+                pending, state['block'] = state['block'], asyncio.Event()
+                pending.set()
+            latencies[txId] = time.time() - submitted.get(txId, startTime)
+            print(Fore.CYAN + "Tx %s confirmed at height %d after %.1f s" % (txId, height, latencies[txId]))
+            if callback is not None:
+                result = callback(txId, status)
+                if asyncio.iscoroutine(result):
+                    await result
+            if queue is not None:
+                await queue.put((txId, status))
+
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            await asyncio.gather(*[watch(txId) for txId in dict.fromkeys(txIds)])
+
+        values = list(latencies.values())
+        tracked = len(dict.fromkeys(txIds))
+        self.stats = {'transactions': tracked, 'confirmed': len(values), 'pending': tracked - len(values),
+                      'polls': state['polls'], 'errors': state['errors'], 'seconds': time.time() - startTime,
+                      'latencyMean': float(np.mean(values)) if values else 0.0,
+                      'latencyP50': float(np.percentile(values, 50)) if values else 0.0,
+                      'latencyP90': float(np.percentile(values, 90)) if values else 0.0,
+                      'latencyP99': float(np.percentile(values, 99)) if values else 0.0,
+                      'latencyMax': max(values, default=0.0), 'latencies': latencies}
+        print(Fore.CYAN + "%d/%d transactions confirmed in %.1f s with %d status polls: latency p50 %.1f s, "
+                          "p90 %.1f s, max %.1f s" % (len(values), tracked, self.stats['seconds'], state['polls'],
+                                                      self.stats['latencyP50'], self.stats['latencyP90'],
+                                                      self.stats['latencyMax']))
+        return latencies
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from colorama import Fore
+
+from src.storage.arweave_transfer import ArweaveDownloader, b64url_encode, b64url_decode
+
+
+class LocalGateway:
+    """
+    Stand-in Arweave gateway serving local files as transaction data, to run the Arweave transfers without a wallet,
+    fees or the public network.
+
+    Every file is laid out in a fake weave one after the other, and answers the endpoints the transfers use:
+        * GET /tx/<id>/offset: {"size", "offset"} (offset of the last data byte in the weave)
+        * GET /chunk/<offset>: {"chunk"} the base64url chunk holding that weave offset, standard chunk layout
+        * GET /<id>: the raw data, honouring a "bytes=<start>-" Range header
+        * GET /tx/<id>/status: 200 with the confirmation status, 202 while pending
+    and takes uploads: POST /tx records the transaction header, POST /chunk keeps the chunk under its data root (see
+    #uploaded). Price, anchor and balance requests are answered with zeros, so a wallet and Transaction can be pointed
+    at it. Chunk and data requests fail with a 503 at failureRate, to exercise retries, and take at least latency
+    seconds, to give concurrent transfers something to overlap.
+
+    A block is mined every blockTime seconds (never, everything is confirmed right away, when 0), and a posted
+    transaction is included in one of the next inclusionBlocks blocks, at random.
+    """
+
+    PORT = 1984
+
+    def __init__(self, files=None, port=PORT, failureRate=0.0, latency=0.0, blockTime=0.0, inclusionBlocks=1):
+        """
+        :param files: {transaction id: path of its data}, confirmed from the start
+        :param port: port to listen on, any free one when 0
+        :param failureRate: fraction of chunk and data requests answered with a 503
+        :param latency: seconds added to every chunk and data request
+        :param blockTime: seconds between blocks
+        :param inclusionBlocks: blocks a posted transaction may wait to be mined, at most
+        """
+        files = files or {}
+        self.failureRate = failureRate
+        self.latency = latency
+        self.blockTime = blockTime
+        self.inclusionBlocks = inclusionBlocks
+        self.startTime = time.time()
+        # Block each posted transaction is mined in
+        self.heights = {}
+        self.counters = {'chunks': 0, 'uploadedChunks': 0, 'failures': 0}
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.uploads = {}
+        self.files = {}
+        self.starts = []
+        self.ids = []
+        weaveOffset = 0
+        for txId, path in files.items():
+            size = os.path.getsize(path)
+            self.files[txId] = (path, weaveOffset, size)
+            self.starts.append(weaveOffset)
+            self.ids.append(txId)
+            weaveOffset += size
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        """
+        Serves every file of directory with its name, without extension, as transaction id.
+        """
+        files = {os.path.splitext(file)[0]: os.path.join(directory, file) for file in sorted(os.listdir(directory))
+                 if os.path.isfile(os.path.join(directory, file))}
+        return cls(files, **kwargs)
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(Fore.CYAN + "Local gateway serving %d transactions on %s" % (len(self.files), self.url))
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def chunk(self, weaveOffset):
+        """
+        :return: bytes of the chunk holding weaveOffset, None past the end of the weave
+        """
+        index = bisect_right(self.starts, weaveOffset) - 1
+        if index < 0:
+            return None
+        path, start, size = self.files[self.ids[index]]
+        relative = weaveOffset - start
+        if relative >= size:
+            return None
+        for chunkStart, chunkEnd in ArweaveDownloader.chunk_layout(size):
+            if chunkStart <= relative < chunkEnd:
+                return self.read(path, chunkStart, chunkEnd - chunkStart)
+
+    @staticmethod
+    def read(path, start, length):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(length)
+
+    def height(self):
+        if not self.blockTime:
+            return sys.maxsize
+        return int((time.time() - self.startTime) / self.blockTime)
+
+    def status(self, txId):
+        """
+        :return: confirmation status of a transaction, None while it is pending
+        """
+        height = 0 if txId in self.files else self.heights.get(txId)
+        if height is None or height > self.height():
+            return None
+        return {'block_height': height, 'number_of_confirmations': min(self.height(), 2 ** 31) - height + 1}
+
+    def uploaded(self, dataRoot):
+        """
+        :return: data uploaded so far under dataRoot, chunks in offset order
+        """
+        with self.lock:
+            chunks = dict(self.uploads.get(dataRoot, {}))
+        return b"".join(chunks[offset] for offset in sorted(chunks))
+
+    def fail(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failureRate and random.random() < self.failureRate:
+            with self.lock:
+                self.counters['failures'] += 1
+            return True
+        return False
+
+    def _handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if len(parts) == 3 and parts[0] == 'tx' and parts[2] == 'status' and \
+                        (parts[1] in gateway.files or parts[1] in gateway.heights):
+                    status = gateway.status(parts[1])
+                    if status is None:
+                        return self.reply(202, b"Pending")
+                    return self.reply_json(status)
+                if len(parts) == 3 and parts[0] == 'tx' and parts[2] == 'offset' and parts[1] in gateway.files:
+                    path, start, size = gateway.files[parts[1]]
+                    return self.reply_json({'size': str(size), 'offset': str(start + size - 1)})
+                elif len(parts) == 2 and parts[0] == 'chunk' and parts[1].isdigit():
+                    if gateway.fail():
+                        return self.reply(503, b"")
+                    data = gateway.chunk(int(parts[1]))
+                    if data is not None:
+                        with gateway.lock:
+                            gateway.counters['chunks'] += 1
+                        return self.reply_json({'chunk': b64url_encode(data), 'data_path': "", 'tx_path': ""})
+                elif len(parts) == 1 and parts[0] in gateway.files:
+                    if gateway.fail():
+                        return self.reply(503, b"")
+                    return self.reply_data(*gateway.files[parts[0]])
+                elif parts[0] == 'tx_anchor':
+                    return self.reply(200, b64url_encode(bytes(32)).encode('ascii'))
+                elif parts[0] == 'price' or (parts[0] == 'wallet' and parts[-1] == 'balance'):
+                    return self.reply(200, b"0")
+                self.reply(404, b"Not Found.")
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                except ValueError:
+                    return self.reply(400, b'{"error": "invalid_json"}', 'application/json')
+                if self.path.rstrip('/') == '/tx':
+                    with gateway.lock:
+                        gateway.transactions[body.get('id')] = body
+                        if gateway.blockTime:
+                            gateway.heights[body.get('id')] = gateway.height() + random.randint(
+                                1, max(1, gateway.inclusionBlocks))
+                        else:
+                            gateway.heights[body.get('id')] = 0
+                    return self.reply(200, b"OK")
+                if self.path.rstrip('/') == '/chunk':
+                    if gateway.fail():
+                        return self.reply(503, b"")
+                    with gateway.lock:
+                        gateway.uploads.setdefault(body['data_root'], {})[int(body['offset'])] = \
+                            b64url_decode(body['chunk'])
+                        gateway.counters['uploadedChunks'] += 1
+                    return self.reply(200, b"OK")
+                self.reply(404, b"Not Found.")
+
+            def reply_data(self, path, _, size):
+                offset = 0
+                rangeHeader = self.headers.get('Range', '')
+                if rangeHeader.startswith('bytes=') and rangeHeader[6:].rstrip('-').isdigit():
+                    offset = min(int(rangeHeader[6:].rstrip('-')), size)
+                self.send_response(206 if offset else 200)
+                self.send_header('Content-Length', str(size - offset))
+                if offset:
+                    self.send_header('Content-Range', 'bytes %d-%d/%d' % (offset, size - 1, size))
+                self.end_headers()
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    block = f.read(ArweaveDownloader.CHUNK_SIZE)
+                    while block:
+                        self.wfile.write(block)
+                        block = f.read(ArweaveDownloader.CHUNK_SIZE)
+
+            def reply_json(self, body):
+                self.reply(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+            def reply(self, status, body, contentType='text/plain'):
+                self.send_response(status)
+                self.send_header('Content-Type', contentType)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # python3 -m src.storage.local_gateway <directory> [port]
+    gateway = LocalGateway.from_directory(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else
+                                          LocalGateway.PORT)
+    gateway.start()
+    gateway.thread.join()
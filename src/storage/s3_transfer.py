@@ -0,0 +1,180 @@
+import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from colorama import Fore
+
+
+class S3Transfer:
+    """
+    Moves exercises to and from S3 with concurrent ranged requests over one pooled client.
+
+    #download splits an object into partSize byte ranges and fetches up to concurrency of them at once, each written
+    straight into its slice of a preallocated buffer (a numpy array, or a memory-mapped file) instead of being
+    collected in a list of pieces and joined. botocore clients are thread safe, so all workers share one client and
+    its connection pool, sized for every request that can be in flight.
+
+    #upload_many pushes a whole corpus: objectConcurrency files at once, each as a multipart upload with up to
+    concurrency parts in flight. Every object carries the sha256 of its content in its metadata, and files whose
+    object already exists with the same sha256 (or the ETag this part size would produce) are skipped.
+
+    endpointUrl points the client at any S3 compatible server (moto, MinIO, ...) for local runs.
+    """
+
+    PART_SIZE = 8 * 1024 * 1024
+    CONCURRENCY = 8
+    OBJECT_CONCURRENCY = 4
+    # Bytes copied from a response body into the buffer at a time
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, bucket, endpointUrl=None, partSize=PART_SIZE, concurrency=CONCURRENCY,
+                 objectConcurrency=OBJECT_CONCURRENCY, client=None):
+        """
+        :param bucket: bucket every transfer goes to
+        :param endpointUrl: S3 compatible endpoint, AWS when None
+        :param partSize: bytes per ranged request or multipart part
+        :param concurrency: requests in flight per object
+        :param objectConcurrency: objects uploaded at once by #upload_many
+        :param client: existing boto3 S3 client to reuse
+        """
+        self.bucket = bucket
+        self.partSize = partSize
+        self.concurrency = concurrency
+        self.objectConcurrency = objectConcurrency
+        # One pool for every thread: objects x parts requests can be in flight during bulk uploads
+        self.client = client if client is not None else boto3.session.Session().client(
+            's3', endpoint_url=endpointUrl,
+            config=Config(max_pool_connections=max(concurrency, concurrency * objectConcurrency)))
+        self.transferConfig = TransferConfig(multipart_threshold=partSize, multipart_chunksize=partSize,
+                                             max_concurrency=concurrency, use_threads=True)
+        self.stats = None
+
+    def size(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+
+    def ranges(self, size):
+        return [(start, min(start + self.partSize, size)) for start in range(0, size, self.partSize)]
+
+    def download(self, key, path=None):
+        """
+        :param key: object key
+        :param path: memory-map the download to this file instead of keeping it in RAM
+        :return: uint8 array (np.memmap with path) holding the object, usable with ExerciseLoader.from_bytes
+        """
+        startTime = time.perf_counter()
+        size = self.size(key)
+        if path is not None:
+            buffer = np.memmap(path, dtype=np.uint8, mode='w+', shape=(size,)) if size else np.empty(0, np.uint8)
+        else:
+            buffer = np.empty(size, dtype=np.uint8)
+        parts = self.ranges(size)
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            latencies = list(executor.map(lambda r: self._download_range(key, buffer, r[0], r[1]), parts))
+        if isinstance(buffer, np.memmap):
+            buffer.flush()
+        totalTime = time.perf_counter() - startTime
+        self.stats = {'key': key, 'bytes': size, 'parts': len(parts), 'partSize': self.partSize,
+                      'concurrency': self.concurrency, 'seconds': totalTime,
+                      'MBps': size / 1024 / 1024 / totalTime if totalTime > 0 else 0.0,
+                      'partLatencies': latencies}
+        print(Fore.CYAN + "Downloaded %s (%d bytes, %d parts x %d concurrent) in %.2f s, %.2f MB/s" %
+              (key, size, len(parts), self.concurrency, totalTime, self.stats['MBps']))
+        return buffer
+
+    def _download_range(self, key, buffer, start, end):
+        startTime = time.perf_counter()
+        body = self.client.get_object(Bucket=self.bucket, Key=key, Range='bytes=%d-%d' % (start, end - 1))['Body']
+        view = memoryview(buffer)
+        position = start
+        chunk = body.read(self.READ_SIZE)
+        while chunk:
+            view[position:position + len(chunk)] = chunk
+            position += len(chunk)
+            chunk = body.read(self.READ_SIZE)
+        if position != end:
+            raise IOError("Range %d-%d of %s ended after %d bytes." % (start, end - 1, key, position - start))
+        return time.perf_counter() - startTime
+
+    @staticmethod
+    def digests(path, partSize=PART_SIZE):
+        """
+        :return: (sha256 hex digest, S3 ETag of the file uploaded with partSize parts)
+        """
+        sha = hashlib.sha256()
+        partDigests = []
+        with open(path, 'rb') as f:
+            part = f.read(partSize)
+            while part:
+                sha.update(part)
+                partDigests.append(hashlib.md5(part).digest())
+                part = f.read(partSize)
+        if os.path.getsize(path) < partSize:
+            etag = partDigests[0].hex() if partDigests else hashlib.md5(b"").hexdigest()
+        else:
+            etag = "%s-%d" % (hashlib.md5(b"".join(partDigests)).hexdigest(), len(partDigests))
+        return sha.hexdigest(), etag
+
+    def remote(self, key):
+        """
+        :return: head_object response, None when the object doesn't exist
+        """
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def upload(self, path, key):
+        """
+        Uploads a file unless the bucket already has it.
+        :return: dict with key, bytes, seconds and whether the object was skipped
+        """
+        startTime = time.perf_counter()
+        sha, etag = self.digests(path, self.partSize)
+        head = self.remote(key)
+        skipped = head is not None and (head.get('Metadata', {}).get('sha256') == sha or
+                                        head.get('ETag', '').strip('"') == etag)
+        if not skipped:
+            self.client.upload_file(path, self.bucket, key, ExtraArgs={'Metadata': {'sha256': sha}},
+                                    Config=self.transferConfig)
+        result = {'key': key, 'path': path, 'bytes': os.path.getsize(path), 'skipped': skipped,
+                  'seconds': time.perf_counter() - startTime}
+        print(Fore.CYAN + "%s %s in %.2f s" % ("Skipped" if skipped else "Uploaded", key, result['seconds']))
+        return result
+
+    def upload_many(self, paths, keys=None):
+        """
+        :param paths: files to upload
+        :param keys: object keys, the file names without extension when None
+        :return: per object results. #stats gets aggregate MB/s and upload latency percentiles
+        """
+        if keys is None:
+            keys = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+        startTime = time.perf_counter()
+        with ThreadPoolExecutor(self.objectConcurrency) as executor:
+            results = list(executor.map(self.upload, paths, keys))
+        totalTime = time.perf_counter() - startTime
+        uploaded = [r for r in results if not r['skipped']]
+        uploadedBytes = sum(r['bytes'] for r in uploaded)
+        latencies = [r['seconds'] for r in uploaded]
+        self.stats = {'objects': len(results), 'uploaded': len(uploaded), 'skipped': len(results) - len(uploaded),
+                      'bytes': uploadedBytes, 'seconds': totalTime,
+                      'MBps': uploadedBytes / 1024 / 1024 / totalTime if totalTime > 0 else 0.0,
+                      'latencyP50': float(np.percentile(latencies, 50)) if latencies else 0.0,
+                      'latencyP90': float(np.percentile(latencies, 90)) if latencies else 0.0,
+                      'latencyP99': float(np.percentile(latencies, 99)) if latencies else 0.0,
+                      'partSize': self.partSize, 'concurrency': self.concurrency,
+                      'objectConcurrency': self.objectConcurrency}
+        print(Fore.CYAN + "Uploaded %d objects (%d skipped) in %.2f s: %.2f MB/s, latency p50 %.2f s, p90 %.2f s, "
+                          "p99 %.2f s" % (len(uploaded), self.stats['skipped'], totalTime, self.stats['MBps'],
+                                          self.stats['latencyP50'], self.stats['latencyP90'],
+                                          self.stats['latencyP99']))
+        return results
@@ -0,0 +1,3 @@
+from src.verification.freivalds import FreivaldsVerifier
+from src.verification.merkle import MerkleTree, MerkleCommitter, MerkleVerifier
+from src.verification.batch_verifier import ValidationClaim, BatchVerifier
@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from colorama import Fore
+
+from src.exercises import ExerciseLoader
+from src.verification.freivalds import FreivaldsVerifier
+
+
+class ValidationClaim:
+    """
+    One solution to validate: exercise operand ids (as in SolveRequest.m0Ids / m1Ids) and the claimed product.
+    """
+
+    def __init__(self, m0Id, m1Id, solution):
+        self.m0Id = m0Id
+        self.m1Id = m1Id
+        self.solution = solution
+
+
+class BatchVerifier:
+    """
+    Freivalds verification of many solutions at once.
+
+    A single probe matrix R is drawn per batch. Every distinct right operand B is loaded once and multiplied once
+    (B R), and every distinct left operand A multiplies the probes of all its claims in one GEMM:
+    A [B1 R | B2 R | ...]. Only the claimed products C R are per-solution, and those are unavoidable. Validators
+    see the same few exercises over and over, so both loading and most of the BLAS work is amortized across the
+    batch, and the thin matrix-vector products of one-at-a-time checks become matrix-matrix products.
+
+    Operands are resolved by loader(id), ExerciseLoader#load by default (paths or VirtualExercise specs), and kept
+    for the lifetime of the verifier in a small LRU of MAX_OPERANDS.
+    """
+
+    MAX_OPERANDS = 8
+
+    def __init__(self, falseAccept=FreivaldsVerifier.FALSE_ACCEPT, loader=None, seed=None, maxOperands=MAX_OPERANDS):
+        self.freivalds = FreivaldsVerifier(falseAccept, seed=seed)
+        self.loader = loader if loader is not None else ExerciseLoader.load
+        self.maxOperands = maxOperands
+        self.operands = OrderedDict()
+        self.loads = 0
+        self.last = {}
+
+    def operand(self, operandId):
+        if operandId in self.operands:
+            self.operands.move_to_end(operandId)
+            return self.operands[operandId]
+        m = self.loader(operandId)
+        self.loads += 1
+        self.operands[operandId] = m
+        while len(self.operands) > self.maxOperands:
+            self.operands.popitem(last=False)
+        return m
+
+    def verify(self, claims):
+        """
+        :param claims: list of ValidationClaim
+        :return: list of booleans, one per claim
+        """
+        startTime = time.perf_counter()
+        m1Ids = list(OrderedDict.fromkeys(c.m1Id for c in claims))
+        m0Ids = list(OrderedDict.fromkeys(c.m0Id for c in claims))
+        first = self.operand(m1Ids[0])
+        probes = self.freivalds.probes(first.shape[1], np.result_type(first.dtype, claims[0].solution.dtype))
+
+        # B R and |B| R once per distinct right operand
+        right = {}
+        for m1Id in m1Ids:
+            m1 = self.operand(m1Id)
+            right[m1Id] = (np.dot(m1, probes), self.freivalds.abs_dot(m1, probes))
+
+        # A [B1 R | B2 R | ...] once per distinct left operand, for the values and for the rounding bounds
+        expected = {}
+        for m0Id in m0Ids:
+            m0 = self.operand(m0Id)
+            pairs = list(OrderedDict.fromkeys(c.m1Id for c in claims if c.m0Id == m0Id))
+            k = probes.shape[1]
+            values = np.dot(m0, np.hstack([right[x][0] for x in pairs]))
+            bounds = self.freivalds.abs_dot(m0, np.hstack([right[x][1] for x in pairs]))
+            for i, m1Id in enumerate(pairs):
+                expected[(m0Id, m1Id)] = (values[:, i * k:(i + 1) * k], bounds[:, i * k:(i + 1) * k], m0.shape[1])
+
+        results = []
+        for claim in claims:
+            values, bounds, inner = expected[(claim.m0Id, claim.m1Id)]
+            residual = np.abs(values - np.dot(claim.solution, probes))
+            dtype = np.result_type(values.dtype, claim.solution.dtype)
+            if np.issubdtype(dtype, np.integer):
+                results.append(not np.any(residual))
+            else:
+                tolerance = self.freivalds.TOLERANCE_FACTOR * np.finfo(dtype).eps * inner * bounds + \
+                    np.finfo(dtype).tiny
+                results.append(bool(np.all(residual <= tolerance)))
+        totalTime = time.perf_counter() - startTime
+
+        self.last = {'claims': len(claims), 'accepted': sum(results), 'time': totalTime,
+                     'validationsPerSecond': len(claims) / totalTime, 'distinctM0': len(m0Ids),
+                     'distinctM1': len(m1Ids), 'rounds': probes.shape[1]}
+        print(Fore.CYAN + "Batch verified %d solutions (%d rejected) in %.3f s, %.2f validations/s" %
+              (len(claims), len(claims) - sum(results), totalTime, self.last['validationsPerSecond']))
+        return results
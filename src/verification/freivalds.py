@@ -0,0 +1,83 @@
+import math
+import time
+
+import numpy as np
+
+from colorama import Fore
+
+
+class FreivaldsVerifier:
+    """
+    Probabilistic verification of a claimed product C = A x B (VerificationSchema.PROBABILISTIC).
+
+    Each round draws a random {0, 1} vector r and checks A (B r) == C r, which costs three matrix-vector products
+    instead of a full multiplication. A wrong C passes one round with probability <= 1/2, so
+    ceil(log2(1 / falseAccept)) rounds bound the false-accept probability. All rounds are stacked into one n x k
+    random matrix, so the check runs as three thin BLAS matrix-matrix products.
+
+    Floating point products are compared against a rounding bound (TOLERANCE_FACTOR * eps * inner * |A| |B| |r|),
+    integer products exactly.
+    """
+
+    FALSE_ACCEPT = 1e-9
+    TOLERANCE_FACTOR = 4.0
+
+    # Rows of |A| materialized at once when computing the rounding bound
+    CHUNK_ROWS = 1024
+
+    def __init__(self, falseAccept=FALSE_ACCEPT, rounds=None, seed=None):
+        self.rounds = rounds if rounds is not None else self.rounds_for(falseAccept)
+        self.rng = np.random.default_rng(seed)
+        self.last = {}
+
+    @staticmethod
+    def rounds_for(falseAccept):
+        return max(1, math.ceil(math.log2(1 / falseAccept)))
+
+    @staticmethod
+    def false_accept(rounds):
+        return 0.5 ** rounds
+
+    def probes(self, n, dtype):
+        return self.rng.integers(0, 2, (n, self.rounds)).astype(dtype)
+
+    def verify(self, m0, m1, claimed, probes=None):
+        """
+        :param m0: n x k left operand
+        :param m1: k x p right operand
+        :param claimed: n x p claimed product
+        :param probes: p x rounds random {0, 1} matrix, drawn when None
+        :return: True when the claim passes every round
+        """
+        startTime = time.perf_counter()
+        dtype = np.result_type(m0.dtype, m1.dtype, claimed.dtype)
+        probes = probes if probes is not None else self.probes(m1.shape[1], dtype)
+        expected = np.dot(m0, np.dot(m1, probes))
+        residual = np.abs(expected - np.dot(claimed, probes))
+        if np.issubdtype(dtype, np.integer):
+            ok = not np.any(residual)
+        else:
+            bound = self.rounding_bound(m0, m1, probes, dtype)
+            ok = bool(np.all(residual <= bound))
+        totalTime = time.perf_counter() - startTime
+
+        self.last = {'ok': ok, 'rounds': probes.shape[1], 'falseAccept': self.false_accept(probes.shape[1]),
+                     'time': totalTime, 'maxResidual': float(np.max(residual))}
+        print(Fore.CYAN + "Freivalds check of %dx%d product: %s after %d rounds (false accept <= %.1e) in %.3f s" %
+              (claimed.shape[0], claimed.shape[1], "accepted" if ok else "REJECTED", probes.shape[1],
+               self.last['falseAccept'], totalTime))
+        return ok
+
+    def rounding_bound(self, m0, m1, probes, dtype):
+        # Probes are non-negative, so |A| (|B| r) bounds every term of the sums
+        bound = self.abs_dot(m0, self.abs_dot(m1, probes))
+        return self.TOLERANCE_FACTOR * np.finfo(dtype).eps * m0.shape[1] * bound + np.finfo(dtype).tiny
+
+    def abs_dot(self, m, v):
+        """
+        |m| @ v, chunked over rows so |m| is never materialized in full.
+        """
+        out = np.empty((m.shape[0], v.shape[1]), dtype=np.result_type(m.dtype, v.dtype))
+        for start in range(0, m.shape[0], self.CHUNK_ROWS):
+            out[start:start + self.CHUNK_ROWS] = np.dot(np.abs(m[start:start + self.CHUNK_ROWS]), v)
+        return out
@@ -0,0 +1,163 @@
+import hashlib
+
+import numpy as np
+
+from colorama import Fore
+
+
+class MerkleTree:
+    """
+    Merkle tree over the row-blocks of a solution (VerificationSchema.CHECKSUM).
+
+    Leaves are sha256(0x00 || block bytes), inner nodes sha256(0x01 || left || right); the prefixes keep a leaf from
+    being passed off as an inner node. A node without a sibling (odd level width) is promoted unchanged instead of
+    being paired with itself, so no two different block lists share a root.
+
+    The root is what goes into ValidateRequest.solution. A validator that wants to spot-check block i only needs the
+    block (blockRows x cols values) and log2(blocks) sibling hashes, instead of the whole ~800Mb product.
+    """
+
+    LEAF = b"\x00"
+    NODE = b"\x01"
+
+    def __init__(self, leaves):
+        if len(leaves) == 0:
+            raise RuntimeError("Cannot build a Merkle tree without leaves.")
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            self.levels.append([self.node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                                for i in range(0, len(level), 2)])
+
+    @property
+    def root(self):
+        return self.levels[-1][0]
+
+    @property
+    def leaf_count(self):
+        return len(self.levels[0])
+
+    @staticmethod
+    def leaf_hash(block):
+        digest = hashlib.sha256(MerkleTree.LEAF)
+        digest.update(np.ascontiguousarray(block).data)
+        return digest.digest()
+
+    @staticmethod
+    def node_hash(left, right):
+        return hashlib.sha256(MerkleTree.NODE + left + right).digest()
+
+    def proof(self, index):
+        """
+        :param index: leaf (block) index
+        :return: sibling hashes from the leaf level up, skipping levels where the node was promoted
+        """
+        siblings = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                siblings.append(level[sibling])
+            index //= 2
+        return siblings
+
+    @staticmethod
+    def verify_proof(root, leaf, index, siblings, leafCount):
+        """
+        Recomputes the root from one leaf and its inclusion proof.
+        :param root: committed root
+        :param leaf: leaf hash of the block being checked
+        :param index: leaf index
+        :param siblings: output of #proof
+        :param leafCount: number of leaves (blocks) of the committed solution
+        :return: True if the block is part of the committed solution at index
+        """
+        node = leaf
+        width = leafCount
+        siblings = iter(siblings)
+        while width > 1:
+            sibling = index ^ 1
+            if sibling < width:
+                other = next(siblings, None)
+                if other is None:
+                    return False
+                node = MerkleTree.node_hash(other, node) if index & 1 else MerkleTree.node_hash(node, other)
+            index //= 2
+            width = -(-width // 2)
+        return node == root and next(siblings, None) is None
+
+
+class MerkleCommitter:
+    """
+    Hashes a solution block by block while it is being computed, so committing costs no extra pass over the ~800Mb
+    result. Blocks must be added in order.
+    """
+
+    BLOCK_ROWS = 256
+
+    def __init__(self, blockRows=BLOCK_ROWS):
+        self.blockRows = blockRows
+        self.leaves = []
+
+    def add_rows(self, rows):
+        """
+        :param rows: the next blockRows (or fewer, for the last block) rows of the solution
+        """
+        self.leaves.append(MerkleTree.leaf_hash(rows))
+
+    def tree(self):
+        return MerkleTree(self.leaves)
+
+    @staticmethod
+    def commit(m, blockRows=BLOCK_ROWS):
+        """
+        Builds the tree of an already computed solution.
+        """
+        committer = MerkleCommitter(blockRows)
+        for start in range(0, m.shape[0], blockRows):
+            committer.add_rows(m[start:start + blockRows])
+        return committer.tree()
+
+    @staticmethod
+    def solve_and_commit(m0, m1, blockRows=BLOCK_ROWS):
+        """
+        Computes m0 x m1 one row-block at a time and hashes every block while it is still in cache.
+        :return: product and its MerkleTree
+        """
+        committer = MerkleCommitter(blockRows)
+        res = np.empty((m0.shape[0], m1.shape[1]), dtype=np.result_type(m0.dtype, m1.dtype))
+        for start in range(0, m0.shape[0], blockRows):
+            res[start:start + blockRows] = np.dot(m0[start:start + blockRows], m1)
+            committer.add_rows(res[start:start + blockRows])
+        tree = committer.tree()
+        print(Fore.CYAN + "Committed %dx%d solution as %d blocks, root %s" %
+              (res.shape[0], res.shape[1], tree.leaf_count, tree.root.hex()))
+        return res, tree
+
+
+class MerkleVerifier:
+    """
+    Validator side of the CHECKSUM schema: checks that a downloaded block belongs to the committed solution and,
+    optionally, that it is the correct product of its exercise rows.
+    """
+
+    def __init__(self, root, leafCount, blockRows=MerkleCommitter.BLOCK_ROWS):
+        self.root = root if isinstance(root, bytes) else bytes.fromhex(root)
+        self.leafCount = leafCount
+        self.blockRows = blockRows
+
+    def verify_block(self, index, block, siblings, m0Rows=None, m1=None):
+        """
+        :param index: block index
+        :param block: blockRows x cols solution rows, as served by the miner
+        :param siblings: inclusion proof from MerkleTree#proof
+        :param m0Rows: exercise rows index * blockRows.. of m0, to also recompute the block
+        :param m1: right operand, needed with m0Rows
+        :return: True if the block is committed (and correct, when operands are given)
+        """
+        if not MerkleTree.verify_proof(self.root, MerkleTree.leaf_hash(block), index, siblings, self.leafCount):
+            print(Fore.RED + "Block %d is not part of solution %s" % (index, self.root.hex()))
+            return False
+        if m0Rows is not None and m1 is not None and not np.allclose(np.dot(m0Rows, m1), block):
+            print(Fore.RED + "Block %d is committed but wrong" % index)
+            return False
+        return True